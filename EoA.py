@@ -1,3207 +1,6015 @@
-# =====================================
-# Echoes of Auren
-# Author: Congchi Lee
-# Version: 1.8.0
-# Date: 2025-10-28
-# =====================================
-
-import os
-import random
-import time
-import sys
-import json
-import copy
-
-# ==============================================================================
-# ## 1. GAME DATA & CONSTANTS ##
-# (All game data is centralized here for easy editing)
-# ==============================================================================
-
-GAME_TITLE = "Echoes of Auren"
-WORLD_NAME = "Auren"
-
-APP_DATA_PATH = os.getenv('APPDATA')
-GAME_SAVE_DIRECTORY = os.path.join(APP_DATA_PATH, "EchoesOfAuren")
-try:
-    if not os.path.exists(GAME_SAVE_DIRECTORY):
-        os.makedirs(GAME_SAVE_DIRECTORY)
-except Exception as e:
-    print(f"CRITICAL ERROR: Could not create save directory: {e}")
-    GAME_SAVE_DIRECTORY = "."
-# List of save slot filenames
-SAVE_SLOTS = ["save_1.json", "save_2.json", "save_3.json"]
-
-MAP_DATA = [
-    ["plains", "plains", "plains", "plains", "forest", "mountain", "cave", "ruins"],
-    ["forest", "forest", "forest", "forest", "forest", "hills", "mountain", "ruins"],
-    ["forest", "fields", "bridge", "plains", "hills", "forest", "hills", "ruins"],
-    ["plains", "shop", "town", "mayor", "plains", "hills", "mountain", "ruins"],
-    ["plains", "fields", "fields", "plains", "hills", "mountain", "mountain", "ruins"],
-    ["swamp", "swamp", "fields", "plains", "hills", "mountain", "mountain", "ruins"]
-]
-
-BIOMES = {
-    "plains": {"t": "PLAINS", "e": True, "m": ["Slime", "Wolf"]},
-    "forest": {"t": "WOODS", "e": True, "m": ["Orc", "Shadow_Stalker", "Goblin", "Goblin Shaman"]},
-    # v1.8: Replaced Wolf
-    "fields": {"t": "FIELDS", "e": False},
-    "bridge": {"t": "BRIDGE", "e": True, "m": ["Slime"]},
-    "town": {"t": "TOWN CENTRE", "e": False},
-    "shop": {"t": "SHOP", "e": False},
-    "mayor": {"t": "MAYOR'S OFFICE", "e": False},
-    "cave": {"t": "DRAGON'S CAVE", "e": False},
-    "mountain": {"t": "MOUNTAIN", "e": True, "m": ["Golem", "Orc", "Fire Slime"]},
-    "hills": {"t": "HILLS", "e": True, "m": ["Goblin", "Slime", "Goblin Shaman"]},
-    "swamp": {"t": "MURKY SWAMP", "e": True, "m": ["Slime", "Fire Slime", "Goblin Shaman"]},
-    "ruins": {"t": "HAUNTED RUINS", "e": True, "m": ["Skeleton", "Ghost", "Wraith"]}
-}
-
-BIOME_ICONS = {
-    # --- Biome Icons ---
-    "plains": ".",
-    "forest": "T",
-    "fields": "~",
-    "bridge": "=",
-    "town": "H",
-    "shop": "$",
-    "mayor": "H",
-    "cave": "∩",
-    "mountain": "▲",
-    "hills": "n",
-    "swamp": "s",
-    "ruins": "R",
-    # --- Special Icons ---
-    "PLAYER": "@",  # Your icon
-    "FOG": " ",  # Unexplored
-    "UNKNOWN": "?"  # Error
-}
-
-MOBS = {
-    "Goblin": {"hp": 18, "atk": 3, "gold": 6, "xp": 10,
-               "loot_table": {"EQ_W_001": 0.1},
-               "effects": []},
-    "Slime": {"hp": 30, "atk": 2, "gold": 9, "xp": 12,
-              "loot_table": {"EQ_C_001": 0.05},
-              "effects": []},
-    "Wolf": {"hp": 25, "atk": 4, "gold": 8, "xp": 15,
-             "loot_table": {"EQ_A_001": 0.05},
-             "effects": [{"id": "STUN", "chance": 0.15, "turns": 1}]},
-    "Orc": {"hp": 45, "atk": 6, "gold": 22, "xp": 30,
-            "loot_table": {"EQ_W_002": 0.05},
-            "effects": []},
-    "Golem": {"hp": 65, "atk": 5, "gold": 28, "xp": 40,
-              "loot_table": {},
-              "effects": []},
-    "Dragon": {"hp": 180, "atk": 14, "gold": 200, "xp": 0,
-               "loot_table": {},
-               "effects": [{"id": "BURN", "chance": 0.3, "turns": 3}]},
-    "Dragon_WorldBoss": {"hp": 250, "atk": 18, "gold": 500, "xp": 0,
-                         "loot_table": {},
-                         "effects": [{"id": "BURN", "chance": 0.5, "turns": 3}]},
-    "Fire Slime": {"hp": 28, "atk": 4, "gold": 12, "xp": 15,
-                   "loot_table": {"EQ_C_002": 0.05},
-                   "effects": [{"id": "BURN", "chance": 0.2, "turns": 2}]},
-    "Goblin Shaman": {"hp": 35, "atk": 3, "gold": 15, "xp": 20,
-                      "loot_table": {"EQ_C_003": 0.02},
-                      "effects": []},
-    "Skeleton": {"hp": 50, "atk": 7, "gold": 25, "xp": 35,
-                 "loot_table": {"EQ_W_004": 0.05, "EQ_A_003": 0.03},
-                 "effects": []},
-    "Ghost": {"hp": 40, "atk": 6, "gold": 30, "xp": 40,
-              "loot_table": {"EQ_C_004": 0.05},
-              "effects": []},
-    "Wraith": {"hp": 70, "atk": 9, "gold": 50, "xp": 60,
-               "loot_table": {"EQ_W_005": 0.05},
-               "effects": [{"id": "STUN", "chance": 0.1, "turns": 1}]},
-    "Tutorial_Dummy": {"hp": 25, "atk": 1, "gold": 0, "xp": 0, "loot_table": {}, "effects": []},
-    # --- ADDITIONS v1.8 ---
-    "Shadow_Stalker": {"hp": 20, "atk": 5, "gold": 10, "xp": 18,
-                       "loot_table": {"EQ_W_003": 0.05},
-                       "effects": [{"id": "BLEED", "chance": 0.2, "turns": 3}]},
-    "Corrupted_Wolf": {"hp": 35, "atk": 6, "gold": 15, "xp": 25,
-                       "loot_table": {"EQ_A_001": 0.1},
-                       "effects": [{"id": "STUN", "chance": 0.15, "turns": 1},
-                                   {"id": "BLEED", "chance": 0.2, "turns": 2}]},
-    "Auren_Sentinel": {"hp": 80, "atk": 7, "gold": 40, "xp": 50,
-                       "loot_table": {},
-                       "effects": []}  # Skill is handled in handle_enemy_turn
-}
-
-EQUIPMENT_DB = {
-    # Weapons
-    "EQ_W_001": {"name": "Rusted Sword", "type": "weapon", "stats": {"atk": 2},
-                 "desc": "A sword that remembers too many battles, and lost its last one."},  # v1.8: Desc updated
-    "EQ_W_002": {"name": "Orcish Cleaver", "type": "weapon", "stats": {"atk": 4}, "desc": "A heavy, crude blade."},
-    "EQ_W_003": {"name": "Poison Dagger", "type": "weapon", "stats": {"atk": 1},
-                 "effect_on_hit": {"id": "POISON", "chance": 0.3, "turns": 3},
-                 "desc": "A weak dagger coated in grime."},
-    "EQ_W_004": {"name": "Ancient Sword", "type": "weapon", "stats": {"atk": 6},
-                 "desc": "A well-balanced blade from the ruins."},
-    "EQ_W_005": {"name": "Shadow Dagger", "type": "weapon", "stats": {"atk": 3},
-                 "effect_on_hit": {"id": "MANA_DRAIN", "chance": 0.15, "turns": 2},
-                 "desc": "A dagger that seems to cut at the soul."},
-    # Armors
-    "EQ_A_001": {"name": "Leather Tunic", "type": "armor", "stats": {"def": 1, "hp_max": 5},
-                 "desc": "Simple leather protection."},
-    "EQ_A_002": {"name": "Chainmail Vest", "type": "armor", "stats": {"def": 3}, "desc": "Heavy, but effective."},
-    "EQ_A_003": {"name": "Runic Mail", "type": "armor", "stats": {"def": 4, "hp_max": 10},
-                 "desc": "Runes of protection, faded because the world forgot what they protect."},
-    # v1.8: Desc updated
-    "EQ_A_004": {"name": "Acolyte's Robe", "type": "armor", "stats": {"def": 2},
-                 "special": "resist_burn_50",
-                 "desc": "Robes worn by fire worshippers."},
-    # Charms
-    "EQ_C_001": {"name": "Slime Core", "type": "charm", "stats": {"hp_max": 10},
-                 "desc": "A simple, jellied memory. It only remembers how to hold together."},  # v1.8: Desc updated
-    "EQ_C_002": {"name": "Ember Shard", "type": "charm", "stats": {},
-                 "effect_on_hit": {"id": "BURN", "chance": 0.1, "turns": 2},
-                 "desc": "Warm to the touch."},
-    "EQ_C_003": {"name": "Lucky Coin", "type": "charm", "stats": {"gold_bonus": 0.1}, "desc": "A faint glint of luck."},
-    "EQ_C_004": {"name": "Ghostly Pendant", "type": "charm", "stats": {},
-                 "special": "evade_phys_10",
-                 "desc": "It feels cold and slightly transparent."}
-}
-
-EFFECTS_DB = {
-    "POISON": {
-        "name": "Poisoned",
-        "type": "dot",
-        "value": 2,
-        "msg_inflict": "is POISONED!",
-        "msg_tick": "takes 2 poison damage."
-    },
-    "BURN": {
-        "name": "Burning",
-        "type": "dot",
-        "value": 3,
-        "msg_inflict": "is BURNING!",
-        "msg_tick": "takes 3 burn damage."
-    },
-    "STUN": {
-        "name": "Stunned",
-        "type": "control",
-        "msg_inflict": "is STUNNED!",
-        "msg_tick": "is stunned and cannot move!"
-    },
-    "REGEN": {
-        "name": "Regen",
-        "type": "hot",
-        "value": 2,
-        "msg_inflict": "is REGENERATING!",
-        "msg_tick": "heals for 2 HP."
-    },
-    "MANA_DRAIN": {
-        "name": "Mana Drain",
-        "type": "control",
-        "msg_inflict": "is drained of energy!",
-        "msg_tick": "'s skills are put on cooldown!"
-    },
-    # --- ADDITIONS v1.8 ---
-    "BLEED": {
-        "name": "Bleeding",
-        "type": "dot",
-        "value": 2,
-        "msg_inflict": "is BLEEDING!",
-        "msg_tick": "takes 2 bleed damage."
-    },
-    "SLEEP": {
-        "name": "Sleeping",
-        "type": "control",
-        "msg_inflict": "falls ASLEEP!",
-        "msg_tick": "is asleep and cannot move!"
-    }
-}
-
-MAIN_QUESTS = {
-    "MQ_01": {
-        "title": "Auren's Call",
-        "desc": "You awaken to a faint echo. Find out what's happening at the Town Centre.",
-        "type": "VISIT",
-        "target": "town"
-    },
-    "MQ_02": {
-        "title": "The Mayor's Plea",
-        "desc": "The Mayor is worried. He asks you to speak with Lira at the Echo Guild.",
-        "type": "TALK",
-        "target": "LIRA"
-    },
-    "MQ_03": {
-        "title": "Proving Your Echo",
-        "desc": "Lira needs you to grow stronger. Prove your worth by clearing 5 Goblins from the hills.",
-        "type": "KILL", "target_mob": "Goblin", "needed": 5,
-        "reward_gold": 100, "reward_xp": 150
-    },
-    "MQ_04": {
-        "title": "The First True Echo",
-        "desc": "Lira senses a 'Fallen Knight's' echo, lost somewhere in the forests. Find it.",
-        "type": "COLLECT_ECHO", "target_codex": "fallen_knight",
-        "reward_gold": 50, "reward_xp": 100
-    },
-    "MQ_04_COMPLETE": {
-        "title": "The Knight's Vow",
-        "desc": "You found the Knight's echo. You feel stronger. Return to the Mayor.",
-        "type": "TALK", "target": "MAYOR"
-    },
-    # --- v1.8: Hero Path Rework ---
-    "MQ_05_HERO_A": {
-        "title": "The Hero's Path: Patience",
-        "desc": "Lira states strength is not just muscle, but resolve. Find the 'Shrine of Moss' in the wilds.",
-        "type": "COLLECT_ECHO", "target_codex": "shrine_memory"
-    },
-    "MQ_05_HERO_B": {
-        "title": "The Hero's Path: Understanding",
-        "desc": "To win, you must understand why the seal was made. Find the 'Cultist's Diary' at the dragon's cave.",
-        "type": "COLLECT_ECHO", "target_codex": "dragon_cultist_diary"
-    },
-    "MQ_05_HERO_C": {
-        "title": "The Hero's Path: The Final Test",
-        "desc": "Lira is ready to test your strength and wisdom. Defeat the 'Auren Sentinel' she has summoned in the hills.",
-        "type": "KILL", "target_mob": "Auren_Sentinel", "needed": 1
-    },
-    "MQ_05_RECKLESS": {
-        "title": "The Reckless Path",
-        "desc": "The seal was forced. The dragon has escaped. Find and slay it.",
-        "type": "KILL", "target_mob": "Dragon_WorldBoss", "needed": 1
-    },
-    "MQ_06_HERO": {
-        "title": "Confront the Flame",
-        "desc": "The seal is safely broken. Confront the dragon in its lair.",
-        "type": "KILL", "target_mob": "Dragon", "needed": 1
-    }
-}
-
-SIDE_QUEST_POOL = {
-    # --- Tier 1 (Level 1-4) ---
-    "SQ_SLIME_01": {
-        "title": "A Sticky Situation", "desc": "Clear out 6 Slimes from the plains.",
-        "type": "KILL", "target_mob": "Slime", "needed": 6,
-        "reward_gold": 50, "reward_xp": 70, "min_level": 1
-    },
-    "SQ_GOBLIN_01": {
-        "title": "Hilltop Pests", "desc": "Defeat 4 Goblins in the hills.",
-        "type": "KILL", "target_mob": "Goblin", "needed": 4,
-        "reward_gold": 60, "reward_xp": 80, "min_level": 2
-    },
-    # v1.8: Farmer Quest (Interactable)
-    "SQ_FARMER_01": {
-        "title": "The Lost Lullaby",
-        "desc": "A farmer in the fields (1,2) seeks an old tune. Find a 'Merchant Spirit' who might remember it.",
-        "type": "COLLECT_ECHO", "target_codex": "merchant_spirit",
-        "reward_gold": 100, "reward_xp": 150, "min_level": 4, "is_board_quest": False
-    },
-    # --- Tier 2 (Level 5-9) ---
-    "SQ_WOLF_02": {
-        "title": "The Wolf Pack", "desc": "A pack of 3 Wolves is menacing the forest path.",
-        "type": "KILL", "target_mob": "Wolf", "needed": 3,
-        "reward_gold": 90, "reward_xp": 110, "min_level": 6
-    },
-    "SQ_ORC_01": {
-        "title": "Orc Sighting", "desc": "An Orc scout was seen in the mountains. Defeat 1 Orc.",
-        "type": "KILL", "target_mob": "Orc", "needed": 1,
-        "reward_gold": 100, "reward_xp": 130, "min_level": 7
-    },
-    # v1.8: Swamp Quest
-    "SQ_GUARD_01": {
-        "title": "Swamp Menace",
-        "desc": "A Shaman in the swamp is corrupting the water, spawning Fire Slimes. Slay the Goblin Shaman.",
-        "type": "KILL", "target_mob": "Goblin Shaman", "needed": 1,
-        "reward_gold": 150, "reward_xp": 200, "min_level": 8
-    },
-    # --- Tier 3 (Level 10+) ---
-    "SQ_GOLEM_01": {
-        "title": "Stone Sentinels", "desc": "The Golems in the mountains are awakening. Take one down.",
-        "type": "KILL", "target_mob": "Golem", "needed": 1,
-        "reward_gold": 150, "reward_xp": 200, "min_level": 10
-    },
-    # v1.8: Reckless Path Quest
-    "SQ_R_01": {
-        "title": "(RECKLESS) Chaos Cleanup",
-        "desc": "The broken seal has driven the plains wolves mad! Slay 5 'Corrupted Wolves' before they reach town.",
-        "type": "KILL", "target_mob": "Corrupted_Wolf", "needed": 5,
-        "reward_gold": 250, "reward_xp": 350, "min_level": 10, "exclusive_path": "RECKLESS"
-    },
-    "SQ_RUINS_01": {
-        "title": "Cleansing the Ruins", "desc": "The skeletons in the Haunted Ruins are a threat. Clear 5 of them.",
-        "type": "KILL", "target_mob": "Skeleton", "needed": 5,
-        "reward_gold": 180, "reward_xp": 250, "min_level": 12
-    },
-    "SQ_RUINS_02": {
-        "title": "Silent Spirits", "desc": "The Ghosts of the ruins seem tormented. Defeat 3 Ghosts.",
-        "type": "KILL", "target_mob": "Ghost", "needed": 3,
-        "reward_gold": 200, "reward_xp": 280, "min_level": 13
-    }
-}
-
-BIOME_FLAVORS = {
-    "plains": {
-        "lines": [
-            "Tall grass brushes at your knees. Once, someone laughed here and the sound lingered.",
-            "The plain smells faintly of baked earth and distant smoke; a memory disguised as weather."
-        ], "prob": 0.25
-    },
-    "forest": {
-        "lines": [
-            "Pine resin hangs in the air. A song once rose among these trees, quiet as a hidden thing.",
-            "Moss clings to stone and bone; prayers have long since softened into green."
-        ], "prob": 0.25
-    },
-    "hills": {
-        "lines": ["The wind rolls over the slope carrying an old, half-remembered chorus."],
-        "prob": 0.25
-    },
-    "cave": {
-        "lines": ["Warm breath from the depths brushes your face; something sealed still breathes."],
-        "prob": 0.40
-    },
-    "town": {
-        "lines": ["Hammers ring; children shout. Normality is a careful thing here."],
-        "prob": 0.20
-    },
-    "bridge": {
-        "lines": ["The bridge creaks like an old chest; voices cross the water like paper boats."],
-        "prob": 0.25
-    },
-    "fields": {
-        "lines": ["Fields smell of seed and late sun. A furrow holds a whisper of some long promise."],
-        "prob": 0.25
-    },
-    "shop": {
-        "lines": ["Shelves are orderly and yet some things look as if they were placed by memory rather than need."],
-        "prob": 0.15
-    },
-    "mayor": {
-        "lines": ["The mayor's steps echo in a room full of decisions that no one remembers making."],
-        "prob": 0.15
-    },
-    "mountain": {
-        "lines": ["Stone climbs skyward here; the mountain keeps its secrets under a calm face."],
-        "prob": 0.30
-    },
-    "swamp": {
-        "lines": ["The air is thick and smells of rot. Something bubbles beneath the murky water.",
-                  "Gnarled trees reach out like skeletal claws. You hear a distant croak."],
-        "prob": 0.35
-    },
-    "ruins": {
-        "lines": ["Broken columns stand like teeth against the sky. A cold wind whispers forgotten names.",
-                  "You step on a cracked tile bearing a royal crest. This place held importance once."],
-        "prob": 0.40
-    }
-}
-
-CODEX_ENTRIES = {
-    "ECHO_GIFT_01": {
-        "title": "The First Echo",
-        "text": "A faint whisper, the very first memory that answered your call. It feels like a promise.",
-        "buff": {"atk": 1}
-    },
-    "shrine_memory": {
-        "title": "Shrine of Moss",
-        "text": "Someone once knelt at this shrine and sang. The song remained like dew on the stone.",
-        "buff": {"def": 2, "hp_max": 5},
-        "combat_effect": {"id": "REGEN", "turns": 99}
-    },
-    "fallen_knight": {
-        "title": "The Knight's Promise",
-        "text": "He fought for a vow. He asked not for glory, but for someone to finish what he began.",
-        "buff": {"atk": 2, "def": -1}
-    },
-    "crimson_flower": {
-        "title": "Crimson Bloom",
-        "text": "Beauty that stings; it remembers both seed and wound.",
-        "buff": {},
-        "effect_on_hit": {"id": "POISON", "chance": 0.3, "turns": 3}
-    },
-    "merchant_spirit": {
-        "title": "Merchant Spirit",
-        "text": "A small lantern-eyed thing that trades memories like trinkets. It smiles without lips.",
-        "buff": {"gold_bonus": 0.25}
-    },
-    "mirror_echo": {
-        "title": "Reflected Soul",
-        "text": "You looked into fractured glass and found what the land refused to keep.",
-        "buff": {"atk": 1, "def": 1}
-    },
-    "town_rumor": {
-        "title": "Town's Whisper",
-        "text": "Villagers speak of an old path behind the inn, where echoes gather at dusk.",
-        "buff": {}
-    },
-    "ruined_king_memory": {
-        "title": "Fallen King's Crown",
-        "text": "A memory of a crown, heavy with regret. It remembers ruling over dust and shadows.",
-        "buff": {"atk": 1, "def": 1}
-    },
-    # --- ADDITIONS v1.8 ---
-    "farmer_memory": {
-        "title": "Farmer's Memory",
-        "text": "The earth is cold. The fire... the fire that warmed us, where did it go? The children know only the cold now.",
-        "buff": {"hp_max": 10}
-    },
-    "dragon_cultist_diary": {
-        "title": "Cultist's Diary Scrap",
-        "text": "The weak sealed the flame. We worship it. The fire of forgetting will cleanse Auren... The fools in town do not understand the power of forgetting.",
-        "buff": {},
-        "special": "resist_burn_25"
-    },
-    "ancient_lullaby": {
-        "title": "Ancient Lullaby",
-        "text": "An old tune, it tells of a world where the night was safe and warm. It feels... peaceful.",
-        "buff": {"def": 1},
-        "effect_on_hit": {"id": "SLEEP", "chance": 0.05, "turns": 1}
-    }
-}
-
-
-# ==============================================================================
-# ## 2. HELPER & UTILITY FUNCTIONS ##
-# (Basic utility functions)
-# ==============================================================================
-
-def clear_screen():
-    # Clears the terminal screen.
-    os.system("cls" if os.name == "nt" else "clear")
-
-
-def draw_line():
-    # Prints a separator line.
-    print("xX--------------------xX")
-
-
-def typewriter_effect(text, delay=0.03):
-    # Prints text with a typewriter effect.
-    for char in text:
-        sys.stdout.write(char)
-        sys.stdout.flush()
-        time.sleep(delay)
-    print()
-
-
-## NEW (v1.6.4): Safe input wrapper ##
-def safe_input(prompt):
-    # Handles EOFError (Ctrl+D) during input.
-    try:
-        return input(prompt)
-    except EOFError:
-        print("\n(Input cancelled.)")
-        return ""
-
-
-def draw_minimap(player):
-    # Draws the game map with fog of war.
-    print("--- MAP ---")
-    px, py = player['x'], player['y']
-    visited = player.get('visited_tiles') or [[px, py]]
-    VISION_RANGE = 1
-
-    # Update visited tiles
-    for y_vision in range(py - VISION_RANGE, py + VISION_RANGE + 1):
-        for x_vision in range(px - VISION_RANGE, px + VISION_RANGE + 1):
-            if 0 <= y_vision < len(MAP_DATA) and 0 <= x_vision < len(MAP_DATA[0]):
-                if [x_vision, y_vision] not in visited:
-                    visited.append([x_vision, y_vision])
-    player['visited_tiles'] = visited
-
-    # Draw the map grid
-    for y, row in enumerate(MAP_DATA):
-        line = ""
-        for x, tile_code in enumerate(row):
-            is_player_pos = (x == px and y == py)
-            is_visited = [x, y] in visited
-
-            if is_player_pos:
-                icon_to_draw = BIOME_ICONS.get("PLAYER", "@")
-                line += f"[{icon_to_draw}] "
-            elif is_visited:
-                icon_to_draw = BIOME_ICONS.get(tile_code, "?")
-                line += f" {icon_to_draw}  "
-            else:
-                icon_to_draw = BIOME_ICONS.get("FOG", " ")
-                line += f" {icon_to_draw}  "
-        print(line)
-
-    print("-----------")
-
-
-def show_biome_flavor(player):
-    # Displays descriptive text for the current biome.
-    tile = MAP_DATA[player['y']][player['x']]
-    flavor = BIOME_FLAVORS.get(tile)
-    if not flavor or random.random() >= flavor['prob']: return
-    line = random.choice(flavor['lines'])
-    typewriter_effect(line, delay=0.02)
-    time.sleep(0.6)
-
-
-def get_save_slot_info(slot_file):
-    # Reads basic info from a save file for display.
-    try:
-        with open(slot_file, "r") as f:
-            player_data = json.load(f)
-
-        x, y = player_data.get('x', 0), player_data.get('y', 0)
-
-        # Failsafe for loading saves before map expansion
-        if y >= len(MAP_DATA) or x >= len(MAP_DATA[0]):
-            x, y = 2, 3  # Default to town
-
-        tile_code = MAP_DATA[y][x]
-        location_name = BIOMES[tile_code]['t']
-
-        # Calculate approximate ATK for display
-        atk_stat = player_data.get('total_atk', player_data.get('base_atk', player_data.get('atk', 3)))
-
-        return {
-            "name": player_data.get('name', 'Unknown'),
-            "level": player_data.get('level', 1),
-            "atk": atk_stat,
-            "location": location_name
-        }
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None  # Empty or corrupted slot
-
-
-# ==============================================================================
-# ## 3. CORE DATA HANDLERS ##
-# (Functions for managing player data)
-# ==============================================================================
-
-def create_new_player(name, slot_file):
-    # Initializes a new player dictionary.
-    start_pos = [1, 3]
-    player_data = {
-        "name": name,
-        "hp": 50, "hp_max": 50,
-        "base_atk": 3, "base_def": 0,
-        "bonus_atk": 0, "bonus_def": 0,
-        "total_atk": 3, "total_def": 0, "gold_bonus": 0.0,
-
-        "pot": 1, "elix": 0, "gold": 0,
-        "x": start_pos[0], "y": start_pos[1],
-        "seal": True,
-        "key": False,
-        "level": 1, "xp": 0, "xp_to_next_level": 40,
-        "dev_mode": False,
-        "rage_potions": 0,
-        "stone_potions": 0,
-        "active_buff": None,
-        "codex": [],
-        "skills_cd": {},
-        "skip_next": False,
-        "guard": False,
-        "respawned": False,
-        "visited_tiles": [start_pos],
-        "main_quest_id": "MQ_01",
-        "quest_progress": {},
-        "active_side_quests": [],
-        "completed_side_quests": [],  # v1.8: Added
-        "save_slot": slot_file,
-        "active_effects": [],
-        "equipment": {"weapon": None, "armor": None, "charm": None},
-        "inventory": ["EQ_W_001"],
-        "equipped_echo": None
-    }
-
-    # Calculate initial stats and fully heal
-    player_data = recalculate_player_stats(player_data)
-    player_data['hp'] = player_data['hp_max']
-    return player_data
-
-
-def save_game(player):
-    # Saves the player data to their assigned slot file.
-    slot_file = player.get('save_slot')
-    if not slot_file:
-        print("Error: No save slot associated with player.")
-        time.sleep(1.5)
-        return
-
-    try:
-        with open(slot_file, "w") as f:
-            json.dump(player, f, indent=4)
-        print("Game saved!")
-    except Exception as e:
-        print("Failed to save:", e)
-    time.sleep(1)
-
-
-def load_game(slot_file):
-    try:
-        with open(slot_file, "r") as f:
-            player = json.load(f)
-
-        # Apply defaults for fields added in later versions
-        player.setdefault('codex', [])
-        player.setdefault('skills_cd', {})
-        player.setdefault('skip_next', False)
-        player.setdefault('guard', False)
-        player.setdefault('respawned', False)
-        player.setdefault('key', False)
-        player.setdefault('visited_tiles', [[player.get('x', 0), player.get('y', 0)]])
-        player.setdefault('main_quest_id', 'MQ_01')
-        player.setdefault('quest_progress', {})
-        player.setdefault('active_side_quests', [])
-        player.setdefault('save_slot', slot_file)
-        player.setdefault('equipment', {"weapon": None, "armor": None, "charm": None})
-        player.setdefault('inventory', [])
-        player.setdefault('equipped_echo', None)
-        player.setdefault('base_atk', player.get('atk', 3))
-        player.setdefault('base_def', 0)
-        player.setdefault('bonus_atk', 0)
-        player.setdefault('bonus_def', 0)
-        player.setdefault('active_effects', [])
-        player.setdefault('completed_side_quests', [])  # v1.8: Added
-
-        # Failsafe for loading saves before map expansion
-        if player['y'] >= len(MAP_DATA) or player['x'] >= len(MAP_DATA[0]):
-            player['x'], player['y'] = 2, 3
-            print("Detected old save location. Warping to Town Centre.")
-
-        # Clean up stale quest progress entries
-        active_quests = player.get('active_side_quests', [])
-        main_quest = player.get('main_quest_id', '')
-        new_quest_progress = {}
-        for q_id in player.get('quest_progress', {}):
-            if q_id in active_quests or q_id == main_quest or main_quest.startswith(q_id):  # v1.8: Fix for quest chains
-                new_quest_progress[q_id] = player['quest_progress'][q_id]
-        player['quest_progress'] = new_quest_progress
-
-        # Always recalculate stats on load
-        player = recalculate_player_stats(player)
-
-        # Ensure HP isn't higher than max after potential stat changes
-        if player['hp'] > player['hp_max']:
-            player['hp'] = player['hp_max']
-
-        print(f"Welcome back, {player['name']}!")
-        safe_input("> ")
-        return player
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("No valid save file found.")
-        time.sleep(1.2)
-        return None
-
-
-def recalculate_player_stats(player):
-    current_hp_percent = player.get('hp', 1) / max(1, player.get('hp_max', 1))
-
-    # Start with base stats from level and permanent bonuses
-    total_atk = player['base_atk'] + player.get('bonus_atk', 0)
-    total_def = player['base_def'] + player.get('bonus_def', 0)
-    total_hp_max = 50 + ((player['level'] - 1) * 10)
-    total_gold_bonus = 0.0
-
-    # Add stats from Equipment
-    for slot, item_id in player['equipment'].items():
-        if item_id:
-            item_data = EQUIPMENT_DB.get(item_id)
-            if item_data:
-                for stat, value in item_data.get('stats', {}).items():
-                    if stat == 'atk': total_atk += value
-                    if stat == 'def': total_def += value
-                    if stat == 'hp_max': total_hp_max += value
-                    if stat == 'gold_bonus': total_gold_bonus += value
-
-    # Add buffs from the single Focused Echo
-    echo_id = player['equipped_echo']
-    if echo_id:
-        echo_data = CODEX_ENTRIES.get(echo_id)
-        if echo_data:
-            for stat, value in echo_data.get('buff', {}).items():
-                if stat == 'atk': total_atk += value
-                if stat == 'def': total_def += value
-                if stat == 'hp_max': total_hp_max += value
-                if stat == 'gold_bonus': total_gold_bonus += value
-
-    # Update player object with calculated totals
-    player['total_atk'] = total_atk
-    player['total_def'] = total_def
-    player['hp_max'] = total_hp_max
-    player['gold_bonus'] = total_gold_bonus
-
-    # Restore HP based on percentage, clamped to 1 minimum
-    new_hp = max(1, int(player['hp_max'] * current_hp_percent))
-
-    # Ensure HP doesn't exceed new max
-    player['hp'] = min(new_hp, player['hp_max'])
-
-    return player
-
-
-def handle_level_up(player):
-    # Handles player leveling up.
-    leveled_up = False
-    max_level = 50  # Set a maximum level cap
-
-    while player['xp'] >= player['xp_to_next_level'] and player['level'] < max_level:
-        leveled_up = True
-        overflow = player['xp'] - player['xp_to_next_level']
-        player['level'] += 1
-        player['base_atk'] += 1  # Increase BASE ATK
-        player['xp'] = overflow
-        player['xp_to_next_level'] = int(player['xp_to_next_level'] * 1.6)
-
-        # If max level is reached, set XP requirements high
-        if player['level'] == max_level:
-            player['xp'] = 0
-            player['xp_to_next_level'] = 9999999  # Effectively infinite
-
-    if leveled_up:
-        draw_line()
-        print(f"LEVEL UP! You are now level {player['level']}!")
-        # Recalculate stats BEFORE fully healing
-        player = recalculate_player_stats(player)
-        player['hp'] = player['hp_max']  # Full heal to new max HP
-
-        print(f"HP MAX increased to {player['hp_max']}!")
-        print(f"Base ATK increased to {player['base_atk']}!")
-        print(f"(Total ATK is now {player['total_atk']})")
-        if player['level'] == max_level:
-            print("You have reached the maximum level!")
-        else:
-            print(f"Next level at {player['xp_to_next_level']} XP.")
-        draw_line()
-    return player
-
-
-def codex_add(player, entry_id):
-    if entry_id not in CODEX_ENTRIES: return player
-    if entry_id not in player.get('codex', []):
-        player.setdefault('codex', []).append(entry_id)
-        print(f"(New Echo added to Codex: {CODEX_ENTRIES[entry_id]['title']})")
-        player = check_quest_completion(player, "COLLECT_ECHO", entry_id)
-    return player
-
-
-def show_codex(player):
-    clear_screen()
-    draw_line()
-    print("ECHO CODEX (Collected Memories)")
-    draw_line()
-    if not player.get('codex'):
-        print("You have not collected any echoes yet.")
-        print("\n(Visit the Echo Guild in Town to Focus on a memory)")
-    else:
-        codex_list = sorted(player.get('codex', []))
-        for i, eid in enumerate(codex_list, 1):
-            entry = CODEX_ENTRIES.get(eid, {})
-            print(f"[{i}] {entry.get('title', 'Unknown')}")
-    draw_line()
-    print("\nEnter number to read, or press Enter to return.")
-    choice = safe_input("# ")
-
-    codex_list = sorted(player.get('codex', []))
-
-    if choice.strip().isdigit():
-        idx = int(choice.strip()) - 1
-        if 0 <= idx < len(codex_list):
-            eid_to_read = codex_list[idx]
-            entry = CODEX_ENTRIES.get(eid_to_read, {})
-
-            # Sub-menu for displaying echo details
-            clear_screen()
-            draw_line()
-            print(f"{entry.get('title', 'Unknown')}")
-            draw_line()
-            typewriter_effect(entry.get('text', ''), delay=0.03)
-            draw_line()
-
-            # Show potential buffs and effects
-            if entry.get('buff'):
-                print(f"Focus Buff: {entry['buff']}")
-            if entry.get('effect_on_hit'):
-                eff = entry['effect_on_hit']
-                print(f"Focus Effect (On Hit): {eff.get('chance', 0) * 100}% chance to inflict {eff.get('id', '?')}")
-            if entry.get('combat_effect'):
-                eff = entry['combat_effect']
-                print(f"Focus Effect (Combat Start): Applies {eff.get('id', '?')}")
-
-            draw_line()
-            print("(To Focus this memory, visit the Echo Guild in Town)")
-            safe_input("\n> Press Enter to return to Codex...")
-            show_codex(player)  # Return to the codex list
-    # Return if user pressed Enter or invalid input
-    return
-
-
-## MODIFIED (v1.7): Added skill upgrades and new skills ##
-def skill_available(player, skill_name):
-    # Checks if a skill is available based on level or codex.
-    lv = player.get('level', 1)
-    codex = player.get('codex', [])
-
-    if skill_name == "Focus Strike": return lv >= 3
-    if skill_name == "Guard": return lv >= 4
-    if skill_name == "Meditate": return lv >= 6
-    if skill_name == "Limit Break": return lv >= 10
-
-    ## NEW SKILLS & UPGRADES (v1.7) ##
-    if skill_name == "Purify": return lv >= 12
-    if skill_name == "Focus Strike II": return lv >= 15
-    if skill_name == "Guard II": return lv >= 18
-    if skill_name == "Meditate II": return lv >= 20
-
-    if skill_name == "Reflected Strike": return "mirror_echo" in codex
-
-    return False
-
-
-def skill_on_cooldown(player, skill_name):
-    # Checks if a skill is currently on cooldown.
-    base_skill_name = skill_name.replace(" II", "")
-    return player.get('skills_cd', {}).get(base_skill_name, 0) > 0
-
-
-def set_skill_cd(player, skill_name, turns):
-    # Sets the cooldown for a skill.
-    base_skill_name = skill_name.replace(" II", "")
-    player.setdefault('skills_cd', {})[base_skill_name] = turns
-
-
-def decrement_skill_cooldowns(player):
-    # Reduces cooldown turns for all active cooldowns.
-    for k in list(player.get('skills_cd', {}).keys()):
-        if player['skills_cd'][k] > 0:
-            player['skills_cd'][k] -= 1
-
-
-# ==============================================================================
-# ## 4. GAME STATE HANDLERS ##
-# (Functions handling each game screen/state)
-# ==============================================================================
-
-def handle_main_menu():
-    # Displays the main game menu.
-    clear_screen()
-    draw_line()
-    # Simple ASCII Art for the title
-    print(r"""
-█▀▀░█▀▀░█░█░█▀█░█▀▀░█▀▀░░█▀█░█▀▀░░█▀█░█░█░█▀▄░█▀▀░█▀█
-█▀▀░█░░░█▀█░█░█░█▀▀░▀▀█░░█░█░█▀▀░░█▀█░█░█░█▀▄░█▀▀░█░█
-▀▀▀░▀▀▀░▀░▀░▀▀▀░▀▀▀░▀▀▀░░▀▀▀░▀░░░░▀░▀░▀▀▀░▀░▀░▀▀▀░▀░▀
-    """)
-    draw_line()
-    print("1. NEW GAME")
-    print("2. LOAD GAME")
-    print("3. QUIT GAME")
-    choice = safe_input("# ")
-    if choice == "1":
-        return "new_game_menu"
-    if choice == "2":
-        return "load_game_menu"
-    if choice == "3":
-        return "exit"
-    return "main_menu"  # Default: reload main menu
-
-
-def handle_new_game_menu():
-    # Handles the new game slot selection screen.
-    clear_screen()
-    draw_line()
-    print("SELECT A SLOT FOR YOUR NEW GAME")
-    draw_line()
-
-    slot_info = []
-    for i, slot_file in enumerate(SAVE_SLOTS, 1):
-        info = get_save_slot_info(slot_file)
-        slot_info.append(info)
-        if info:
-            print(f"{i}. [Lvl {info['level']}] {info['name']} (ATK: {info['atk']})")
-            print(f"   Location: {info['location']}")
-        else:
-            print(f"{i}. [Empty Slot]")
-
-    print("0. Back to Main Menu")
-    draw_line()
-    choice = safe_input("# ")
-
-    if choice.strip().isdigit():
-        slot_index = int(choice) - 1
-
-        if choice == "0":
-            return "main_menu", None  # Return state and player (None)
-
-        if 0 <= slot_index < len(SAVE_SLOTS):
-            selected_file = SAVE_SLOTS[slot_index]
-
-            # Confirm overwrite if slot is not empty
-            if slot_info[slot_index]:
-                print(
-                    f"\nWARNING: This will overwrite [Lvl {slot_info[slot_index]['level']}] {slot_info[slot_index]['name']}.")
-                confirm = safe_input("Are you sure? (y/n): ").lower()
-                if confirm != 'y':
-                    return "new_game_menu", None  # Return to slot selection
-
-            # Get player name and create new player
-            clear_screen()
-            name = safe_input("# What's your name, hero? ")
-            if not name: name = "Wanderer"  # Default name
-
-            player = create_new_player(name, selected_file)
-
-            # Activate dev mode for specific names
-            if name in ["Congchi Lee", "admin"]:
-                player['dev_mode'] = True;
-                print("\n*** Dev Mode Activated ***");
-                time.sleep(1.2)
-
-            show_lore()  # Show intro lore
-            return "playing", player  # Start the game
-
-    return "new_game_menu", None  # Invalid input, reload menu
-
-
-def handle_load_game_menu():
-    # Handles the load game slot selection screen.
-    clear_screen()
-    draw_line()
-    print("SELECT A SLOT TO LOAD")
-    draw_line()
-
-    valid_slots = {}  # Maps display index (1, 2, 3) to filename
-    slot_display_index = 1
-    for slot_file in SAVE_SLOTS:
-        info = get_save_slot_info(slot_file)
-        if info:  # Only display non-empty slots
-            print(f"{slot_display_index}. [Lvl {info['level']}] {info['name']} (ATK: {info['atk']})")
-            print(f"   Location: {info['location']}")
-            valid_slots[str(slot_display_index)] = slot_file
-            slot_display_index += 1
-
-    if not valid_slots:
-        print("No saved games found.")
-
-    print("0. Back to Main Menu")
-    draw_line()
-    choice = safe_input("# ")
-
-    if choice == "0":
-        return "main_menu", None  # Return state and player (None)
-
-    if choice in valid_slots:
-        selected_file = valid_slots[choice]
-        player = load_game(selected_file)  # Attempt to load
-        if player:
-            return "playing", player  # Load successful, start game
-        else:
-            # load_game() prints error message
-            time.sleep(1)
-            return "load_game_menu", None  # Return to load menu on failure
-
-    return "load_game_menu", None  # Invalid input, reload menu
-
-
-def show_lore():
-    # Displays the introductory lore sequence.
-    clear_screen()
-    draw_line()
-    typewriter_effect(f"Echoes of {WORLD_NAME}", delay=0.04)
-    draw_line()
-    time.sleep(0.5)
-
-    paragraphs = [
-        f"There was once a land named {WORLD_NAME}...",
-        "They lived with a flame the elders called the Breath of Dawn...",
-        "It was not a fire that burned, but one that *remembered*.",
-        "It held the shape of their songs, the weight of their promises, and the quiet joy of their long afternoons.",
-        "But a shadow fell. A great, silent beast whose roar was not sound, but *forgetting*.",
-        f"To save {WORLD_NAME}, the ancestors forged a Seal, sacrificing their own memories to bind the creature... and the Breath of Dawn with it.",
-        "Now, the land is quiet. The fire is gone.",
-        "All that remains... are echoes.",
-        "Faint whispers of what was lost, clinging to stone and wind.",
-        "The Seal is weakening. The echoes are growing restless, calling for someone to remember what the world forgot.",
-        "You awaken to that call."
-    ]
-
-    for line in paragraphs:
-        typewriter_effect(line, delay=0.03)
-        time.sleep(0.6)
-    draw_line()
-    print()
-    print("1 - Answer the call and begin your journey.")
-    print("2 - Stay in the village (decline).")
-    choice = safe_input("# ")
-    if choice.strip() != "1":
-        clear_screen()
-        typewriter_effect("You turn away. The echo fades... but not forever.")
-        safe_input("> Press Enter to change your mind.")
-        show_lore()  # Recursive call to retry choice
-    else:
-        typewriter_effect("The wind carries your name. Auren remembers.")
-        safe_input("\n> Press Enter to begin your quest.")
-
-
-## MODIFIED (v1.7): Added new event ##
-def handle_random_event(player):
-    # Handles random encounters/events on the map.
-    clear_screen()
-    draw_line()
-    title = f"An echo stirs across {WORLD_NAME}..."
-    typewriter_effect(title)
-    draw_line()
-    events = ["shrine_prayer", "fallen_knight", "crimson_flower", "merchant_spirit", "mirror_echo"]
-
-    # NEW (v1.7): Add event by region
-    current_tile = MAP_DATA[player['y']][player['x']]
-    if current_tile == "ruins":
-        events.append("ruined_king")
-
-    event = random.choice(events)
-
-    if event == "shrine_prayer":
-        typewriter_effect("You find a small, forgotten shrine, thick with moss.")
-        typewriter_effect("A quiet melody seems to hang in the air.")
-        print("1 - Kneel and listen")
-        print("2 - Leave it be")
-        choice = safe_input("# ")
-        if choice.strip() == "1":
-            typewriter_effect("You close your eyes. The song is of safety and stone.")
-            player['hp'] = min(player['hp_max'], player['hp'] + 10)  # Heal
-            print("(You healed 10 HP.)")
-            player = codex_add(player, "shrine_memory")  # Add echo
-    elif event == "fallen_knight":
-        typewriter_effect("Beneath a withered tree lies a fallen knight...")
-        typewriter_effect("Their armor is old, but their vow feels... new.")
-        print("1 - Search their belongings")
-        if player['pot'] > 0:
-            print("2 - Leave a healing potion (1)")
-        print("3 - Pay respects and leave")
-        choice = safe_input("# ")
-        if choice.strip() == "1":
-            typewriter_effect("You find 15 Gold, but feel a pang of... something.")
-            player['gold'] += 15
-            player = codex_add(player, "fallen_knight")
-        elif choice.strip() == "2" and player['pot'] > 0:
-            typewriter_effect("You leave the potion. The air feels lighter.")
-            player['pot'] -= 1
-            player = codex_add(player, "fallen_knight")  # Still add echo for interaction
-    elif event == "crimson_flower":
-        typewriter_effect("A single, impossibly crimson flower grows on a rock.")
-        print("1 - Pluck it")
-        print("2 - Touch it")
-        choice = safe_input("# ")
-        if choice.strip() == "1":
-            typewriter_effect("You pluck it. It turns to dust in your hand.")
-            player['hp'] = max(1, player['hp'] - 5)  # Take minor damage
-            print("(You lost 5 HP.)")
-        elif choice.strip() == "2":
-            typewriter_effect("You touch a petal. It feels like a fresh wound, but also a seed.")
-            player = codex_add(player, "crimson_flower")
-    elif event == "merchant_spirit":
-        typewriter_effect("A small, lantern-eyed spirit appears on the path.")
-        typewriter_effect("It holds out a single Elixir.")
-        print("1 - 'I'll take it.' (50 Gold)")
-        print("2 - 'No thank you.'")
-        choice = safe_input("# ")
-        if choice.strip() == "1" and player['gold'] >= 50:
-            typewriter_effect("It smiles without lips and vanishes.")
-            player['gold'] -= 50
-            player['elix'] += 1
-            player = codex_add(player, "merchant_spirit")
-        elif choice.strip() == "1" and player['gold'] < 50:
-            typewriter_effect("You can't afford it. It vanishes.")
-        else:  # Chose 2 or invalid
-            typewriter_effect("It vanishes.")
-    elif event == "mirror_echo":
-        typewriter_effect("You find a shard of a mirror.")
-        typewriter_effect("Your reflection is... different. Stronger.")
-        print("1 - Reach into the reflection")
-        print("2 - Shatter the shard")
-        choice = safe_input("# ")
-        if choice.strip() == "1":
-            typewriter_effect("Your hand meets... yourself. You feel a jolt of power.")
-            player['bonus_atk'] = player.get('bonus_atk', 0) + 1  # Increase permanent bonus ATK
-            player = recalculate_player_stats(player)  # Recalculate totals
-            print(f"(You gained +1 Bonus ATK! Total ATK is now {player['total_atk']}!)")
-            player = codex_add(player, "mirror_echo")
-        else:  # Chose 2 or invalid
-            typewriter_effect("You shatter the shard. The echo is gone.")
-
-    elif event == "ruined_king":
-        typewriter_effect("You find a tarnished, broken crown resting on a pile of rubble.")
-        typewriter_effect("As you touch it, you feel a wave of immense sadness and authority.")
-        print("1 - Take the memory")
-        print("2 - Leave it in peace")
-        choice = safe_input("# ")
-        if choice.strip() == "1":
-            typewriter_effect("You absorb the echo of the Fallen King.")
-            player = codex_add(player, "ruined_king_memory")
-        else:
-            typewriter_effect("You back away slowly, leaving the crown to its rest.")
-
-    safe_input("\n> Press Enter to continue...")
-    return "playing", player  # Always return to playing state, updated player
-
-
-# v1.8: REFACTORED to handle quest chains
-def check_quest_completion(player, quest_type, target):
-    # Checks if collecting an echo completes the current main quest objective.
-    main_q_id = player.get('main_quest_id', '')
-    main_q_data = MAIN_QUESTS.get(main_q_id, {})
-
-    if not main_q_data: return player
-
-    # Check if the quest type is COLLECT_ECHO, matches the target, and isn't already marked complete
-    is_main_quest_objective = (main_q_data.get('type') == quest_type and
-                               main_q_data.get('target_codex') == target and
-                               main_q_id not in player['quest_progress'])
-
-    if is_main_quest_objective:
-        print(f"\nMain Quest Completed: {main_q_data.get('title')}")
-        player['quest_progress'][main_q_id] = 1  # Mark as complete
-
-        # Grant rewards (if any)
-        reward_g = main_q_data.get('reward_gold', 0)
-        reward_x = main_q_data.get('reward_xp', 0)
-        if reward_g > 0 or reward_x > 0:
-            player['gold'] += reward_g
-            player['xp'] += reward_x
-            print(f"Reward: {reward_g} Gold, {reward_x} XP!")
-            player = handle_level_up(player)  # Check for level up
-
-        # --- v1.8: Quest Chain Logic ---
-        next_quest_id = None
-        if main_q_id == "MQ_04":
-            next_quest_id = "MQ_04_COMPLETE"
-        elif main_q_id == "MQ_05_HERO_A":
-            next_quest_id = "MQ_05_HERO_B"
-        elif main_q_id == "MQ_05_HERO_B":
-            next_quest_id = "MQ_05_HERO_C"
-            player['quest_progress']["MQ_05_HERO_C"] = 0  # Initialize kill quest
-
-        if next_quest_id:
-            player['main_quest_id'] = next_quest_id
-            print(f"Main Quest Updated! (Check Quest Log for details)")
-        # --- End v1.8 Logic ---
-
-        safe_input("> ")
-
-    # Check side quests (v1.8: Farmer Quest)
-    for q_id in player.get('active_side_quests', [])[:]:
-        quest = SIDE_QUEST_POOL.get(q_id, {})
-        if (quest.get('type') == quest_type and
-                quest.get('target_codex') == target and
-                player['quest_progress'].get(q_id, 0) == 0):  # Check if not already complete
-
-            player['quest_progress'][q_id] = 1  # Mark as complete
-            print(f"Side Quest: '{quest.get('title', 'Unknown')}' objective complete! Turn in.")
-            safe_input("> ")
-
-    return player
-
-
-## MODIFIED (v1.6.4): Added Echo Focus menu, safe_input ##
-def handle_town(player):
-    # Handles interactions within the Town Centre.
-    while True:
-        clear_screen()
-        draw_line()
-        print("TOWN CENTRE - Auren")
-        draw_line()
-        print("You step into the town square. People move with practiced care.")
-        draw_line()
-        print("1 - Rest at the Inn (Full HP) - 15 Gold")
-        print("2 - Visit the Quest Board")
-        print("3 - Visit the Echo Guild")
-        print("4 - Talk to the Locals")
-        print("5 - Leave Town")
-        draw_line()
-        print(f"HP: {player['hp']}/{player['hp_max']} | GOLD: {player['gold']}")
-        draw_line()
-        choice = safe_input("# ")
-
-        if choice.strip() == "1":  # Rest at Inn
-            if player['gold'] >= 15:
-                player['gold'] -= 15;
-                player['hp'] = player['hp_max']  # Full heal
-                # Clear negative status effects (dot, control)
-                player['active_effects'] = [e for e in player.get('active_effects', []) if
-                                            EFFECTS_DB.get(e['id'], {}).get('type') == 'hot']
-                typewriter_effect("You sleep in a creaking bed. The world feels gentle.")
-                print("(Negative status effects have been cleared.)")
-                safe_input("> ")
-            else:
-                typewriter_effect("You lack the coin for the inn.")
-                safe_input("> ")
-        elif choice.strip() == "2":  # Quest Board
-            player = handle_quest_board(player)
-            # handle_quest_board now returns player, loop continues
-        elif choice.strip() == "3":  # Echo Guild
-            clear_screen()
-            draw_line()
-            print("ECHO GUILD - Archivist Lira")
-            draw_line()
-            typewriter_effect("'The echoes you gather... they mend what memory forgot,' Lira says softly.")
-            draw_line()
-            print("1 - Browse Echo Codex (Read Only)")
-            print("2 - Ask Lira about the land (Quest)")
-            print("3 - Focus on a Memory (Change Echo)")  # Option to change equipped echo
-            print("4 - Return to Town Square")
-            sub = safe_input("# ")
-
-            if sub.strip() == "1":  # Read Codex
-                show_codex(player)
-                # show_codex returns None, loop continues
-
-
-            elif sub.strip() == "2":  # Talk to Lira (Quests)
-                main_q_id = player.get('main_quest_id')
-                main_q_data = MAIN_QUESTS.get(main_q_id, {})
-                # --- TUTORIAL (v1.7.1): Integrated Tutorial Logic ---
-                if main_q_id == "MQ_02" and main_q_data.get('target') == "LIRA":
-                    # --- TUTORIAL (PART 1: Give Echo) ---
-                    if "ECHO_GIFT_01" not in player.get('codex', []):
-                        typewriter_effect("'The Mayor sent you? Good. The echoes are restless.'")
-                        typewriter_effect("'But you are not yet strong enough to hear them fully.'")
-                        typewriter_effect("'To fight the echoes, you must use their own memories.'")
-                        typewriter_effect(
-                            "'Take this. It is 'The First Echo' that answered your call.'")
-                        player = codex_add(player, "ECHO_GIFT_01")
-                        print("\n(Lira gives you your first Echo!)")
-
-                    # --- TUTORIAL (PART 2: Check Focus & Start Battle) ---
-                    if player['equipped_echo'] == "ECHO_GIFT_01":
-                        typewriter_effect(
-                            "'Excellent. You feel the memory's power, yes? A faint boost to your strength?'")
-                        typewriter_effect("'Now, you must prove your strength. A true test.'")
-                        player['main_quest_id'] = "MQ_03"  # Advance quest
-                        player['quest_progress']['MQ_03'] = 0  # Initialize progress
-                        print("\n(Main Quest Updated!)")
-                        safe_input("> ")
-                        print("\n(Lira leads you to the training yard...)")
-                        safe_input("> ")
-                        # Trigger the tutorial battle
-                        player = handle_tutorial_battle(player)
-                        # After battle, Lira gives final words
-                        clear_screen()
-                        draw_line()
-                        print("ECHO GUILD - Archivist Lira")
-                        draw_line()
-                        typewriter_effect("'Well done,' Lira says, nodding.")
-                        typewriter_effect("'You have learned the basics. Now, go. Fulfill the quest.'")
-                        typewriter_effect("'The Goblins are in the hills. Good luck.'")
-                    else:  # Player hasn't focused the echo yet
-                        typewriter_effect("'You have the memory, but you must *focus* it.'")
-                        typewriter_effect("'Select option 3, 'Focus on a Memory', and choose the 'The First Echo'.'")
-                        typewriter_effect("'Return to me once you have focused it.'")
-                # --- END TUTORIAL LOGIC ---
-                elif main_q_id == "MQ_03":
-                    typewriter_effect("'You must prove your strength. The Goblins in the hills...'")
-                elif main_q_id == "MQ_04":
-                    typewriter_effect("'Find the Knight's Echo in the forest. It calls to you.'")
-                # --- v1.8: Hero Path Quest Dialogue ---
-                elif main_q_id == "MQ_05_HERO_A":
-                    typewriter_effect(
-                        "'You chose wisely. To master the seal, you must first master patience. Find the Shrine of Moss.'")
-                elif main_q_id == "MQ_05_HERO_B":
-                    typewriter_effect(
-                        "'Good. Now, you must understand *why* the seal was made. Find the Cultist's Diary at the cave entrance.'")
-                elif main_q_id == "MQ_05_HERO_C":
-                    typewriter_effect(
-                        "'You are ready. I have summoned a Sentinel in the hills. Prove your strength and wisdom.'")
-                # --- End v1.8 ---
-                else:  # Generic dialogue
-                    typewriter_effect("Lira speaks: 'Collect enough, and Auren will remember.'")
-                safe_input("> ")
-            elif sub.strip() == "3":  # Focus Echo
-                player = handle_echo_focus_menu(player)
-                # handle_echo_focus_menu returns updated player, loop continues
-
-            elif sub.strip() == "4":  # Return
-                continue  # Go back to outer loop (Town Centre menu)
-            # Implicit else: Invalid input, loop continues in Echo Guild menu
-
-        elif choice.strip() == "4":  # Talk to Locals
-            # v1.8: Dialogue changes based on world state
-            lines = []
-            if player['main_quest_id'] == "MQ_05_RECKLESS":
-                lines = [
-                    "'The sky... it feels wrong! What did you do at the cave?'",
-                    "'Monsters are everywhere! The guards are overwhelmed! This is a nightmare...'",
-                    "'The Mayor locked himself in his office. He looks terrified...'"
-                ]
-            elif player['main_quest_id'].startswith("MQ_05_HERO"):
-                lines = [
-                    "'We are all counting on you. Lira says you are taking the wise path.'",
-                    "'The air feels tense, but stable. Thank you for your caution, traveler.'",
-                ]
-            else:
-                lines = [
-                    "An old woman whispers about a path behind the inn that glows at dusk.",
-                    "Children play near the fountain, singing words that sound like an old hymn.",
-                    "A blacksmith hums a tune that used to call warriors home."
-                ]
-
-            line = random.choice(lines)
-            typewriter_effect(line)
-            # Chance to gain the Town Rumor echo
-            if random.random() < 0.30 and not player['main_quest_id'] == "MQ_05_RECKLESS":
-                player = codex_add(player, "town_rumor")
-            safe_input("> ")
-        elif choice.strip() == "5":  # Leave Town
-            return "playing", player, None  # Return state, player, and None (no enemy)
-        # Implicit else: Invalid input, loop continues in Town Centre menu
-
-
-## NEW (v1.6.4): Menu to change focused Echo, uses safe_input ##
-def handle_echo_focus_menu(player):
-    # Handles the menu for selecting the single focused Echo.
-    while True:
-        clear_screen()
-        draw_line()
-        print("FOCUS ON A MEMORY")
-        draw_line()
-        typewriter_effect("'Which memory... which part of Auren... do you wish to become?'", delay=0.02)
-        draw_line()
-
-        # Display currently focused echo
-        print("--- CURRENTLY FOCUSED ---")
-        current_echo_id = player.get('equipped_echo')
-        if not current_echo_id:
-            print("None. (Your mind is clear)")
-        else:
-            echo_name = CODEX_ENTRIES.get(current_echo_id, {}).get('title', 'Unknown')
-            print(f"- {echo_name}")
-        draw_line()
-
-        # Display list of collected echoes to choose from
-        print("--- CHOOSE A MEMORY TO FOCUS ON ---")
-        collected_echoes = sorted(player.get('codex', []))  # Sort for consistent list order
-        if not collected_echoes:
-            print("You have not collected any memories to focus on.")
-        else:
-            for i, eid in enumerate(collected_echoes, 1):
-                entry = CODEX_ENTRIES.get(eid, {})
-                # Show buff summary for easier selection
-                buff_text = ""
-                if entry.get('buff'):
-                    buff_text = f" (Buff: {entry['buff']})"
-                # Add check for other effect types if needed in future
-                print(f"[{i}] {entry.get('title', 'Unknown')}{buff_text}")
-
-        draw_line()
-        print("Enter number to Focus, '99' to Unfocus, or '0' to return.")
-        choice = safe_input("# ")
-
-        if choice == '0':
-            return player  # Return updated player to caller (handle_town)
-
-        elif choice == '99':  # Unfocus current echo
-            if player['equipped_echo'] is None:
-                print("You are already unfocused.")
-            else:
-                player['equipped_echo'] = None
-                print("Memory unfocused. Your mind is clear.")
-                player = recalculate_player_stats(player)  # Recalculate stats
-            safe_input("> ")
-
-        elif choice.strip().isdigit():  # Focus a new echo
-            idx = int(choice.strip()) - 1
-            if 0 <= idx < len(collected_echoes):
-                eid_to_focus = collected_echoes[idx]
-
-                if eid_to_focus == player['equipped_echo']:
-                    print(f"You are already focusing on '{CODEX_ENTRIES[eid_to_focus]['title']}'.")
-                else:
-                    player['equipped_echo'] = eid_to_focus
-                    print(f"You focus your mind on '{CODEX_ENTRIES[eid_to_focus]['title']}'.")
-                    player = recalculate_player_stats(player)  # Recalculate stats
-                safe_input("> ")
-            else:
-                print("Invalid number.")
-                safe_input("> ")
-        else:
-            print("Invalid input.")
-            safe_input("> ")
-        # Loop continues to refresh the menu
-
-
-def handle_quest_board(player):
-    # Handles interactions with the Quest Board in town.
-    while True:
-        clear_screen()
-        draw_line()
-        print("QUEST BOARD")
-        draw_line()
-        player_level = player['level']
-
-        # Check for completed quests
-        completed_quests = []
-        active_quests = player.get('active_side_quests', [])
-
-        if active_quests:
-            print("--- Active Bounties ---")
-            for q_id in active_quests:
-                quest = SIDE_QUEST_POOL.get(q_id)
-                if not quest: continue
-                progress = player['quest_progress'].get(q_id, 0)
-
-                # Handle different quest types
-                if quest.get('type') == 'KILL':
-                    needed = quest.get('needed', 0)
-                    print(f"> {quest.get('title', 'Unknown Quest')} ({progress}/{needed})")
-                    if progress >= needed:
-                        completed_quests.append(q_id)
-                elif quest.get('type') == 'COLLECT_ECHO':  # v1.8: Handle Farmer Quest
-                    needed = 1
-                    print(f"> {quest.get('title', 'Unknown Quest')} ({progress}/{needed})")
-                    if progress >= needed:
-                        completed_quests.append(q_id)
-        else:
-            print("You have no active side quests.")
-
-        draw_line()
-        # Turn in completed quests
-        if completed_quests:
-            print("You have completed bounties to turn in!")
-            for q_id in completed_quests:
-                quest = SIDE_QUEST_POOL[q_id]
-                typewriter_effect(f"Turning in: {quest.get('title', 'Unknown Quest')}...")
-                reward_g = quest.get('reward_gold', 0)
-                reward_x = quest.get('reward_xp', 0)
-                player['gold'] += reward_g
-                player['xp'] += reward_x
-                print(f"Reward: {reward_g} Gold, {reward_x} XP!")
-
-                player['active_side_quests'].remove(q_id)  # Remove from active list
-                if q_id not in player.get('completed_side_quests', []):  # v1.8: Add to history
-                    player.setdefault('completed_side_quests', []).append(q_id)
-                if q_id in player['quest_progress']:
-                    del player['quest_progress'][q_id]  # Clean up progress entry
-
-            player = handle_level_up(player)  # Check level up after XP gain
-            safe_input("\n> Press Enter to continue...")
-            continue  # Refresh the board
-
-        # Generate and display available quests
-        print("--- Available Bounties ---")
-        available_pool = []
-        # v1.8: REFACTORED to filter quests
-        for q_id, quest in SIDE_QUEST_POOL.items():
-            if q_id in active_quests: continue  # Skip already active quests
-
-            # --- v1.8: Quest Filtering Logic ---
-            # 1. Skip non-board quests
-            if quest.get("is_board_quest", True) == False:
-                continue
-
-            # 2. Check Exclusive Path
-            quest_path = quest.get("exclusive_path")
-            main_q = player['main_quest_id']
-
-            if quest_path == "RECKLESS" and main_q != "MQ_05_RECKLESS":
-                continue  # Skip if not on Reckless Path
-            if quest_path == "HERO" and not main_q.startswith("MQ_05_HERO"):
-                continue  # Skip if not on Hero Path
-            # --- End v1.8 Logic ---
-
-            quest_min_level = quest.get('min_level', 1)
-            # Show quests appropriate for player level (within a range)
-            if (player_level >= quest_min_level) and (player_level <= quest_min_level + 5):
-                available_pool.append(q_id)
-
-        # Handle cases where no quests are available or player has max quests
-        if not available_pool or len(active_quests) >= 3:
-            if len(active_quests) >= 3:
-                print("Your hands are full. (Max 3 bounties)")
-            else:
-                print("No new bounties appropriate for your level right now.")
-            print("\n0 - Back to Town")
-            choice = safe_input("# ")
-            if choice == "0": return player  # Return player to caller (handle_town)
-            # Otherwise loop continues
-        else:
-            # Display available quests (up to 2)
-            choices = random.sample(available_pool, k=min(len(available_pool), 2))
-            for i, q_id in enumerate(choices, 1):
-                quest = SIDE_QUEST_POOL[q_id]
-                print(f"{i} - Accept: {quest.get('title', 'Unknown Quest')} (Lv. {quest.get('min_level', 1)})")
-                print(f"    Reward: {quest.get('reward_gold', 0)} Gold, {quest.get('reward_xp', 0)} XP")
-            print("0 - Back to Town")
-
-            choice = safe_input("# ")
-            if choice == "0": return player  # Return player to caller (handle_town)
-            if choice.strip().isdigit() and 0 < int(choice) <= len(choices):
-                q_id_to_accept = choices[int(choice) - 1]
-                player['active_side_quests'].append(q_id_to_accept)
-                player['quest_progress'][q_id_to_accept] = 0  # Initialize progress
-                print(f"Accepted bounty: {SIDE_QUEST_POOL[q_id_to_accept]['title']}")
-                safe_input("> ")
-                continue  # Refresh the board after accepting
-            # Invalid input, loop continues
-        # Fallback return in case of unexpected flow
-        return player
-
-
-def handle_quest_log(player):
-    # Displays the current main and side quests.
-    clear_screen()
-    draw_line()
-    print("QUEST LOG")
-    draw_line()
-
-    # Display Main Quest
-    print("--- Main Quest ---")
-    main_q_id = player.get('main_quest_id', 'MQ_01')
-    main_q_data = MAIN_QUESTS.get(main_q_id, {})
-    if main_q_data:
-        print(f"[{main_q_data.get('title', 'Unknown Quest')}]")
-        print(f"> {main_q_data.get('desc', '...')}")
-
-        q_type = main_q_data.get('type')
-        if q_type == 'KILL':
-            progress = player['quest_progress'].get(main_q_id, 0)
-            needed = main_q_data.get('needed', 0)
-            print(f"  Progress: ({progress}/{needed})")
-        elif q_type == 'STAT_CHECK':
-            print(f"  Level: {player['level']}/{main_q_data.get('target_level', 0)}")
-            print(f"  ATK:   {player['total_atk']}/{main_q_data.get('target_atk', 0)}")
-        elif q_type == 'COLLECT_ECHO':  # v1.8: Added
-            progress = 1 if main_q_id in player['quest_progress'] else 0
-            print(f"  Progress: ({progress}/1)")
-    else:
-        print("No active main quest.")
-
-    draw_line()
-
-    # Display Side Quests
-    print("--- Side Quests (Bounties) ---")
-    active_side_quests = player.get('active_side_quests', [])
-    if not active_side_quests:
-        print("No active side quests.")
-        print("(Visit the Quest Board in Town or explore the world)")
-    else:
-        for q_id in active_side_quests:
-            quest = SIDE_QUEST_POOL.get(q_id, {})
-            progress = player['quest_progress'].get(q_id, 0)
-
-            if quest.get('type') == 'KILL':
-                needed = quest.get('needed', 0)
-                print(f"> {quest.get('title', 'Unknown')} ({progress}/{needed})")
-            elif quest.get('type') == 'COLLECT_ECHO':
-                needed = 1
-                print(f"> {quest.get('title', 'Unknown')} ({progress}/{needed})")
-            else:
-                print(f"> {quest.get('title', 'Unknown')} (In Progress)")
-
-    draw_line()
-    safe_input("> Press Enter to return...")
-    return  # Return None, caller handles state
-
-
-def handle_map_legend():
-    # Displays the map legend.
-    clear_screen()
-    draw_line()
-    print("MAP LEGEND")
-    draw_line()
-    print(f" {BIOME_ICONS.get('PLAYER', '@')} : You (Your Location)")
-    print(f" {BIOME_ICONS.get('FOG', ' ')} : Fog (Unexplored)")
-    print("\n--- Locations ---")
-    print(f" {BIOME_ICONS.get('town', 'H')} : Town Centre / Mayor's Office")
-    print(f" {BIOME_ICONS.get('shop', '$')} : Shop")
-    print(f" {BIOME_ICONS.get('cave', '∩')} : Dragon's Cave")
-    print("\n--- Terrain ---")
-    print(f" {BIOME_ICONS.get('plains', '.')} : Plains")
-    print(f" {BIOME_ICONS.get('fields', '~')} : Fields")
-    print(f" {BIOME_ICONS.get('forest', 'T')} : Forest")
-    print(f" {BIOME_ICONS.get('hills', 'n')} : Hills")
-    print(f" {BIOME_ICONS.get('mountain', '▲')} : Mountain")
-    print(f" {BIOME_ICONS.get('bridge', '=')} : Bridge")
-    print(f" {BIOME_ICONS.get('swamp', 's')} : Murky Swamp")
-    print(f" {BIOME_ICONS.get('ruins', 'R')} : Haunted Ruins")
-    draw_line()
-    safe_input("> Press Enter to return...")
-    return  # Return None, caller handles state
-
-
-def handle_help_menu():
-    # Displays the How to Play / Help screen.
-    clear_screen()
-    draw_line()
-    print("HOW TO PLAY / HELP")
-    draw_line()
-    print("\n--- 1. COMBAT BASICS ---")
-    print("  ATK: Your Attack stat. Increases damage dealt.")
-    print("  DEF: Your Defense stat. Reduces damage taken from regular attacks.")
-    print("  GUARD (Skill): Reduces all damage taken for 1 turn by 50%.")
-    print("  SKILL II: Upgraded skills (e.g., Focus Strike II) automatically replace")
-    print("              the basic version when you reach the required level.")
-
-    print("\n--- 2. STATUS EFFECTS (v1.8) ---")
-    print("  POISON: Take damage every turn. Cured by Potion or Elixir.")
-    print("  BURN  : Take damage every turn. Cured by Purify skill or Elixir.")
-    print("  BLEED : Take damage every turn. Cured by Potion or Elixir.")
-    print("  STUN  : Lose your next turn.")
-    print("  SLEEP : Lose your next turn. Wakes up when hit.")
-    print("  REGEN : Heal HP every turn.")
-    print("  HARDENED: (Enemy) Reduces damage from the next hit by 50%.")
-    print("  MANA DRAIN: (Player) Puts a random skill on cooldown.")
-
-    print("\n--- 3. ECHOES & CODEX ---")
-    print("  The Codex stores all 'Echoes' (memories) you find.")
-    print("  Visit Lira at the Echo Guild to 'Focus on a Memory'.")
-    print("  You can only Focus ONE Echo at a time.")
-    print("  The Focused Echo provides powerful passive buffs (stats, effects).")
-
-    print("\n--- 4. EXPLORATION ---")
-    print("  Some locations on the map hide secrets. If you see an option like")
-    print("  '7 - Examine...' try it to find new quests, echoes, or lore.")
-
-    draw_line()
-    safe_input("> Press Enter to return...")
-    return
-
-
-## MODIFIED (v1.6.4): Improved HP clamping for mobs ##
-## MODIFIED (v1.8): Added BURN resistance logic ##
-def process_status_effects(target, target_name):
-    # Processes status effects (DOTs, HOTs, Control) for player or enemy.
-    # Returns the updated target and a boolean indicating if stunned.
-    if 'active_effects' not in target:
-        target['active_effects'] = []
-        return target, False  # Not stunned
-
-    is_stunned = False
-
-    # Iterate over a copy of the list to allow safe removal during iteration
-    for effect in target.get('active_effects', [])[:]:
-        effect_data = EFFECTS_DB.get(effect['id'])
-        if not effect_data: continue  # Skip unknown effects
-
-        effect_type = effect_data.get('type')
-
-        if effect_type == "dot":  # Damage Over Time
-            dmg = effect_data.get('value', 0)
-
-            # --- v1.8: Refactored Burn Resistance ---
-            if effect['id'] == 'BURN' and target_name == "You":
-                resist_percent = 0.0
-                if target.get('equipment', {}).get('armor') == 'EQ_A_004':
-                    resist_percent = 0.5
-                    print("(Your Acolyte's Robe resists some of the burn damage!)")
-                elif target.get('equipped_echo') == 'dragon_cultist_diary':
-                    resist_percent = 0.25
-                    print("(Your echo of the Cultist's Diary dampens the flame!)")
-
-                if resist_percent > 0.0:
-                    dmg = int(dmg * (1.0 - resist_percent))
-                    if dmg < 1: dmg = 1
-            # --- End v1.8 ---
-
-            target['hp'] -= dmg
-            print(f"{target_name} {effect_data.get('msg_tick', 'takes damage.')}")
-
-        elif effect_type == "hot":  # Heal Over Time
-            heal = effect_data.get('value', 0)
-            max_hp = target.get('hp_max', target['hp'] + heal)
-            target['hp'] = min(max_hp, target['hp'] + heal)
-            print(f"{target_name} {effect_data.get('msg_tick', 'heals.')}")
-
-        elif effect['id'] == "MANA_DRAIN" and target_name == "You":
-            print(f"Your energy is drained!")
-
-        # Decrement turn counter
-        effect['turns'] -= 1
-        # Remove effect if duration runs out
-        if effect['turns'] <= 0:
-            target['active_effects'].remove(effect)
-            print(f"{target_name} is no longer {effect_data.get('name', 'affected')}.")
-
-    # Check for Stun/Sleep *after* processing other effects
-    for effect in target.get('active_effects', []):
-        if effect['id'] == "STUN" and EFFECTS_DB.get(effect['id'], {}).get('type') == 'control':
-            print(f"{target_name} {EFFECTS_DB[effect['id']].get('msg_tick', 'is stunned!')}")
-            is_stunned = True
-            break
-        if effect['id'] == "SLEEP" and EFFECTS_DB.get(effect['id'], {}).get('type') == 'control':  # v1.8
-            print(f"{target_name} {EFFECTS_DB[effect['id']].get('msg_tick', 'is asleep!')}")
-            is_stunned = True
-            break
-
-    return target, is_stunned
-
-
-## MODIFIED (v1.6.4): Prevents duplicate effect stacking ##
-## MODIFIED (v1.8): Added SLEEP echo logic ##
-def apply_hit_effects(attacker, defender, attacker_name, defender_name):
-    # Applies status effects from attacker (player or enemy) to defender.
-    effects_to_try = []
-
-    # Gather potential effects from Player (Weapon, Charm, Echo)
-    if attacker_name == "You":
-        wp_id = attacker['equipment'].get('weapon')
-        if wp_id and 'effect_on_hit' in EQUIPMENT_DB.get(wp_id, {}):
-            effects_to_try.append(EQUIPMENT_DB[wp_id]['effect_on_hit'])
-
-        ch_id = attacker['equipment'].get('charm')
-        if ch_id and 'effect_on_hit' in EQUIPMENT_DB.get(ch_id, {}):
-            effects_to_try.append(EQUIPMENT_DB[ch_id]['effect_on_hit'])
-
-        echo_id = attacker.get('equipped_echo')
-        if echo_id and 'effect_on_hit' in CODEX_ENTRIES.get(echo_id, {}):
-            effects_to_try.append(CODEX_ENTRIES[echo_id]['effect_on_hit'])
-
-    # Gather potential effects from Enemy
-    elif attacker_name != "You":
-        for effect in attacker.get('effects', []):
-            effects_to_try.append(effect)
-
-    defender.setdefault('active_effects', [])
-    applied_effect_ids = set()
-
-    for eff in effects_to_try:
-        effect_id = eff.get('id')
-        if not effect_id: continue
-
-        if random.random() < eff.get('chance', 0):
-
-            if effect_id == "MANA_DRAIN" and defender_name == "You":
-                print(f"The {attacker_name}'s attack drains your energy!")
-                skills_to_drain = [s for s in defender.get('skills_cd', {}).keys() if
-                                   s not in ["Focus Strike", "Guard"]]
-                if not skills_to_drain: skills_to_drain = ["Meditate", "Limit Break"]
-                skill_drained = random.choice(skills_to_drain)
-                set_skill_cd(defender, skill_drained, eff.get('turns', 2))
-                print(f"Your {skill_drained} skill is now on cooldown!")
-                continue
-
-            is_already_affected = False
-            for active_eff in defender['active_effects']:
-                if active_eff['id'] == effect_id:
-                    active_eff['turns'] = max(active_eff.get('turns', 0), eff.get('turns', 0))
-                    is_already_affected = True
-                    break
-
-            if not is_already_affected:
-                defender['active_effects'].append({"id": effect_id, "turns": eff.get('turns', 1)})
-                print(f"{defender_name} {EFFECTS_DB.get(effect_id, {}).get('msg_inflict', 'is affected!')}")
-
-    return defender
-
-
-## MODIFIED (v1.7): Added new mob skills ##
-## MODIFIED (v1.8): Added Auren_Sentinel logic ##
-def handle_enemy_turn(enemy, player, player_def):
-    # Handles the enemy's turn in combat.
-    enemy_name = enemy['name']
-
-    # Process enemy's status effects (poison, stun etc.)
-    enemy, is_stunned = process_status_effects(enemy, enemy_name)
-    if enemy['hp'] <= 0:
-        return enemy, player
-    if is_stunned:
-        time.sleep(1.2)
-        return enemy, player
-
-    if enemy.get('is_exhausted'):
-        print(f"The {enemy_name} is exhausted and does nothing!")
-        enemy['is_exhausted'] = False
-        time.sleep(1.2)
-        return enemy, player
-
-    used_special = False
-
-    ## NEW MOB SKILLS (v1.7) ##
-    if enemy_name == "Skeleton" and not enemy.get('is_hardened') and random.randint(1, 100) <= 30:
-        enemy['is_hardened'] = True;
-        used_special = True
-        print(
-            f"The {enemy_name} assembles a Bone Shield! Its defense hardened! (Next physical hit is halved!)")  # v1.8: text
-
-    elif enemy_name == "Ghost" and random.randint(1, 100) <= 25:
-        used_special = True
-        print(f"The {enemy_name} lets out a chilling wail, draining your spirit!")
-        skills_to_drain = [s for s in player.get('skills_cd', {}).keys() if s not in ["Focus Strike", "Guard"]]
-        if not skills_to_drain: skills_to_drain = ["Meditate", "Limit Break"]
-        skill_drained = random.choice(skills_to_drain)
-        set_skill_cd(player, skill_drained, 3)
-        print(f"Your {skill_drained} skill is now on cooldown!")
-
-    elif enemy_name == "Wraith" and random.randint(1, 100) <= 35:
-        damage = max(1, int(enemy['atk'] * 1.2) - player_def)
-        if player.get('guard'): damage = int(damage * 0.5)
-        player['hp'] -= damage
-        heal_amt = int(damage * 0.5)
-        enemy['hp'] = min(enemy['hp_max'], enemy['hp'] + heal_amt)
-        used_special = True
-        print(f"The {enemy_name} uses Life Siphon! It dealt {damage} damage and healed {heal_amt} HP!")
-
-    # --- v1.8: Auren_Sentinel Skill ---
-    elif enemy_name == "Auren_Sentinel" and not enemy.get('is_hardened') and random.randint(1, 100) <= 35:
-        enemy['is_hardened'] = True;
-        used_special = True
-        print(f"The {enemy_name} raises its shield! Its defense hardened! (Next physical hit is halved!)")
-    # --- End v1.8 ---
-
-    elif enemy_name == "Goblin Shaman" and enemy["hp"] <= (enemy["hp_max"] * 0.4) and random.randint(1, 100) <= 50:
-        heal_amt = 15
-        enemy["hp"] = min(enemy['hp_max'], enemy['hp'] + heal_amt)
-        used_special = True
-        print(f"The {enemy_name} chants wildly and heals for {heal_amt} HP!")
-
-    elif enemy_name == "Slime" and enemy["hp"] <= 12 and random.randint(1, 100) <= 50:
-        enemy["hp"] = min(enemy['hp_max'], enemy['hp'] + 5)
-        used_special = True
-        print(f"The {enemy_name} wobbles and regenerates for 5 HP!")
-    elif enemy_name == "Goblin" and enemy["hp"] <= 5 and not enemy.get('has_raged'):
-        enemy["atk"] += 2;
-        enemy['has_raged'] = True;
-        used_special = True
-        print(f"The {enemy_name} flies into a rage! Its ATK increases by 2!")
-    elif enemy_name == "Wolf" and random.randint(1, 100) <= 30:
-        print(f"The {enemy_name} lunges forward with a swift strike!")
-        used_special = True
-        for _ in range(2):
-            damage = max(1, int(enemy['atk'] * 0.75) - player_def)
-            if player.get('guard'): damage = int(damage * 0.5)
-            player['hp'] -= damage
-            print(f"It hits you for {damage} damage!");
-            time.sleep(0.6)
-            if player['hp'] <= 0: break
-    elif enemy_name == "Orc" and random.randint(1, 100) <= 40:
-        damage = max(1, int(enemy['atk'] * 1.8) - player_def)
-        if player.get('guard'): damage = int(damage * 0.5)
-        player['hp'] -= damage
-        enemy['is_exhausted'] = True;
-        used_special = True
-        print(f"The {enemy_name} delivers a brutal slam for {damage} damage!")
-        print("It seems exhausted after that massive attack...")
-    elif enemy_name == "Golem" and random.randint(1, 100) <= 30 and not enemy.get('is_hardened'):
-        enemy['is_hardened'] = True;
-        used_special = True
-        print(
-            f"The {enemy_name}'s stone body glows. It has hardened its defense! (Next physical hit is halved!)")  # v1.8: text
-    elif enemy_name in ["Dragon", "Dragon_WorldBoss", "Fire Slime"] and random.randint(1, 100) <= 35:
-        dmg_base = 15 if "Dragon" in enemy_name else 5
-        if player.get('guard'): dmg_base = int(dmg_base * 0.5)
-        damage = max(1, dmg_base - player_def)
-
-        # v1.8: Refactored burn resist check
-        resist_percent = 0.0
-        if player.get('equipment', {}).get('armor') == 'EQ_A_004':
-            resist_percent = 0.5
-            print("(Your Acolyte's Robe resists some of the fire damage!)")
-        elif player.get('equipped_echo') == 'dragon_cultist_diary':
-            resist_percent = 0.25
-            print("(Your echo of the Cultist's Diary dampens the flame!)")
-        if resist_percent > 0.0:
-            damage = int(damage * (1.0 - resist_percent))
-            if damage < 1: damage = 1
-
-        player['hp'] -= damage;
-        used_special = True
-        print(f"The {enemy_name} breathes FIRE! You take {damage} damage!")
-    # --- End Special Attack Logic ---
-
-    # Regular Attack
-    if not used_special:
-        if player.get('equipment', {}).get('charm') == 'EQ_C_004' and random.random() < 0.10:
-            print(f"You evaded the {enemy_name}'s attack thanks to your Ghostly Pendant!")
-        else:
-            damage_dealt = max(1, enemy['atk'] - player_def)
-            if player.get('guard'):
-                damage_dealt = int(damage_dealt * 0.5)
-            player['hp'] -= damage_dealt
-            print(f"The {enemy_name} dealt {damage_dealt} damage to {player['name']}.")
-
-            # v1.8: Wake up on hit
-            for eff in player['active_effects'][:]:
-                if eff['id'] == 'SLEEP':
-                    player['active_effects'].remove(eff)
-                    print("You were woken up by the attack!")
-
-    # Apply on-hit effects
-    player = apply_hit_effects(enemy, player, enemy_name, "You")
-
-    player['guard'] = False
-    time.sleep(1.2)
-    player['hp'] = max(0, player['hp'])
-    enemy['hp'] = max(0, enemy['hp'])
-    return enemy, player
-
-
-def game_over(player):
-    # Handles the game over sequence. Returns updated player if respawning, None otherwise.
-    print("\n────────────────────────────")
-    time.sleep(1)
-    print(" You fall to your knees...")
-    time.sleep(1.5)
-    print(" The light fades from your eyes.")
-    time.sleep(1.5)
-    print("\n Auren watches in silence.")
-    time.sleep(2)
-
-    codex_entries = len(player.get("codex", []))
-    if codex_entries == 0:
-        print("\n > 'The world barely remembers you.'")
-    elif codex_entries < 3:
-        print("\n > 'The world still remembers what you couldn’t finish.'")
-    else:
-        print("\n > 'Even in silence, your story will be remembered.'")
-
-    print("\n────────────────────────────")
-    time.sleep(2)
-    print(" GAME OVER")
-    print("────────────────────────────\n")
-    time.sleep(2)
-
-    if player.get("respawned", False):
-        print(" The echoes fall silent. No light answers you this time.\n")
-        time.sleep(2)
-        print(" Your name fades forever into Auren.\n")
-        time.sleep(2)
-        return None
-
-    while True:
-        choice = safe_input("Do you wish to let the world forget you? (y/n): ").strip().lower()
-        if choice == "y":
-            print("\n The echo fades... completely.")
-            time.sleep(2)
-            return None
-        elif choice == "n":
-            print("\n A faint light remains...")
-            time.sleep(2)
-            player["hp"] = max(20, player["hp_max"] // 2)
-            player["gold"] = player["gold"] // 2
-            player["x"], player["y"] = 2, 3
-            player["respawned"] = True
-            player["active_effects"] = []
-            print(" HP and Gold reduced by half.")
-            print(" Returned to Town Centre.")
-            print(" The world will not remember you again.\n")
-            time.sleep(2)
-            return player
-        else:
-            print(" Please choose y or n.")
-
-
-## NEW (v1.7.1): Scripted tutorial battle function ##
-def handle_tutorial_battle(player):
-    """
-    A scripted, step-by-step tutorial battle guided by Lira.
-    """
-    enemy = copy.deepcopy(MOBS["Tutorial_Dummy"])
-    enemy['hp_max'] = enemy['hp']
-    enemy['name'] = "Training Dummy"
-    enemy.update({'active_effects': []})
-
-    player['pot'] = max(1, player['pot'])
-
-    temp_level_up = False
-    if not skill_available(player, "Focus Strike"):
-        player['level'] = 3
-        temp_level_up = True
-        print("(Lira temporarily grants you the memory of 'Focus Strike'!)")
-        time.sleep(1.2)
-
-    player = recalculate_player_stats(player)
-    battle_atk, battle_def = player['total_atk'], player['total_def']
-    player['hp'] = player['hp_max']
-
-    tutorial_step = 1
-    is_stunned = False
-
-    while True:
-        clear_screen();
-        draw_line()
-        print(f"TRAINING YARD - Defeat the {enemy['name']}");
-        draw_line()
-        print(f"{enemy['name']}'s HP: {enemy['hp']}/{enemy['hp_max']}")
-        print(f"{player['name']}'s HP: {player['hp']}/{player['hp_max']}");
-        draw_line()
-
-        if tutorial_step == 1:
-            typewriter_effect("Lira: 'This is a Training Dummy. First, let's practice a basic ATTACK.'", 0.02)
-        elif tutorial_step == 2:
-            typewriter_effect("Lira: 'Good. Now, let's try a SKILL. Skills are powerful but have cooldowns.'", 0.02)
-        elif tutorial_step == 3:
-            typewriter_effect("Lira: 'Well done. The dummy will hit back, but it's weak.'", 0.02)
-            typewriter_effect("Lira: 'If you get low on HP, use a POTION. Try it now.'", 0.02)
-        elif tutorial_step == 4:
-            typewriter_effect("Lira: 'Excellent. You have learned the basics. Now, defeat the dummy.'", 0.02)
-
-        draw_line()
-
-        choice = ""
-        if not is_stunned:
-            if tutorial_step == 1:
-                print("1 - ATTACK")
-            elif tutorial_step == 2:
-                print("S - USE SKILL (Focus Strike)")
-            elif tutorial_step == 3:
-                print(f"2 - USE POTION ({player['pot']} left)")
-            elif tutorial_step >= 4:
-                if skill_available(player, "Focus Strike"): print("S - USE SKILL")
-                print("1 - ATTACK")
-                if player['pot'] > 0: print(f"2 - USE POTION ({player['pot']} left)")
-
-            draw_line();
-            choice = safe_input("# ")
-
-        action_taken = False
-        if not is_stunned:
-            if choice == "1" and tutorial_step in [1, 4]:  # Attack
-                damage = battle_atk
-                enemy['hp'] -= damage
-                print(f"You dealt {damage} damage.")
-                action_taken = True
-                if tutorial_step == 1: tutorial_step = 2
-
-            elif choice.upper() == "S" and tutorial_step in [2, 4]:  # Skill
-                if skill_available(player, "Focus Strike"):
-                    if skill_on_cooldown(player, "Focus Strike"):
-                        print("Lira: 'That skill is on cooldown. Wait for it to recover.'")
-                        time.sleep(1)
-                    else:
-                        damage = int(battle_atk * 1.8)
-                        enemy['hp'] -= damage
-                        set_skill_cd(player, "Focus Strike", 2)
-                        print(f"You used Focus Strike for {damage} damage!")
-                        action_taken = True
-                        if tutorial_step == 2: tutorial_step = 3
-                else:
-                    print("Lira: 'You don't have that skill ready.'")
-                    time.sleep(1)
-
-            elif choice == "2" and player['pot'] > 0 and tutorial_step in [3, 4]:  # Use Potion
-                player['pot'] -= 1;
-                player['hp'] = min(player['hp_max'], player['hp'] + 25)
-                print("HP refilled.")
-                action_taken = True
-                if tutorial_step == 3: tutorial_step = 4
-
-            elif not choice:
-                pass
-            else:
-                print("Lira: 'That's not the right action right now. Follow the instructions.'");
-                time.sleep(1.2);
-                continue
-
-        if not action_taken and not is_stunned:
-            continue
-
-        time.sleep(1)
-
-        if enemy['hp'] <= 0:
-            print(f"You defeated the {enemy['name']}!")
-            safe_input("> ")
-            if temp_level_up:
-                player['level'] = 1
-                player = recalculate_player_stats(player)
-            return player
-
-        if tutorial_step > 2:
-            damage_dealt = max(0, enemy['atk'] - battle_def)
-            player['hp'] -= damage_dealt
-            print(f"The {enemy['name']} hits you for {damage_dealt} damage.")
-            time.sleep(1.2)
-
-        if player['hp'] <= 0:
-            print("Lira: 'Don't worry, this is just training.'")
-            player['hp'] = player['hp_max']
-            print("(You are fully healed.)")
-            time.sleep(1)
-
-        decrement_skill_cooldowns(player)
-
-
-## MODIFIED (v1.7): Handles skill upgrades and new skills ##
-## MODIFIED (v1.8): Handles Main Quest chain KILL quests ##
-def handle_battle(player, enemy_name):
-    # Main combat loop handler.
-    enemy = copy.deepcopy(MOBS[enemy_name])
-    enemy['hp_max'] = enemy['hp']
-    enemy['name'] = enemy_name
-    enemy.update({'is_hardened': False, 'is_exhausted': False, 'has_raged': False, 'active_effects': []})
-
-    player = recalculate_player_stats(player)
-
-    echo_id = player.get('equipped_echo')
-    if echo_id:
-        echo_data = CODEX_ENTRIES.get(echo_id, {})
-        if 'combat_effect' in echo_data:
-            eff = echo_data['combat_effect']
-            is_already_affected = False
-            for active_eff in player.get('active_effects', []):
-                if active_eff['id'] == eff['id']:
-                    is_already_affected = True
-                    break
-            if not is_already_affected:
-                player.setdefault('active_effects', []).append(
-                    {"id": eff['id'], "turns": eff.get('turns', 99)})
-                print(f"Your focused memory ({echo_data.get('title', 'Unknown')}) activates {eff.get('id', '?')}!")
-                time.sleep(1)
-
-    battle_atk, battle_def = player['total_atk'], player['total_def']
-
-    if player['active_buff']:
-        clear_screen();
-        draw_line()
-        if player['active_buff'] == "rage":
-            battle_atk += 5;
-            print("The Rage Potion takes effect! ATK boosted!")
-        elif player['active_buff'] == "stone":
-            battle_def += 2;
-            print("The Stone Skin Potion takes effect! DEF boosted!")
-        player['active_buff'] = None
-        draw_line();
-        safe_input("> Press Enter to start...")
-
-    # Main Battle Loop
-    while True:
-        clear_screen();
-        draw_line()
-        print(f"Defeat the {enemy_name}!");
-        draw_line()
-
-        # Display Enemy HP and Status Effects
-        enemy_status = ""
-        if enemy.get('active_effects'):
-            enemy_status_list = [e['id'] for e in enemy['active_effects']]
-            if enemy.get('is_hardened'): enemy_status_list.append("HARDENED")
-            enemy_status = f" ({', '.join(enemy_status_list)})"
-        elif enemy.get('is_hardened'):
-            enemy_status = " (HARDENED)"
-        print(f"{enemy_name}'s HP: {enemy['hp']}/{enemy['hp_max']}{enemy_status}")
-
-        # Display Player HP and Status Effects
-        player_status = ""
-        if player.get('active_effects'):
-            player_status = f" ({', '.join([e['id'] for e in player['active_effects']])})"
-        print(f"{player['name']}'s HP: {player['hp']}/{player['hp_max']}{player_status}");
-        draw_line()
-
-        # --- PLAYER'S TURN ---
-        player, is_stunned = process_status_effects(player, "You")
-        if player['hp'] <= 0:
-            player = game_over(player)
-            if player is None: return "game_over", None
-            return "playing", player
-
-        choice = ""
-        is_skipping = False
-        if player.get('skip_next'):
-            print("(You are focused — you will skip this turn to gather strength.)")
-            player['skip_next'] = False
-            is_skipping = True
-        if is_stunned:
-            print("You are stunned and cannot act!")
-            time.sleep(1)
-        elif is_skipping:
-            print("(You are focused — you will skip this turn to gather strength.)")
-            time.sleep(1)
-        else:
-            # Display Action Menu
-            available_skills = []
-            if skill_available(player, "Focus Strike II"):
-                available_skills.append("Focus Strike II")
-            elif skill_available(player, "Focus Strike"):
-                available_skills.append("Focus Strike")
-
-            if skill_available(player, "Guard II"):
-                available_skills.append("Guard II")
-            elif skill_available(player, "Guard"):
-                available_skills.append("Guard")
-
-            if skill_available(player, "Meditate II"):
-                available_skills.append("Meditate II")
-            elif skill_available(player, "Meditate"):
-                available_skills.append("Meditate")
-
-            if skill_available(player, "Limit Break"): available_skills.append("Limit Break")
-            if skill_available(player, "Purify"): available_skills.append("Purify")
-            if skill_available(player, "Reflected Strike"): available_skills.append("Reflected Strike")
-
-            if available_skills: print("S - USE SKILL")
-            print("1 - ATTACK")
-            if player['pot'] > 0: print(f"2 - USE POTION ({player['pot']} left)")
-            if player['elix'] > 0: print(f"3 - USE ELIXIR ({player['elix']} left)")
-            draw_line();
-            choice = safe_input("# ")
-
-        # Execute Player Action
-        if not is_stunned and not is_skipping:
-
-            # v1.8: Remove SLEEP on hit
-            is_woken_up = False
-            for eff in enemy['active_effects'][:]:
-                if eff['id'] == 'SLEEP':
-                    enemy['active_effects'].remove(eff)
-                    is_woken_up = True
-
-            if choice == "1":  # Attack
-                damage = battle_atk
-                if enemy.get('is_hardened'):
-                    print("Your attack clangs against the hardened body!")
-                    damage = max(1, int(damage / 2));
-                    enemy['is_hardened'] = False
-                enemy['hp'] -= damage
-                print(f"You dealt {damage} damage.")
-                if is_woken_up: print(f"The {enemy_name} was woken up!")
-                enemy = apply_hit_effects(player, enemy, "You", enemy_name)
-
-            elif choice.upper() == "S":  # Use Skill
-                clear_screen();
-                draw_line();
-                print("CHOOSE A SKILL");
-                draw_line()
-                skill_map = {}
-                skill_idx = 1
-
-                for skill_name in available_skills:
-                    base_skill_name = skill_name.replace(" II", "")
-                    cd = player.get('skills_cd', {}).get(base_skill_name, 0)
-
-                    if cd > 0:
-                        print(f"[X] {skill_name} (CD: {cd})")
-                    elif skill_name == "Limit Break" and player['hp'] > (player['hp_max'] * 0.25):
-                        print(f"[ ] Limit Break (Requires HP < 25%)")
-                    else:
-                        details = ""
-                        if skill_name == "Focus Strike":
-                            details = "(1.8x ATK, 2 Turn CD)"
-                        elif skill_name == "Focus Strike II":
-                            details = "(2.2x ATK, 2 Turn CD)"
-                        elif skill_name == "Guard":
-                            details = "(50% DMG Reduction, 3 Turn CD)"
-                        elif skill_name == "Guard II":
-                            details = "(50% DMG Reduction, 2 Turn CD)"
-                        elif skill_name == "Meditate":
-                            details = "(Heal 15% Max HP, 5 Turn CD)"
-                        elif skill_name == "Meditate II":
-                            details = "(Heal 25% Max HP, 4 Turn CD)"
-                        elif skill_name == "Limit Break":
-                            details = "(3.0x ATK, 6 Turn CD, HP < 25%)"
-                        elif skill_name == "Reflected Strike":
-                            details = "(1.2x ATK, Skip next, 3 Turn CD)"
-                        elif skill_name == "Purify":
-                            details = "(Cure POISON/BURN, 4 Turn CD)"
-
-                        print(f"{skill_idx} - {skill_name} {details}")
-                        skill_map[str(skill_idx)] = skill_name;
-                        skill_idx += 1
-
-                print("0 - Cancel")
-                draw_line()
-                skill_choice = safe_input("# ")
-
-                if skill_choice == "0":
-                    continue
-
-                if skill_choice in skill_map:
-                    skill_to_use = skill_map[skill_choice]
-                    base_skill_name = skill_to_use.replace(" II", "")
-
-                    if skill_to_use == "Focus Strike" or skill_to_use == "Focus Strike II":
-                        multiplier = 2.2 if skill_to_use == "Focus Strike II" else 1.8
-                        damage = int(battle_atk * multiplier)
-                        if enemy.get('is_hardened'):
-                            damage = max(1, int(damage / 2));
-                            enemy['is_hardened'] = False
-                        enemy['hp'] -= damage
-                        set_skill_cd(player, base_skill_name, 2)
-                        print(f"You used {skill_to_use} for {damage} damage!")
-                        if is_woken_up: print(f"The {enemy_name} was woken up!")
-                        enemy = apply_hit_effects(player, enemy, "You", enemy_name)
-
-                    elif skill_to_use == "Guard" or skill_to_use == "Guard II":
-                        cooldown = 2 if skill_to_use == "Guard II" else 3
-                        player['guard'] = True
-                        set_skill_cd(player, base_skill_name, cooldown)
-                        print(f"You take a defensive stance.")
-
-                    elif skill_to_use == "Meditate" or skill_to_use == "Meditate II":
-                        percent = 0.25 if skill_to_use == "Meditate II" else 0.15
-                        cooldown = 4 if skill_to_use == "Meditate II" else 5
-                        heal_amt = int(player['hp_max'] * percent)
-                        player['hp'] = min(player['hp_max'], player['hp'] + heal_amt)
-                        set_skill_cd(player, base_skill_name, cooldown)
-                        print(f"You focus your spirit and heal for {heal_amt} HP.")
-
-                    elif skill_to_use == "Limit Break":
-                        if player['hp'] > (player['hp_max'] * 0.25):
-                            print("Your HP is too high to use Limit Break!")
-                            print("(Requires HP < 25%)")
-                            time.sleep(1.2)
-                            continue
-                        damage = int(battle_atk * 3.0)
-                        if enemy.get('is_hardened'):
-                            damage = max(1, int(damage / 2));
-                            enemy['is_hardened'] = False
-                        enemy['hp'] -= damage
-                        set_skill_cd(player, base_skill_name, 6)
-                        print(f"With desperate strength, you use Limit Break for {damage} damage!")
-                        if is_woken_up: print(f"The {enemy_name} was woken up!")
-                        enemy = apply_hit_effects(player, enemy, "You", enemy_name)
-
-                    elif skill_to_use == "Reflected Strike":
-                        damage = int(battle_atk * 1.2)
-                        if enemy.get('is_hardened'):
-                            damage = max(1, int(damage / 2));
-                            enemy['is_hardened'] = False
-                        enemy['hp'] -= damage
-                        player['skip_next'] = True
-                        set_skill_cd(player, base_skill_name, 3)
-                        print(f"You used Reflected Strike for {damage} damage!")
-                        print("You will skip your next turn to focus.")
-                        if is_woken_up: print(f"The {enemy_name} was woken up!")
-                        enemy = apply_hit_effects(player, enemy, "You", enemy_name)
-
-                    elif skill_to_use == "Purify":
-                        cured_effect_name = "None"
-                        for eff in player['active_effects'][:]:
-                            if eff['id'] == 'POISON' or eff['id'] == 'BURN':
-                                player['active_effects'].remove(eff)
-                                cured_effect_name = EFFECTS_DB.get(eff['id'], {}).get('name', eff['id'])
-                                break
-                        if cured_effect_name != "None":
-                            print(f"You used Purify and cured {cured_effect_name}!")
-                        else:
-                            print("You used Purify, but had no Poison or Burn to cure.")
-                        set_skill_cd(player, base_skill_name, 4)
-
-                else:
-                    print("Invalid skill choice.");
-                    time.sleep(0.8);
-                    continue
-
-            elif choice == "2" and player['pot'] > 0:  # Use Potion
-                player['pot'] -= 1;
-                player['hp'] = min(player['hp_max'], player['hp'] + 25)
-                cured_effects = []
-                for eff in player['active_effects'][:]:
-                    if eff['id'] == 'POISON' or eff['id'] == 'BLEED':  # v1.8: Cures bleed
-                        player['active_effects'].remove(eff)
-                        cured_effects.append(eff['id'])
-                print("HP refilled.")
-                if cured_effects: print(f"The potion cured your {', '.join(cured_effects)}!")
-            elif choice == "3" and player['elix'] > 0:  # Use Elixir
-                player['elix'] -= 1;
-                player['hp'] = min(player['hp_max'], player['hp'] + 50)
-                player['active_effects'] = [e for e in player['active_effects'] if
-                                            EFFECTS_DB.get(e['id'], {}).get('type') == 'hot']
-                print("HP refilled. All negative effects cured!")
-            elif choice != "":
-                print("Invalid input.");
-                time.sleep(0.8);
-                continue
-
-        time.sleep(1)
-
-        # Check for Enemy Defeat
-        if enemy['hp'] <= 0:
-            xp_gain = enemy.get('xp', 0)
-            gold_bonus = player.get('gold_bonus', 0.0)
-            base_gold = enemy.get('gold', 0)
-            bonus_gold = int(base_gold * gold_bonus)
-            gold_gain = base_gold + bonus_gold
-
-            if player['level'] < 50:
-                player['xp'] += xp_gain
-                print(f"Gained {base_gold} gold (+{bonus_gold} bonus) and {xp_gain} XP!")
-            else:
-                print(f"Gained {base_gold} gold (+{bonus_gold} bonus) (Max level, no XP)")
-
-            player['gold'] += gold_gain
-            print(f"You defeated the {enemy_name}!")
-
-            # Check for Loot Drops
-            for item_id, chance in enemy.get('loot_table', {}).items():
-                if random.random() < chance:
-                    item_name = EQUIPMENT_DB.get(item_id, {}).get('name', 'Unknown Item')
-                    player['inventory'].append(item_id)
-                    print(f"The enemy dropped: {item_name}!")
-
-            # Update Quest Progress
-            # Main Quest
-            main_q_id = player['main_quest_id']
-            main_q_data = MAIN_QUESTS.get(main_q_id, {})
-            if (main_q_data.get('type') == 'KILL' and
-                    main_q_data.get('target_mob') == enemy_name):
-
-                progress_key = main_q_id
-                # v1.8: Handle chain quest progress
-                if main_q_id.startswith("MQ_05_HERO"):
-                    progress_key = "MQ_05_HERO_C"  # All hero kills track under C
-
-                progress = player['quest_progress'].get(progress_key, 0) + 1
-                player['quest_progress'][progress_key] = progress
-                print(f"Main Quest: {progress}/{main_q_data.get('needed', 1)} {enemy_name} defeated.")
-
-                if progress >= main_q_data.get('needed', 1):
-                    if main_q_id == "MQ_03":
-                        player['main_quest_id'] = "MQ_04"
-                        print("Main Quest Updated! Return to Lira.")
-                    # --- v1.8: Hero Quest Chain ---
-                    elif main_q_id == "MQ_05_HERO_C":
-                        player['seal'] = False  # BREAK THE SEAL
-                        player['main_quest_id'] = "MQ_06_HERO"
-                        print("You feel a great shift. The seal has been safely undone!")
-                        print("Main Quest Updated! Confront the Dragon!")
-                    # --- End v1.S ---
-
-            # Side Quests
-            for q_id in player.get('active_side_quests', [])[:]:
-                quest = SIDE_QUEST_POOL.get(q_id, {})
-                if (quest.get('type') == 'KILL' and
-                        quest.get('target_mob') == enemy_name and
-                        player['quest_progress'].get(q_id, 0) < quest.get('needed', 0)):
-                    progress = player['quest_progress'].get(q_id, 0) + 1
-                    player['quest_progress'][q_id] = progress
-                    print(f"Side Quest: {progress}/{quest.get('needed', 1)} {enemy_name} defeated.")
-                    if progress >= quest.get('needed', 1):
-                        print(f"Side Quest '{quest.get('title', 'Unknown')}' complete! Turn in at the Quest Board.")
-
-            player = handle_level_up(player)
-
-            if random.randint(1, 100) <= 30:
-                player['pot'] += 1;
-                print("You found a potion!")
-
-            safe_input("> ")
-
-            if enemy_name == "Dragon" or enemy_name == "Dragon_WorldBoss":
-                return "game_won", player
-
-            return "playing", player
-
-        # --- ENEMY'S TURN ---
-        enemy, player = handle_enemy_turn(enemy, player, battle_def)
-        if player['hp'] <= 0:
-            player = game_over(player)
-            if player is None: return "game_over", None
-            return "playing", player
-
-        decrement_skill_cooldowns(player)
-
-
-## MODIFIED (v1.6.4): Uses safe_input, clearer feedback ##
-def handle_shop(player):
-    # Handles interactions within the shop.
-    while True:
-        clear_screen()
-        draw_line();
-        print("Welcome to the shop!");
-        draw_line()
-        print(f"GOLD: {player['gold']} | ATK: {player['total_atk']} | DEF: {player['total_def']}");
-        draw_line()
-        print("--- Consumables ---")
-        print(f"1 - BUY POTION (25HP, Cures Poison/Bleed) - 15 GOLD ({player['pot']} owned)")  # v1.8: Desc
-        print(f"2 - BUY ELIXIR (50HP, Cures All)      - 25 GOLD ({player['elix']} owned)")
-        print(f"3 - BUY RAGE POTION (+5 ATK next battle) - 40 GOLD ({player['rage_potions']} owned)")
-        print(f"4 - BUY STONE SKIN POTION (+2 DEF next battle) - 35 GOLD ({player['stone_potions']} owned)")
-        draw_line()
-        print("--- Equipment ---")
-        print(f"5 - BUY Poison Dagger (+1 ATK, 30% Poison) - 75 GOLD")
-        print(f"6 - BUY Chainmail Vest (+3 DEF) - 100 GOLD")
-        print(f"7 - BUY Lucky Coin (+10% Gold Bonus) - 120 GOLD")
-
-        # Calculate scaling upgrade cost
-        upgrade_level = (player['base_atk'] - 3)
-        upgrade_cost = 50 + (upgrade_level * 25)
-        print(f"8 - UPGRADE WEAPON (+1 Base ATK) - {upgrade_cost} GOLD")
-        print("9 - LEAVE")
-        draw_line();
-        choice = safe_input("# ")
-
-        action_taken = False
-        if choice == "1" and player['gold'] >= 15:
-            player['gold'] -= 15;
-            player['pot'] += 1;
-            action_taken = True
-            print("Bought 1 Potion.")
-        elif choice == "2" and player['gold'] >= 25:
-            player['gold'] -= 25;
-            player['elix'] += 1;
-            action_taken = True
-            print("Bought 1 Elixir.")
-        elif choice == "3" and player['gold'] >= 40:
-            player['gold'] -= 40;
-            player['rage_potions'] += 1;
-            action_taken = True
-            print("Bought 1 Rage Potion.")
-        elif choice == "4" and player['gold'] >= 35:
-            player['gold'] -= 35;
-            player['stone_potions'] += 1;
-            action_taken = True
-            print("Bought 1 Stone Skin Potion.")
-
-        elif choice == "5" and player['gold'] >= 75:
-            player['gold'] -= 75;
-            player['inventory'].append("EQ_W_003");
-            action_taken = True
-            print("Bought Poison Dagger!")
-        elif choice == "6" and player['gold'] >= 100:
-            player['gold'] -= 100;
-            player['inventory'].append("EQ_A_002");
-            action_taken = True
-            print("Bought Chainmail Vest!")
-        elif choice == "7" and player['gold'] >= 120:
-            player['gold'] -= 120;
-            player['inventory'].append("EQ_C_003");
-            action_taken = True
-            print("Bought Lucky Coin!")
-
-        elif choice == "8" and player['gold'] >= upgrade_cost:
-            player['gold'] -= upgrade_cost;
-            player['base_atk'] += 1
-            player = recalculate_player_stats(player)
-            print(f"Base ATK permanently increased to {player['base_atk']}!")
-            action_taken = True
-        elif choice == "9":
-            return "playing", player, None
-
-        if not action_taken and choice != '9':
-            print("Not enough gold or invalid choice!");
-
-        if action_taken or choice != '9':
-            safe_input("> ")
-
-
-def handle_mayor(player):
-    # Handles interactions with the Mayor.
-    main_q_id = player.get('main_quest_id')
-    main_q_data = MAIN_QUESTS.get(main_q_id, {})
-
-    while True:
-        clear_screen()
-        draw_line()
-        print(f"Hello there, {player['name']}!")
-        draw_line()
-
-        # Check for the "Fateful Choice" quest state
-        if main_q_id == "MQ_04_COMPLETE" and player['seal']:
-            if player['total_atk'] >= 10:
-                typewriter_effect("'You are stronger,' the Mayor says, 'But... still not enough.'")
-                typewriter_effect("'The seal is weakening. We have two choices:'")
-                draw_line()
-                print(
-                    "1 - 'Wait. Train as Lira advised (Lvl 10 / ATK 20 Total) to break the seal safely.' (The Hero's Path)")
-                print(
-                    "2 - 'Or, I have an ancient key... We can force the seal NOW! The risk is... unknown.' (The Reckless Path)")
-                draw_line()
-                choice = safe_input("# ")
-
-                if choice == "1":
-                    player['main_quest_id'] = "MQ_05_HERO_A"  # v1.8: Start Hero Chain
-                    player['quest_progress']['MQ_05_HERO_A'] = 0  # Init progress
-                    typewriter_effect("'A wise choice. Speak to Lira. She will guide your training.'")
-                    safe_input("> ")
-                    return "playing", player, None
-                elif choice == "2":
-                    player['key'] = True
-                    player['seal'] = False
-                    player['main_quest_id'] = "MQ_05_RECKLESS"
-                    player['quest_progress']['MQ_05_RECKLESS'] = 0  # Init progress
-                    typewriter_effect("'May Auren forgive us... The seal is forced!'")
-                    typewriter_effect("You hear an enraged roar echo across the world...")
-                    safe_input("> ")
-                    return "playing", player, None
-                else:
-                    continue
-            else:
-                typewriter_effect("'You have returned... but your echo is still weak,' the Mayor says.")
-                typewriter_effect(
-                    f"'I cannot offer you this choice until you are stronger (Current ATK: {player['total_atk']}/10).'")
-                typewriter_effect("'Continue your training.'")
-
-        elif main_q_id == "MQ_01" and main_q_data.get('target') == "town":
-            typewriter_effect("'Thank goodness you're here,' the Mayor says, his face grim.")
-            typewriter_effect("'The echoes... they're growing stronger. The seal is weakening.'")
-            player['main_quest_id'] = "MQ_02"
-            print("\n(Main Quest Updated!)")
-            safe_input("> ")
-            continue
-
-        elif not player['seal']:
-            if player['key']:
-                typewriter_effect("'The seal is broken... The dragon has escaped! You must find it!'")
-            else:
-                typewriter_effect("'The seal is safely broken. Go to the cave! Auren is counting on you!'")
-
-        # v1.8: Hero Path dialogue
-        elif main_q_id.startswith("MQ_05_HERO"):
-            typewriter_effect("'Speak to Lira at the Guild. She is guiding your path now. Be safe.'")
-
-        else:
-            typewriter_effect("'Continue your training, adventurer. Talk to Lira at the Guild.'")
-
-        draw_line()
-        print("1 - LEAVE")
-        draw_line()
-        choice = safe_input("# ")
-        if choice == "1": return "playing", player, None
-
-
-def handle_cave(player):
-    # Handles interactions at the Dragon's Cave entrance.
-    while True:
-        clear_screen()
-        draw_line()
-
-        if player['seal']:
-            typewriter_effect("A massive, glowing seal bars the cave entrance.")
-            typewriter_effect("It hums with ancient power. You are not yet strong enough.")
-            draw_line()
-            print("1 - TURN BACK")
-            # v1.8: Check for interactable
-            if "dragon_cultist_diary" not in player.get('codex', []):
-                print("7 - Examine the strange markings")
-            draw_line()
-            choice = safe_input("# ")
-            if choice == "1":
-                return "playing", player, None
-            # v1.8: Handle interactable
-            elif choice == "7" and "dragon_cultist_diary" not in player.get('codex', []):
-                typewriter_effect("You find a charred piece of parchment tucked into the rock...")
-                player = codex_add(player, "dragon_cultist_diary")
-                safe_input("> ")
-                continue  # Refresh cave menu
-
-        else:
-            if player['key']:
-                typewriter_effect("The seal is shattered... but the cave is empty.")
-                typewriter_effect("A cold wind blows from the darkness. The dragon has escaped.")
-                draw_line()
-                print("1 - TURN BACK")
-                draw_line()
-                choice = safe_input("# ")
-                if choice == "1": return "playing", player, None
-
-            else:
-                typewriter_effect("The seal has vanished. The path is open.")
-                typewriter_effect("You hear a hateful roar from within the darkness.")
-                draw_line()
-                print("1 - ENTER THE LAIR (Fight Dragon)")
-                print("2 - TURN BACK")
-                draw_line()
-                choice = safe_input("# ")
-                if choice == "1":
-                    return "battle", player, "Dragon"
-                elif choice == "2":
-                    return "playing", player, None
-
-
-def handle_debug_console(player):
-    # Provides a debug menu for testing (if dev_mode is enabled).
-    while True:
-        clear_screen()
-        draw_line();
-        print("    DEVELOPER CONSOLE (v1.8)");
-        draw_line()
-        print(
-            f"HP:{player['hp']}/{player['hp_max']} | ATK:{player['total_atk']} (Base:{player['base_atk']}+B{player.get('bonus_atk', 0)}) | DEF:{player['total_def']} (Base:{player['base_def']}+B{player.get('bonus_def', 0)})")
-        print(f"LVL:{player['level']} | XP:{player['xp']}/{player['xp_to_next_level']}")
-        print(
-            f"POS: ({player['x']}, {player['y']}) | Seal: {'Intact' if player['seal'] else 'Broken'} | Key: {player['key']}")
-        print(f"Main Quest: {player['main_quest_id']} | Gold: {player['gold']}")
-        print(f"Focused Echo: {player['equipped_echo']}")
-        print(f"Completed SQs: {player.get('completed_side_quests', [])}")
-        draw_line()
-        print(
-            "1. Add 1000 Gold\n2. Add 500 XP\n3. Add 1 Bonus ATK\n4. Heal to Full HP\n5. Get All Items & Echoes\n6. Toggle Dragon Seal\n7. Teleport (TOWN)\n0. Exit Console")
-        draw_line();
-        choice = safe_input("# ")
-
-        action_taken = True
-        if choice == "1":
-            player['gold'] += 1000
-        elif choice == "2":
-            player['xp'] += 500;
-            player = handle_level_up(player)
-        elif choice == "3":
-            player['bonus_atk'] = player.get('bonus_atk', 0) + 1
-            player = recalculate_player_stats(player)
-        elif choice == "4":
-            player['hp'] = player['hp_max']
-        elif choice == "5":
-            player['pot'] += 10
-            for item_id in EQUIPMENT_DB.keys():
-                if item_id not in player['inventory']:
-                    player['inventory'].append(item_id)
-            for echo_id in CODEX_ENTRIES.keys():
-                player = codex_add(player, echo_id)
-        elif choice == "6":
-            player['seal'] = not player['seal']
-        elif choice == "7":
-            player['x'], player['y'] = 2, 3
-        elif choice == "0":
-            return "playing", player, None
-        else:
-            action_taken = False
-            print("Invalid command.")
-
-        if action_taken:
-            print("Debug command executed.")
-        safe_input("\n> Press Enter to continue...")
-
-
-def handle_game_over():
-    # Final screen after player chooses not to respawn or dies permanently.
-    clear_screen()
-    draw_line()
-    print("GAME OVER")
-    draw_line()
-    safe_input("> Press Enter to return to the Main Menu...")
-    return "main_menu"
-
-
-def handle_game_won(player):
-    # Screen displayed after defeating the final boss.
-    clear_screen()
-    draw_line()
-    typewriter_effect("With a final, earth-shattering roar, the mighty Dragon falls.")
-    time.sleep(1)
-    typewriter_effect("Silence descends upon the land...")
-    time.sleep(1.5)
-
-    if player.get('key'):
-        typewriter_effect("The roar of *forgetting* is gone, but the world remains... quiet.")
-        typewriter_effect("You have saved Auren from the beast, but the echoes remain scattered.")
-        typewriter_effect("The Breath of Dawn... is still lost.")
-    else:
-        typewriter_effect("A faint warmth returns to the air. The Breath of Dawn stirs.")
-        typewriter_effect("The echoes begin to sing, their memories mended by your strength.")
-        typewriter_effect(f"{WORLD_NAME} remembers.")
-
-    print()
-    typewriter_effect(f"Your name, {player['name']}, will be sung by bards for generations.")
-    typewriter_effect("Congratulations, hero. You have won.")
-    draw_line()
-    safe_input("> Press Enter to return to the Main Menu...")
-    return "main_menu"
-
-
-## MODIFIED (v1.6.4): Uses safe_input, clearer options ##
-def handle_equipment_menu(player):
-    # Handles the equipment management screen.
-    while True:
-        clear_screen()
-        draw_line()
-        print("EQUIPMENT & INVENTORY")
-        draw_line()
-        print(f"ATK: {player['total_atk']} | DEF: {player['total_def']} | HP: {player['hp']}/{player['hp_max']}")
-        draw_line()
-
-        # Display equipped items
-        print("--- EQUIPPED ---")
-        wp_id = player['equipment']['weapon']
-        ar_id = player['equipment']['armor']
-        ch_id = player['equipment']['charm']
-
-        wp_name = EQUIPMENT_DB.get(wp_id, {}).get('name', 'None')
-        ar_name = EQUIPMENT_DB.get(ar_id, {}).get('name', 'None')
-        ch_name = EQUIPMENT_DB.get(ch_id, {}).get('name', 'None')
-
-        print(f"a. Weapon: {wp_name}")
-        print(f"b. Armor : {ar_name}")
-        print(f"c. Charm : {ch_name}")
-        draw_line()
-
-        # Display inventory items with numbers
-        print("--- INVENTORY ---")
-        if not player['inventory']:
-            print("Your inventory is empty.")
-        else:
-            # Sort inventory by type, then name
-            sorted_inventory = sorted(player['inventory'], key=lambda item_id: (
-                EQUIPMENT_DB.get(item_id, {}).get('type', 'z'),
-                EQUIPMENT_DB.get(item_id, {}).get('name', 'Unknown')
-            ))
-            player['inventory'] = sorted_inventory
-
-            for i, item_id in enumerate(player['inventory'], 1):
-                item = EQUIPMENT_DB.get(item_id, {})
-                stats = item.get('stats', {})
-                print(f"{i}. {item.get('name', 'Unknown')} [{item.get('type', '?')}] (Stats: {stats})")
-
-        draw_line()
-        print("Enter number to Equip, letter (a,b,c) to Unequip, or '0' to return.")
-        choice = safe_input("# ").lower()
-
-        if choice == '0':
-            return player
-
-        # Handle Unequip action
-        elif choice in ['a', 'b', 'c']:
-            slot_to_unequip = None
-            if choice == 'a':
-                slot_to_unequip = 'weapon'
-            elif choice == 'b':
-                slot_to_unequip = 'armor'
-            elif choice == 'c':
-                slot_to_unequip = 'charm'
-
-            item_id_to_unequip = player['equipment'].get(slot_to_unequip)
-            if item_id_to_unequip:
-                item_name = EQUIPMENT_DB.get(item_id_to_unequip, {}).get('name', 'Item')
-                player['equipment'][slot_to_unequip] = None
-                player['inventory'].append(item_id_to_unequip)
-                player = recalculate_player_stats(player)
-                print(f"Unequipped {item_name}.")
-                safe_input("> ")
-            else:
-                print("That slot is already empty.")
-                safe_input("> ")
-
-        # Handle Equip action
-        elif choice.strip().isdigit():
-            idx = int(choice) - 1
-            if 0 <= idx < len(player['inventory']):
-                item_id_to_equip = player['inventory'][idx]
-                item_data = EQUIPMENT_DB[item_id_to_equip]
-                item_type = item_data['type']
-
-                current_equipped_id = player['equipment'].get(item_type)
-                if current_equipped_id:
-                    player['inventory'].append(current_equipped_id)
-
-                player['equipment'][item_type] = item_id_to_equip
-                player['inventory'].pop(idx)
-
-                print(f"Equipped {item_data.get('name', 'Item')}.")
-                player = recalculate_player_stats(player)
-                safe_input("> ")
-            else:
-                print("Invalid item number.")
-                safe_input("> ")
-        else:
-            print("Invalid input.")
-            safe_input("> ")
-
-
-## MODIFIED (v1.6.4): Displays more stats, handles safe_input, returns tuple ##
-## MODIFIED (v1.8): Handles interactables and world-changing spawns ##
-def handle_playing(player):
-    # Main game screen handler (map view).
-    y_len, x_len = len(MAP_DATA) - 1, len(MAP_DATA[0]) - 1
-
-    if player['y'] > y_len or player['x'] > x_len:
-        player['x'], player['y'] = 2, 3
-
-    current_tile = MAP_DATA[player['y']][player['x']]
-    standing = True
-
-    if player['main_quest_id'] == "MQ_01" and player['x'] == 2 and player['y'] == 3:
-        player['main_quest_id'] = "MQ_02"
-
-    clear_screen()
-
-    player, _ = process_status_effects(player, "You")
-    if player['hp'] <= 0:
-        player = game_over(player)
-        if player is None: return "game_over", None, None
-        return "playing", player, None
-
-    draw_line()
-    draw_minimap(player)
-    show_biome_flavor(player)
-    draw_line()
-    print("LOCATION: " + BIOMES[current_tile].get("t", "Unknown"))
-    draw_line()
-    print(f"NAME: {player['name']} | Lv: {player['level']}")
-    print(f"HP: {player['hp']}/{player['hp_max']} | ATK: {player['total_atk']} | DEF: {player['total_def']}")
-
-    player_status = ""
-    if player.get('active_effects'):
-        player_status = f" ({', '.join([e['id'] for e in player['active_effects']])})"
-    print(f"XP: {player['xp']}/{player['xp_to_next_level']}{player_status}")
-
-    focused_echo_name = "None"
-    if player.get('equipped_echo'):
-        focused_echo_name = CODEX_ENTRIES.get(player['equipped_echo'], {}).get('title', 'Unknown')
-    print(f"FOCUSED ECHO: {focused_echo_name}")
-
-    print(f"GOLD: {player['gold']}")
-    draw_line()
-
-    # Display Action Menu
-    print("0 - SAVE AND QUIT")
-    if player['y'] > 0: print("1 - NORTH (↑)")
-    if player['x'] < x_len: print("2 - EAST (→)")
-    if player['y'] < y_len: print("3 - SOUTH (↓)")
-    if player['x'] > 0: print("4 - WEST (←)")
-    if player['pot'] > 0: print(f"5 - USE HEAL POTION ({player['pot']} left)")
-    if player['elix'] > 0: print(f"6 - USE ELIXIR ({player['elix']} left)")
-
-    # --- v1.8: Interactable Logic (Display) ---
-    interact_text = None
-    px, py = player['x'], player['y']
-    codex = player.get('codex', [])
-
-    if current_tile in ["shop", "mayor", "cave", "town"]:
-        interact_text = "7 - ENTER"
-    elif px == 1 and py == 2:  # Fields (1,2)
-        if "farmer_memory" not in codex:
-            interact_text = "7 - Examine the abandoned plow"
-        elif "SQ_FARMER_01" not in player.get('active_side_quests', []) and "SQ_FARMER_01" not in player.get(
-                'completed_side_quests', []):
-            interact_text = "7 - Talk to the farmer"
-        else:
-            interact_text = "7 - Greet the farmer"
-
-    elif px == 6 and py == 0 and "dragon_cultist_diary" not in codex and player['seal']:  # Cave Entrance (6,0)
-        interact_text = "7 - Examine the strange markings"
-
-    if interact_text:
-        print(interact_text)
-    # --- End v1.8 Logic ---
-
-    if player['rage_potions'] > 0: print(f"8 - USE RAGE POTION ({player['rage_potions']} left)")
-    if player['stone_potions'] > 0: print(f"9 - USE STONE SKIN POTION ({player['stone_potions']} left)")
-    print("10 - READ ECHO CODEX (Read Only)")
-    print("11 - VIEW QUEST LOG")
-    print("12 - MAP LEGEND")
-    print("13 - VIEW EQUIPMENT")
-    print("14 - HOW TO PLAY/HELP")
-    if player.get('dev_mode'): print("dev - DEV CONSOLE")
-    draw_line()
-
-    if player['active_buff']:
-        print(f"Active Buff for next battle: {player['active_buff'].upper()}!")
-        draw_line()
-
-    # v1.8: REMOVED auto-complete logic, handled by KILL quest now
-    main_q_id = player.get('main_quest_id')
-    # if (main_q_id == "MQ_05_HERO" and player['total_atk'] >= 20 and ...
-
-    dest = safe_input("# ")
-
-    next_state = "playing"
-    enemy_to_fight = None
-
-    if dest == "0":
-        save_game(player);
-        next_state = "main_menu"
-    elif dest in ["1", "2", "3", "4"]:
-        moved = False
-        if dest == "1" and player['y'] > 0:
-            player['y'] -= 1;
-            moved = True
-        elif dest == "2" and player['x'] < x_len:
-            player['x'] += 1;
-            moved = True
-        elif dest == "3" and player['y'] < y_len:
-            player['y'] += 1;
-            moved = True
-        elif dest == "4" and player['x'] > 0:
-            player['x'] -= 1;
-            moved = True
-        else:
-            print("You cannot move that way.")
-            time.sleep(1)
-            standing = True
-
-        if moved:
-            standing = False
-            current_tile = MAP_DATA[player['y']][player['x']]
-
-    elif dest == "5" and player['pot'] > 0:
-        player['pot'] -= 1;
-        player['hp'] = min(player['hp_max'], player['hp'] + 25)
-        cured_effects = []
-        for eff in player['active_effects'][:]:
-            if eff['id'] == 'POISON' or eff['id'] == 'BLEED':  # v1.8: Cures bleed
-                player['active_effects'].remove(eff)
-                cured_effects.append(eff['id'])
-        print("HP refilled!");
-        if cured_effects: print(f"The potion cured your {', '.join(cured_effects)}!")
-        safe_input("> ")
-    elif dest == "6" and player['elix'] > 0:
-        player['elix'] -= 1;
-        player['hp'] = min(player['hp_max'], player['hp'] + 50)
-        player['active_effects'] = [e for e in player['active_effects'] if
-        EFFECTS_DB.get(e.get('id'), {}).get('type') == 'hot']
-        print("HP refilled. All negative effects cured!");
-        safe_input("> ")
-    elif dest == "7":
-        px, py = player['x'], player['y']
-        codex = player.get('codex', [])
-
-        # Original Enter Logic
-        if current_tile == "shop":
-            next_state = "shop"
-        elif current_tile == "mayor":
-            next_state = "mayor"
-        elif current_tile == "cave":
-            next_state = "cave"
-        elif current_tile == "town":
-            next_state = "town"
-
-        # --- v1.8: Interactable Logic (Action) ---
-        elif px == 1 and py == 2:  # Fields (1,2)
-            if "farmer_memory" not in codex:
-                typewriter_effect("You touch an old plow. A memory of cold earth and hunger surfaces...")
-                player = codex_add(player, "farmer_memory")
-                safe_input("> ")
-            elif "SQ_FARMER_01" not in player.get('active_side_quests', []) and "SQ_FARMER_01" not in player.get(
-                    'completed_side_quests', []):
-                typewriter_effect("An old farmer approaches you, his eyes weary.")
-                typewriter_effect(
-                    "'You... you can feel the echoes, can't you? Please... my grandchildren, they can't sleep. They need the 'Ancient Lullaby'.'")
-                typewriter_effect(
-                    "'I heard a Merchant Spirit... one of those echo-traders... was humming it in the woods.'")
-                print("\n(New Side Quest accepted: The Lost Lullaby!)")
-                player.setdefault('active_side_quests', []).append("SQ_FARMER_01")
-                player['quest_progress']['SQ_FARMER_01'] = 0  # Initialize progress
-                safe_input("> ")
-            else:
-                typewriter_effect("The farmer nods at you, hopeful. 'Still searching for that tune?'")
-                safe_input("> ")
-
-        elif px == 6 and py == 0 and "dragon_cultist_diary" not in codex and player['seal']:  # Cave Entrance (6,0)
-            typewriter_effect("You find a charred piece of parchment tucked into the rock...")
-            player = codex_add(player, "dragon_cultist_diary")
-            safe_input("> ")
-
-        elif interact_text:  # Player pressed 7, but it wasn't a standard building or known interactable
-            # Default message if '7' was shown but no specific action defined (like "Greet farmer")
-            typewriter_effect("You take a closer look around.")
-            time.sleep(1)
-        else:  # Player pressed 7 where it wasn't an option
-            print("Nothing happens.")
-            time.sleep(1)
-        # --- End v1.8 Logic ---
-    elif dest == "8" and player['rage_potions'] > 0:
-        player['rage_potions'] -= 1;
-        player['active_buff'] = "rage"
-        print("Your ATK will be boosted in the next battle.");
-        safe_input("> ")
-    elif dest == "9" and player['stone_potions'] > 0:
-        player['stone_potions'] -= 1;
-        player['active_buff'] = "stone"
-        print("You will take less damage in the next battle.");
-        safe_input("> ")
-    elif dest == "10":
-        show_codex(player);
-    elif dest == "11":
-        handle_quest_log(player)
-    elif dest == "12":
-        handle_map_legend()
-    elif dest == "13":
-        player = handle_equipment_menu(player)
-    elif dest == "14":
-        handle_help_menu()
-    elif dest == "dev" and player.get('dev_mode'):
-        next_state = "debug_console"
-    elif dest != "" and dest not in ["1", "2", "3", "4"]:  # Ignore empty input, allow movement
-        print("Invalid command.")
-        time.sleep(1)
-
-        # Check for encounters AFTER movement or action
-    if not standing and BIOMES[current_tile].get("e", False):
-        roll = random.randint(1, 100)
-
-        # Check for World Boss encounter (Reckless Path only)
-        if not player['seal'] and player['key']:
-            if roll <= 10:
-                typewriter_effect("The sky darkens... a colossal shadow sweeps over you!")
-                typewriter_effect(f"THE DRAGON HAS FOUND YOU!")
-                safe_input("> ")
-                next_state = "battle"
-                enemy_to_fight = "Dragon_WorldBoss"
-
-        # Check for Random Event (if not fighting World Boss)
-        elif roll <= 18:  # 8% chance (11-18)
-            next_state, player = handle_random_event(player)
-
-        # Check for Regular Mob Encounter (if not fighting World Boss or having event)
-        # v1.8: REFACTORED to handle world changes
-        elif roll <= 48:  # 30% chance (19-48)
-            base_possible_mobs = BIOMES[current_tile].get("m", [])
-            if base_possible_mobs:
-                # --- v1.8: World Change & Path Logic ---
-                # Make a copy to modify
-                current_possible_mobs = list(base_possible_mobs)
-                main_q = player['main_quest_id']
-
-                # 1. Swamp Cleanup - Check completed quests
-                if "SQ_GUARD_01" in player.get('completed_side_quests', []):
-                    if current_tile == "swamp" and "Fire Slime" in current_possible_mobs:
-                        current_possible_mobs.remove("Fire Slime")
-
-                # 2. Reckless Path Mobs
-                if main_q == "MQ_05_RECKLESS":
-                    if current_tile == "plains" and "Wolf" in current_possible_mobs:  # Check in Plains
-                        current_possible_mobs.remove("Wolf")
-                        if "Corrupted_Wolf" not in current_possible_mobs:
-                            current_possible_mobs.append("Corrupted_Wolf")
-
-                # 3. Hero Path Quest Mob - Spawn only if on this specific quest step
-                elif main_q == "MQ_05_HERO_C":
-                    if current_tile == "hills":
-                        # Force spawn Sentinel if possible, otherwise normal mobs
-                        if "Auren_Sentinel" in MOBS:  # Ensure mob exists
-                            current_possible_mobs = ["Auren_Sentinel"]  # Prioritize quest mob
-                        if "Auren_Sentinel" not in current_possible_mobs:
-                            # Failsafe if Sentinel wasn't added correctly or if needed elsewhere
-                            pass  # Use default hill mobs
-                # --- End v1.8 Logic ---
-
-                if current_possible_mobs:  # Check if list isn't empty after filtering
-                    enemy_name = random.choice(current_possible_mobs)
-                    next_state = "battle"
-                    enemy_to_fight = enemy_name
-
-    return next_state, player, enemy_to_fight
-
-    # ==============================================================================
-    # ## 5. MAIN GAME LOOP ##
-    # (Controls the flow of the game)
-    # ==============================================================================
-
-def main():
-    game_state = "main_menu"
-    player = None
-    while game_state != "exit":
-        enemy_to_fight = None  # Reset enemy encounter flag each loop
-
-        # Handle states that DON'T require an active player
-        if game_state == "main_menu":
-            game_state = handle_main_menu()
-        elif game_state == "new_game_menu":
-            game_state, player = handle_new_game_menu()
-        elif game_state == "load_game_menu":
-            game_state, player = handle_load_game_menu()
-        elif game_state == "game_over":  # Final game over screen
-            game_state = handle_game_over()
-            player = None  # Ensure player is cleared
-
-        # Handle states that REQUIRE an active player
-        elif player:
-            if game_state == "playing":
-                game_state, player, enemy_to_fight = handle_playing(player)
-            elif game_state == "shop":
-                game_state, player, enemy_to_fight = handle_shop(player)
-            elif game_state == "mayor":
-                game_state, player, enemy_to_fight = handle_mayor(player)
-            elif game_state == "cave":
-                game_state, player, enemy_to_fight = handle_cave(player)
-            elif game_state == "town":
-                game_state, player, enemy_to_fight = handle_town(player)
-            elif game_state == "debug_console":
-                game_state, player, enemy_to_fight = handle_debug_console(player)
-            elif game_state == "game_won":
-                game_state = handle_game_won(player)
-                player = None  # Clear player after winning
-
-            # If handle_playing returned an enemy, start battle
-            if enemy_to_fight:
-                game_state, player = handle_battle(player, enemy_to_fight)
-                # handle_battle returns "game_over" if player died permanently
-                if game_state == "game_over":
-                    player = None  # Ensure player is cleared for game over screen
-
-        # Failsafe: If player data is lost unexpectedly
-        elif game_state not in ["main_menu", "new_game_menu", "load_game_menu", "exit", "game_over"]:
-            print("Error: Player data lost. Returning to main menu.")
-            time.sleep(2)
-            game_state = "main_menu"
-            player = None
-
-    print(f"\nThank you for playing {GAME_TITLE}!")
-
-# Entry point of the script
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+# =====================================
+# Echoes of Auren
+# Author: Congchi Lee
+# Version: 1.8.0
+# Date: 2025-10-28
+# =====================================
+
+import os
+import random
+import time
+import sys
+import json
+import struct
+import zlib
+import mmap
+import base64
+import contextlib
+import collections
+import collections.abc
+import io
+import tempfile
+import argparse
+import csv
+import concurrent.futures
+import threading
+import queue
+import shutil
+
+# ==============================================================================
+# ## 1. GAME DATA & CONSTANTS ##
+# (All game data is centralized here for easy editing)
+# ==============================================================================
+
+GAME_TITLE = "Echoes of Auren"
+WORLD_NAME = "Auren"
+MAX_LEVEL = 50  # Maximum level cap
+
+APP_DATA_PATH = os.getenv('APPDATA')
+# v1.9: APPDATA only exists on Windows; use the XDG data directory elsewhere
+if not APP_DATA_PATH:
+    APP_DATA_PATH = os.getenv('XDG_DATA_HOME') or os.path.join(os.path.expanduser("~"), ".local", "share")
+GAME_SAVE_DIRECTORY = os.path.join(APP_DATA_PATH, "EchoesOfAuren")
+try:
+    if not os.path.exists(GAME_SAVE_DIRECTORY):
+        os.makedirs(GAME_SAVE_DIRECTORY)
+except Exception as e:
+    print(f"CRITICAL ERROR: Could not create save directory: {e}")
+    GAME_SAVE_DIRECTORY = "."
+# Save slots are save_<n>.sav files in the save directory (see SaveSlots).
+# v1.9: binary saves; old save_N.json files are still read.
+SAVE_SLOT_PREFIX, SAVE_SLOT_EXT = "save_", ".sav"
+LEGACY_SAVE_DIRECTORY = "."  # Before v1.9 saves were save_N.json files in the working directory
+SAVE_SLOTS_PER_PAGE = 5
+SAVE_SLOTS_MIN_SHOWN = 3  # The new game menu always offers at least this many slots
+SAVE_JOURNAL_DEPTH = 3  # Previous snapshots kept per slot (save_1.sav.bak1 is the newest)
+SAVE_INDEX_FILE = "save_index.json"  # Slot menu summaries per save directory, see get_save_slot_infos
+SAVE_QUEUE_DEPTH = 8  # Slots whose saves may wait for the background writer at once (see SaveWriter)
+AUTOSAVE_ENABLED = True  # Log progress at key points between manual saves (see Autosaver)
+AUTOSAVE_DELTAS_PER_SNAPSHOT = 20  # Autosave deltas kept in save_1.sav.log before a full save
+
+MAP_DATA = [
+    ["plains", "plains", "plains", "plains", "forest", "mountain", "cave", "ruins"],
+    ["forest", "forest", "forest", "forest", "forest", "hills", "mountain", "ruins"],
+    ["forest", "fields", "bridge", "plains", "hills", "forest", "hills", "ruins"],
+    ["plains", "shop", "town", "mayor", "plains", "hills", "mountain", "ruins"],
+    ["plains", "fields", "fields", "plains", "hills", "mountain", "mountain", "ruins"],
+    ["swamp", "swamp", "fields", "plains", "hills", "mountain", "mountain", "ruins"]
+]
+
+BIOMES = {
+    "plains": {"t": "PLAINS", "e": True, "m": ["Slime", "Wolf"]},
+    "forest": {"t": "WOODS", "e": True, "m": ["Orc", "Shadow_Stalker", "Goblin", "Goblin Shaman"]},
+    # v1.8: Replaced Wolf
+    "fields": {"t": "FIELDS", "e": False},
+    "bridge": {"t": "BRIDGE", "e": True, "m": ["Slime"]},
+    "town": {"t": "TOWN CENTRE", "e": False},
+    "shop": {"t": "SHOP", "e": False},
+    "mayor": {"t": "MAYOR'S OFFICE", "e": False},
+    "cave": {"t": "DRAGON'S CAVE", "e": False},
+    "mountain": {"t": "MOUNTAIN", "e": True, "m": ["Golem", "Orc", "Fire Slime"]},
+    "hills": {"t": "HILLS", "e": True, "m": ["Goblin", "Slime", "Goblin Shaman"]},
+    "swamp": {"t": "MURKY SWAMP", "e": True, "m": ["Slime", "Fire Slime", "Goblin Shaman"]},
+    "ruins": {"t": "HAUNTED RUINS", "e": True, "m": ["Skeleton", "Ghost", "Wraith"]}
+}
+
+BIOME_ICONS = {
+    # --- Biome Icons ---
+    "plains": ".",
+    "forest": "T",
+    "fields": "~",
+    "bridge": "=",
+    "town": "H",
+    "shop": "$",
+    "mayor": "H",
+    "cave": "∩",
+    "mountain": "▲",
+    "hills": "n",
+    "swamp": "s",
+    "ruins": "R",
+    # --- Special Icons ---
+    "PLAYER": "@",  # Your icon
+    "FOG": " ",  # Unexplored
+    "UNKNOWN": "?"  # Error
+}
+
+# Mob "abilities" are tried in order on each enemy turn; the first one whose
+# conditions pass replaces the regular attack (see resolve_enemy_turn).
+#   chance          % roll (no roll when absent); made after the other conditions
+#                   unless roll_first is set (keeps the Golem's old RNG draw order)
+#   hp_at_most      only at or below this HP; hp_pct_at_most: fraction of max HP
+#   unless / sets   enemy flag that blocks the ability / flag set when used
+#                   (is_hardened, is_exhausted, has_raged)
+#   damage, hits    hit(s) at ATK * damage; fire_damage: flat fire hit (burn resist applies)
+#   heal, siphon    flat self-heal / heal for a fraction of the damage dealt
+#   atk_bonus       permanent ATK gain; drain_skill: put a player skill on cooldown for N turns
+#   msg, hit_msg    log line(s) formatted with {name}, {damage}, {heal}; hit_msg per hit
+MOBS = {
+    "Goblin": {"hp": 18, "atk": 3, "gold": 6, "xp": 10,
+               "loot_table": {"EQ_W_001": 0.1},
+               "effects": [],
+               "abilities": [{"hp_at_most": 5, "unless": "has_raged", "sets": "has_raged", "atk_bonus": 2,
+                              "msg": "The {name} flies into a rage! Its ATK increases by 2!"}]},
+    "Slime": {"hp": 30, "atk": 2, "gold": 9, "xp": 12,
+              "loot_table": {"EQ_C_001": 0.05},
+              "effects": [],
+              "abilities": [{"chance": 50, "hp_at_most": 12, "heal": 5,
+                             "msg": "The {name} wobbles and regenerates for {heal} HP!"}]},
+    "Wolf": {"hp": 25, "atk": 4, "gold": 8, "xp": 15,
+             "loot_table": {"EQ_A_001": 0.05},
+             "effects": [{"id": "STUN", "chance": 0.15, "turns": 1}],
+             "abilities": [{"chance": 30, "damage": 0.75, "hits": 2,
+                            "msg": "The {name} lunges forward with a swift strike!",
+                            "hit_msg": "It hits you for {damage} damage!"}]},
+    "Orc": {"hp": 45, "atk": 6, "gold": 22, "xp": 30,
+            "loot_table": {"EQ_W_002": 0.05},
+            "effects": [],
+            "abilities": [{"chance": 40, "damage": 1.8, "sets": "is_exhausted",
+                           "msg": ["The {name} delivers a brutal slam for {damage} damage!",
+                                   "It seems exhausted after that massive attack..."]}]},
+    "Golem": {"hp": 65, "atk": 5, "gold": 28, "xp": 40,
+              "loot_table": {},
+              "effects": [],
+              "abilities": [{"chance": 30, "roll_first": True, "unless": "is_hardened", "sets": "is_hardened",
+                             "msg": "The {name}'s stone body glows. It has hardened its defense! (Next physical hit is halved!)"}]},
+    "Dragon": {"hp": 180, "atk": 14, "gold": 200, "xp": 0,
+               "loot_table": {},
+               "effects": [{"id": "BURN", "chance": 0.3, "turns": 3}],
+               "abilities": [{"chance": 35, "fire_damage": 15,
+                              "msg": "The {name} breathes FIRE! You take {damage} damage!"}]},
+    "Dragon_WorldBoss": {"hp": 250, "atk": 18, "gold": 500, "xp": 0,
+                         "loot_table": {},
+                         "effects": [{"id": "BURN", "chance": 0.5, "turns": 3}],
+                         "abilities": [{"chance": 35, "fire_damage": 15,
+                                        "msg": "The {name} breathes FIRE! You take {damage} damage!"}]},
+    "Fire Slime": {"hp": 28, "atk": 4, "gold": 12, "xp": 15,
+                   "loot_table": {"EQ_C_002": 0.05},
+                   "effects": [{"id": "BURN", "chance": 0.2, "turns": 2}],
+                   "abilities": [{"chance": 35, "fire_damage": 5,
+                                  "msg": "The {name} breathes FIRE! You take {damage} damage!"}]},
+    "Goblin Shaman": {"hp": 35, "atk": 3, "gold": 15, "xp": 20,
+                      "loot_table": {"EQ_C_003": 0.02},
+                      "effects": [],
+                      "abilities": [{"chance": 50, "hp_pct_at_most": 0.4, "heal": 15,
+                                     "msg": "The {name} chants wildly and heals for {heal} HP!"}]},
+    "Skeleton": {"hp": 50, "atk": 7, "gold": 25, "xp": 35,
+                 "loot_table": {"EQ_W_004": 0.05, "EQ_A_003": 0.03},
+                 "effects": [],
+                 "abilities": [{"chance": 30, "unless": "is_hardened", "sets": "is_hardened",
+                                "msg": "The {name} assembles a Bone Shield! Its defense hardened! (Next physical hit is halved!)"}]},
+    "Ghost": {"hp": 40, "atk": 6, "gold": 30, "xp": 40,
+              "loot_table": {"EQ_C_004": 0.05},
+              "effects": [],
+              "abilities": [{"chance": 25, "drain_skill": 3,
+                             "msg": "The {name} lets out a chilling wail, draining your spirit!"}]},
+    "Wraith": {"hp": 70, "atk": 9, "gold": 50, "xp": 60,
+               "loot_table": {"EQ_W_005": 0.05},
+               "effects": [{"id": "STUN", "chance": 0.1, "turns": 1}],
+               "abilities": [{"chance": 35, "damage": 1.2, "siphon": 0.5,
+                              "msg": "The {name} uses Life Siphon! It dealt {damage} damage and healed {heal} HP!"}]},
+    "Tutorial_Dummy": {"hp": 25, "atk": 1, "gold": 0, "xp": 0, "loot_table": {}, "effects": []},
+    # --- ADDITIONS v1.8 ---
+    "Shadow_Stalker": {"hp": 20, "atk": 5, "gold": 10, "xp": 18,
+                       "loot_table": {"EQ_W_003": 0.05},
+                       "effects": [{"id": "BLEED", "chance": 0.2, "turns": 3}]},
+    "Corrupted_Wolf": {"hp": 35, "atk": 6, "gold": 15, "xp": 25,
+                       "loot_table": {"EQ_A_001": 0.1},
+                       "effects": [{"id": "STUN", "chance": 0.15, "turns": 1},
+                                   {"id": "BLEED", "chance": 0.2, "turns": 2}]},
+    "Auren_Sentinel": {"hp": 80, "atk": 7, "gold": 40, "xp": 50,
+                       "loot_table": {},
+                       "effects": [],
+                       "abilities": [{"chance": 35, "unless": "is_hardened", "sets": "is_hardened",
+                                      "msg": "The {name} raises its shield! Its defense hardened! (Next physical hit is halved!)"}]}
+}
+
+## NEW (v1.9): Skill registry ##
+# Battle skills in menu order. An entry with "upgrades" is a higher tier of
+# that skill: it replaces the base skill in the menu once unlocked, shares its
+# cooldown and copies every key it does not set.
+#   level / codex   unlocked at this level / once this codex entry is found
+#   cd              cooldown in turns after use
+#   effect          handler (see SKILL_EFFECTS): strike, guard, meditate, purify
+#   mult            strike damage as a multiple of ATK; skip_next: lose the next turn
+#   heal_pct        meditate heal as a fraction of max HP; cures: effect IDs purify removes
+#   hp_pct_below    only usable below this fraction of max HP
+#   msg, miss_msg   log line(s) formatted with {skill}, {damage}, {heal}, {cured};
+#                   miss_msg when purify finds nothing to cure
+#   details         battle menu description
+SKILLS = {
+    "Focus Strike": {"level": 3, "cd": 2, "effect": "strike", "mult": 1.8,
+                     "msg": "You used {skill} for {damage} damage!",
+                     "details": "(1.8x ATK, 2 Turn CD)"},
+    "Guard": {"level": 4, "cd": 3, "effect": "guard",
+              "msg": "You take a defensive stance.",
+              "details": "(50% DMG Reduction, 3 Turn CD)"},
+    "Meditate": {"level": 6, "cd": 5, "effect": "meditate", "heal_pct": 0.15,
+                 "msg": "You focus your spirit and heal for {heal} HP.",
+                 "details": "(Heal 15% Max HP, 5 Turn CD)"},
+    "Limit Break": {"level": 10, "cd": 6, "effect": "strike", "mult": 3.0, "hp_pct_below": 0.25,
+                    "msg": "With desperate strength, you use Limit Break for {damage} damage!",
+                    "details": "(3.0x ATK, 6 Turn CD, HP < 25%)"},
+    "Purify": {"level": 12, "cd": 4, "effect": "purify", "cures": ["POISON", "BURN"],
+               "msg": "You used Purify and cured {cured}!",
+               "miss_msg": "You used Purify, but had no Poison or Burn to cure.",
+               "details": "(Cure POISON/BURN, 4 Turn CD)"},
+    "Focus Strike II": {"upgrades": "Focus Strike", "level": 15, "mult": 2.2,
+                        "details": "(2.2x ATK, 2 Turn CD)"},
+    "Guard II": {"upgrades": "Guard", "level": 18, "cd": 2,
+                 "details": "(50% DMG Reduction, 2 Turn CD)"},
+    "Meditate II": {"upgrades": "Meditate", "level": 20, "cd": 4, "heal_pct": 0.25,
+                    "details": "(Heal 25% Max HP, 4 Turn CD)"},
+    "Reflected Strike": {"codex": "mirror_echo", "cd": 3, "effect": "strike", "mult": 1.2, "skip_next": True,
+                         "msg": ["You used Reflected Strike for {damage} damage!",
+                                 "You will skip your next turn to focus."],
+                         "details": "(1.2x ATK, Skip next, 3 Turn CD)"}
+}
+
+EQUIPMENT_DB = {
+    # Weapons
+    "EQ_W_001": {"name": "Rusted Sword", "type": "weapon", "stats": {"atk": 2},
+                 "desc": "A sword that remembers too many battles, and lost its last one."},  # v1.8: Desc updated
+    "EQ_W_002": {"name": "Orcish Cleaver", "type": "weapon", "stats": {"atk": 4}, "desc": "A heavy, crude blade."},
+    "EQ_W_003": {"name": "Poison Dagger", "type": "weapon", "stats": {"atk": 1},
+                 "effect_on_hit": {"id": "POISON", "chance": 0.3, "turns": 3},
+                 "desc": "A weak dagger coated in grime."},
+    "EQ_W_004": {"name": "Ancient Sword", "type": "weapon", "stats": {"atk": 6},
+                 "desc": "A well-balanced blade from the ruins."},
+    "EQ_W_005": {"name": "Shadow Dagger", "type": "weapon", "stats": {"atk": 3},
+                 "effect_on_hit": {"id": "MANA_DRAIN", "chance": 0.15, "turns": 2},
+                 "desc": "A dagger that seems to cut at the soul."},
+    # Armors
+    "EQ_A_001": {"name": "Leather Tunic", "type": "armor", "stats": {"def": 1, "hp_max": 5},
+                 "desc": "Simple leather protection."},
+    "EQ_A_002": {"name": "Chainmail Vest", "type": "armor", "stats": {"def": 3}, "desc": "Heavy, but effective."},
+    "EQ_A_003": {"name": "Runic Mail", "type": "armor", "stats": {"def": 4, "hp_max": 10},
+                 "desc": "Runes of protection, faded because the world forgot what they protect."},
+    # v1.8: Desc updated
+    "EQ_A_004": {"name": "Acolyte's Robe", "type": "armor", "stats": {"def": 2},
+                 "special": "resist_burn_50",
+                 "desc": "Robes worn by fire worshippers."},
+    # Charms
+    "EQ_C_001": {"name": "Slime Core", "type": "charm", "stats": {"hp_max": 10},
+                 "desc": "A simple, jellied memory. It only remembers how to hold together."},  # v1.8: Desc updated
+    "EQ_C_002": {"name": "Ember Shard", "type": "charm", "stats": {},
+                 "effect_on_hit": {"id": "BURN", "chance": 0.1, "turns": 2},
+                 "desc": "Warm to the touch."},
+    "EQ_C_003": {"name": "Lucky Coin", "type": "charm", "stats": {"gold_bonus": 0.1}, "desc": "A faint glint of luck."},
+    "EQ_C_004": {"name": "Ghostly Pendant", "type": "charm", "stats": {},
+                 "special": "evade_phys_10",
+                 "desc": "It feels cold and slightly transparent."}
+}
+
+EFFECTS_DB = {
+    "POISON": {
+        "name": "Poisoned",
+        "type": "dot",
+        "value": 2,
+        "msg_inflict": "is POISONED!",
+        "msg_tick": "takes 2 poison damage."
+    },
+    "BURN": {
+        "name": "Burning",
+        "type": "dot",
+        "value": 3,
+        "msg_inflict": "is BURNING!",
+        "msg_tick": "takes 3 burn damage."
+    },
+    "STUN": {
+        "name": "Stunned",
+        "type": "control",
+        "msg_inflict": "is STUNNED!",
+        "msg_tick": "is stunned and cannot move!"
+    },
+    "REGEN": {
+        "name": "Regen",
+        "type": "hot",
+        "value": 2,
+        "msg_inflict": "is REGENERATING!",
+        "msg_tick": "heals for 2 HP."
+    },
+    "MANA_DRAIN": {
+        "name": "Mana Drain",
+        "type": "control",
+        "msg_inflict": "is drained of energy!",
+        "msg_tick": "'s skills are put on cooldown!"
+    },
+    # --- ADDITIONS v1.8 ---
+    "BLEED": {
+        "name": "Bleeding",
+        "type": "dot",
+        "value": 2,
+        "msg_inflict": "is BLEEDING!",
+        "msg_tick": "takes 2 bleed damage."
+    },
+    "SLEEP": {
+        "name": "Sleeping",
+        "type": "control",
+        "msg_inflict": "falls ASLEEP!",
+        "msg_tick": "is asleep and cannot move!"
+    }
+}
+
+MAIN_QUESTS = {
+    "MQ_01": {
+        "title": "Auren's Call",
+        "desc": "You awaken to a faint echo. Find out what's happening at the Town Centre.",
+        "type": "VISIT",
+        "target": "town"
+    },
+    "MQ_02": {
+        "title": "The Mayor's Plea",
+        "desc": "The Mayor is worried. He asks you to speak with Lira at the Echo Guild.",
+        "type": "TALK",
+        "target": "LIRA"
+    },
+    "MQ_03": {
+        "title": "Proving Your Echo",
+        "desc": "Lira needs you to grow stronger. Prove your worth by clearing 5 Goblins from the hills.",
+        "type": "KILL", "target_mob": "Goblin", "needed": 5,
+        "reward_gold": 100, "reward_xp": 150
+    },
+    "MQ_04": {
+        "title": "The First True Echo",
+        "desc": "Lira senses a 'Fallen Knight's' echo, lost somewhere in the forests. Find it.",
+        "type": "COLLECT_ECHO", "target_codex": "fallen_knight",
+        "reward_gold": 50, "reward_xp": 100
+    },
+    "MQ_04_COMPLETE": {
+        "title": "The Knight's Vow",
+        "desc": "You found the Knight's echo. You feel stronger. Return to the Mayor.",
+        "type": "TALK", "target": "MAYOR"
+    },
+    # --- v1.8: Hero Path Rework ---
+    "MQ_05_HERO_A": {
+        "title": "The Hero's Path: Patience",
+        "desc": "Lira states strength is not just muscle, but resolve. Find the 'Shrine of Moss' in the wilds.",
+        "type": "COLLECT_ECHO", "target_codex": "shrine_memory"
+    },
+    "MQ_05_HERO_B": {
+        "title": "The Hero's Path: Understanding",
+        "desc": "To win, you must understand why the seal was made. Find the 'Cultist's Diary' at the dragon's cave.",
+        "type": "COLLECT_ECHO", "target_codex": "dragon_cultist_diary"
+    },
+    "MQ_05_HERO_C": {
+        "title": "The Hero's Path: The Final Test",
+        "desc": "Lira is ready to test your strength and wisdom. Defeat the 'Auren Sentinel' she has summoned in the hills.",
+        "type": "KILL", "target_mob": "Auren_Sentinel", "needed": 1
+    },
+    "MQ_05_RECKLESS": {
+        "title": "The Reckless Path",
+        "desc": "The seal was forced. The dragon has escaped. Find and slay it.",
+        "type": "KILL", "target_mob": "Dragon_WorldBoss", "needed": 1
+    },
+    "MQ_06_HERO": {
+        "title": "Confront the Flame",
+        "desc": "The seal is safely broken. Confront the dragon in its lair.",
+        "type": "KILL", "target_mob": "Dragon", "needed": 1
+    }
+}
+
+SIDE_QUEST_POOL = {
+    # --- Tier 1 (Level 1-4) ---
+    "SQ_SLIME_01": {
+        "title": "A Sticky Situation", "desc": "Clear out 6 Slimes from the plains.",
+        "type": "KILL", "target_mob": "Slime", "needed": 6,
+        "reward_gold": 50, "reward_xp": 70, "min_level": 1
+    },
+    "SQ_GOBLIN_01": {
+        "title": "Hilltop Pests", "desc": "Defeat 4 Goblins in the hills.",
+        "type": "KILL", "target_mob": "Goblin", "needed": 4,
+        "reward_gold": 60, "reward_xp": 80, "min_level": 2
+    },
+    # v1.8: Farmer Quest (Interactable)
+    "SQ_FARMER_01": {
+        "title": "The Lost Lullaby",
+        "desc": "A farmer in the fields (1,2) seeks an old tune. Find a 'Merchant Spirit' who might remember it.",
+        "type": "COLLECT_ECHO", "target_codex": "merchant_spirit",
+        "reward_gold": 100, "reward_xp": 150, "min_level": 4, "is_board_quest": False
+    },
+    # --- Tier 2 (Level 5-9) ---
+    "SQ_WOLF_02": {
+        "title": "The Wolf Pack", "desc": "A pack of 3 Wolves is menacing the forest path.",
+        "type": "KILL", "target_mob": "Wolf", "needed": 3,
+        "reward_gold": 90, "reward_xp": 110, "min_level": 6
+    },
+    "SQ_ORC_01": {
+        "title": "Orc Sighting", "desc": "An Orc scout was seen in the mountains. Defeat 1 Orc.",
+        "type": "KILL", "target_mob": "Orc", "needed": 1,
+        "reward_gold": 100, "reward_xp": 130, "min_level": 7
+    },
+    # v1.8: Swamp Quest
+    "SQ_GUARD_01": {
+        "title": "Swamp Menace",
+        "desc": "A Shaman in the swamp is corrupting the water, spawning Fire Slimes. Slay the Goblin Shaman.",
+        "type": "KILL", "target_mob": "Goblin Shaman", "needed": 1,
+        "reward_gold": 150, "reward_xp": 200, "min_level": 8
+    },
+    # --- Tier 3 (Level 10+) ---
+    "SQ_GOLEM_01": {
+        "title": "Stone Sentinels", "desc": "The Golems in the mountains are awakening. Take one down.",
+        "type": "KILL", "target_mob": "Golem", "needed": 1,
+        "reward_gold": 150, "reward_xp": 200, "min_level": 10
+    },
+    # v1.8: Reckless Path Quest
+    "SQ_R_01": {
+        "title": "(RECKLESS) Chaos Cleanup",
+        "desc": "The broken seal has driven the plains wolves mad! Slay 5 'Corrupted Wolves' before they reach town.",
+        "type": "KILL", "target_mob": "Corrupted_Wolf", "needed": 5,
+        "reward_gold": 250, "reward_xp": 350, "min_level": 10, "exclusive_path": "RECKLESS"
+    },
+    "SQ_RUINS_01": {
+        "title": "Cleansing the Ruins", "desc": "The skeletons in the Haunted Ruins are a threat. Clear 5 of them.",
+        "type": "KILL", "target_mob": "Skeleton", "needed": 5,
+        "reward_gold": 180, "reward_xp": 250, "min_level": 12
+    },
+    "SQ_RUINS_02": {
+        "title": "Silent Spirits", "desc": "The Ghosts of the ruins seem tormented. Defeat 3 Ghosts.",
+        "type": "KILL", "target_mob": "Ghost", "needed": 3,
+        "reward_gold": 200, "reward_xp": 280, "min_level": 13
+    }
+}
+
+BIOME_FLAVORS = {
+    "plains": {
+        "lines": [
+            "Tall grass brushes at your knees. Once, someone laughed here and the sound lingered.",
+            "The plain smells faintly of baked earth and distant smoke; a memory disguised as weather."
+        ], "prob": 0.25
+    },
+    "forest": {
+        "lines": [
+            "Pine resin hangs in the air. A song once rose among these trees, quiet as a hidden thing.",
+            "Moss clings to stone and bone; prayers have long since softened into green."
+        ], "prob": 0.25
+    },
+    "hills": {
+        "lines": ["The wind rolls over the slope carrying an old, half-remembered chorus."],
+        "prob": 0.25
+    },
+    "cave": {
+        "lines": ["Warm breath from the depths brushes your face; something sealed still breathes."],
+        "prob": 0.40
+    },
+    "town": {
+        "lines": ["Hammers ring; children shout. Normality is a careful thing here."],
+        "prob": 0.20
+    },
+    "bridge": {
+        "lines": ["The bridge creaks like an old chest; voices cross the water like paper boats."],
+        "prob": 0.25
+    },
+    "fields": {
+        "lines": ["Fields smell of seed and late sun. A furrow holds a whisper of some long promise."],
+        "prob": 0.25
+    },
+    "shop": {
+        "lines": ["Shelves are orderly and yet some things look as if they were placed by memory rather than need."],
+        "prob": 0.15
+    },
+    "mayor": {
+        "lines": ["The mayor's steps echo in a room full of decisions that no one remembers making."],
+        "prob": 0.15
+    },
+    "mountain": {
+        "lines": ["Stone climbs skyward here; the mountain keeps its secrets under a calm face."],
+        "prob": 0.30
+    },
+    "swamp": {
+        "lines": ["The air is thick and smells of rot. Something bubbles beneath the murky water.",
+                  "Gnarled trees reach out like skeletal claws. You hear a distant croak."],
+        "prob": 0.35
+    },
+    "ruins": {
+        "lines": ["Broken columns stand like teeth against the sky. A cold wind whispers forgotten names.",
+                  "You step on a cracked tile bearing a royal crest. This place held importance once."],
+        "prob": 0.40
+    }
+}
+
+CODEX_ENTRIES = {
+    "ECHO_GIFT_01": {
+        "title": "The First Echo",
+        "text": "A faint whisper, the very first memory that answered your call. It feels like a promise.",
+        "buff": {"atk": 1}
+    },
+    "shrine_memory": {
+        "title": "Shrine of Moss",
+        "text": "Someone once knelt at this shrine and sang. The song remained like dew on the stone.",
+        "buff": {"def": 2, "hp_max": 5},
+        "combat_effect": {"id": "REGEN", "turns": 99}
+    },
+    "fallen_knight": {
+        "title": "The Knight's Promise",
+        "text": "He fought for a vow. He asked not for glory, but for someone to finish what he began.",
+        "buff": {"atk": 2, "def": -1}
+    },
+    "crimson_flower": {
+        "title": "Crimson Bloom",
+        "text": "Beauty that stings; it remembers both seed and wound.",
+        "buff": {},
+        "effect_on_hit": {"id": "POISON", "chance": 0.3, "turns": 3}
+    },
+    "merchant_spirit": {
+        "title": "Merchant Spirit",
+        "text": "A small lantern-eyed thing that trades memories like trinkets. It smiles without lips.",
+        "buff": {"gold_bonus": 0.25}
+    },
+    "mirror_echo": {
+        "title": "Reflected Soul",
+        "text": "You looked into fractured glass and found what the land refused to keep.",
+        "buff": {"atk": 1, "def": 1}
+    },
+    "town_rumor": {
+        "title": "Town's Whisper",
+        "text": "Villagers speak of an old path behind the inn, where echoes gather at dusk.",
+        "buff": {}
+    },
+    "ruined_king_memory": {
+        "title": "Fallen King's Crown",
+        "text": "A memory of a crown, heavy with regret. It remembers ruling over dust and shadows.",
+        "buff": {"atk": 1, "def": 1}
+    },
+    # --- ADDITIONS v1.8 ---
+    "farmer_memory": {
+        "title": "Farmer's Memory",
+        "text": "The earth is cold. The fire... the fire that warmed us, where did it go? The children know only the cold now.",
+        "buff": {"hp_max": 10}
+    },
+    "dragon_cultist_diary": {
+        "title": "Cultist's Diary Scrap",
+        "text": "The weak sealed the flame. We worship it. The fire of forgetting will cleanse Auren... The fools in town do not understand the power of forgetting.",
+        "buff": {},
+        "special": "resist_burn_25"
+    },
+    "ancient_lullaby": {
+        "title": "Ancient Lullaby",
+        "text": "An old tune, it tells of a world where the night was safe and warm. It feels... peaceful.",
+        "buff": {"def": 1},
+        "effect_on_hit": {"id": "SLEEP", "chance": 0.05, "turns": 1}
+    }
+}
+
+
+## NEW (v1.9): Compiled content registry ##
+# The string IDs above stay the authoring and save-file format. At startup each
+# table is interned to small integers with tuple-backed columns indexed by
+# that integer, so combat and movement compare and index ints instead of
+# hashing strings on every turn.
+
+class ContentIds:
+    # Maps the string IDs of one content table to 0..n-1 and back.
+    __slots__ = ("names", "index")
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, name):
+        return self.index[name]
+
+    def get(self, name, default=None):
+        return self.index.get(name, default)
+
+
+BIOME_IDS = ContentIds(BIOMES)
+MOB_IDS = ContentIds(MOBS)
+EFFECT_IDS = ContentIds(EFFECTS_DB)
+EQUIPMENT_IDS = ContentIds(EQUIPMENT_DB)
+CODEX_IDS = ContentIds(CODEX_ENTRIES)
+
+# Effects
+FX_DOT, FX_HOT, FX_CONTROL = 0, 1, 2
+EFFECT_KIND = tuple({"dot": FX_DOT, "hot": FX_HOT, "control": FX_CONTROL}[EFFECTS_DB[e]['type']]
+                    for e in EFFECT_IDS.names)
+EFFECT_VALUE = tuple(EFFECTS_DB[e].get('value', 0) for e in EFFECT_IDS.names)
+EFFECT_TITLE = tuple(EFFECTS_DB[e].get('name') for e in EFFECT_IDS.names)
+EFFECT_MSG_TICK = tuple(EFFECTS_DB[e].get('msg_tick') for e in EFFECT_IDS.names)
+EFFECT_MSG_INFLICT = tuple(EFFECTS_DB[e].get('msg_inflict', 'is affected!') for e in EFFECT_IDS.names)
+FX_POISON = EFFECT_IDS["POISON"]
+FX_BURN = EFFECT_IDS["BURN"]
+FX_BLEED = EFFECT_IDS["BLEED"]
+FX_STUN = EFFECT_IDS["STUN"]
+FX_SLEEP = EFFECT_IDS["SLEEP"]
+FX_MANA_DRAIN = EFFECT_IDS["MANA_DRAIN"]
+
+
+def compile_on_hit(effects):
+    # Turns a list of {"id", "chance", "turns"} entries into (effect, chance, turns) int tuples.
+    return tuple((EFFECT_IDS[e['id']], e.get('chance', 0), e.get('turns', 1)) for e in effects if e.get('id'))
+
+
+# Equipment and echoes (on-hit effects are empty tuples when absent)
+EQUIPMENT_ON_HIT = tuple(compile_on_hit([EQUIPMENT_DB[i]['effect_on_hit']] if 'effect_on_hit' in EQUIPMENT_DB[i] else [])
+                         for i in EQUIPMENT_IDS.names)
+CODEX_ON_HIT = tuple(compile_on_hit([CODEX_ENTRIES[i]['effect_on_hit']] if 'effect_on_hit' in CODEX_ENTRIES[i] else [])
+                     for i in CODEX_IDS.names)
+
+# Stat vectors: (atk, def, hp_max, gold_bonus) from an item's "stats" or an echo's "buff"
+STAT_KEYS = ("atk", "def", "hp_max", "gold_bonus")
+
+
+def compile_stats(stats):
+    return tuple(stats.get(key, 0) for key in STAT_KEYS)
+
+
+EQUIPMENT_STATS = tuple(compile_stats(EQUIPMENT_DB[i].get('stats', {})) for i in EQUIPMENT_IDS.names)
+CODEX_STATS = tuple(compile_stats(CODEX_ENTRIES[i].get('buff', {})) for i in CODEX_IDS.names)
+
+# Passive "special" rules of items and echoes:
+# special -> (burn resist, evade chance, message shown when it resists burn/fire damage)
+SPECIAL_RULES = {
+    "resist_burn_50": (0.5, 0.0, "(Your Acolyte's Robe resists some of the {} damage!)"),
+    "resist_burn_25": (0.25, 0.0, "(Your echo of the Cultist's Diary dampens the flame!)"),
+    "evade_phys_10": (0.0, 0.10, None),
+}
+
+# Mob abilities
+ABILITY_DEFAULTS = {
+    "chance": None, "roll_first": False, "hp_at_most": None, "hp_pct_at_most": None, "unless": None, "sets": None,
+    "damage": None, "hits": 1, "fire_damage": 0, "heal": 0, "siphon": 0.0, "atk_bonus": 0,
+    "drain_skill": 0, "msg": (), "hit_msg": None
+}
+ABILITY_FLAGS = ("is_hardened", "is_exhausted", "has_raged")
+
+
+def compile_ability(ability):
+    # Fills in the defaults of one MOBS ability entry and checks its keys.
+    unknown = set(ability) - set(ABILITY_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown mob ability keys: {', '.join(sorted(unknown))}")
+    compiled = dict(ABILITY_DEFAULTS, **ability)
+    for flag in (compiled['unless'], compiled['sets']):
+        if flag is not None and flag not in ABILITY_FLAGS:
+            raise ValueError(f"Unknown mob ability flag: {flag}")
+    if isinstance(compiled['msg'], str):
+        compiled['msg'] = (compiled['msg'],)
+    compiled['msg'] = tuple(compiled['msg'])
+    return compiled
+
+
+# Skills
+SKILL_DEFAULTS = {
+    "upgrades": None, "level": None, "codex": None, "cd": 0, "effect": None, "mult": 1.0,
+    "skip_next": False, "heal_pct": 0.0, "cures": (), "hp_pct_below": None,
+    "msg": (), "miss_msg": None, "details": ""
+}
+
+
+def compile_skill(name):
+    # Resolves one SKILLS entry (tiers inherit from their base skill) and checks its keys.
+    skill = SKILLS[name]
+    unknown = set(skill) - set(SKILL_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown skill keys in {name}: {', '.join(sorted(unknown))}")
+    compiled = dict(SKILL_DEFAULTS)
+    if 'upgrades' in skill:
+        compiled.update(SKILLS[skill['upgrades']], level=None, codex=None)
+    compiled.update(skill)
+    if compiled['level'] is None and compiled['codex'] is None:
+        raise ValueError(f"Skill {name} has no unlock rule")
+    compiled['name'] = name
+    compiled['line'] = compiled['upgrades'] or name  # Cooldown key shared by all tiers
+    if isinstance(compiled['msg'], str):
+        compiled['msg'] = (compiled['msg'],)
+    compiled['msg'] = tuple(compiled['msg'])
+    compiled['cures'] = tuple(EFFECT_IDS[e] for e in compiled['cures'])
+    if compiled['hp_pct_below'] is not None:
+        compiled['requires'] = f"(Requires HP < {int(compiled['hp_pct_below'] * 100)}%)"
+    return compiled
+
+
+SKILL_TABLE = {name: compile_skill(name) for name in SKILLS}
+SKILL_LINES = tuple(tuple(n for n in SKILLS if SKILL_TABLE[n]['line'] == line)
+                    for line in SKILLS if SKILL_TABLE[line]['line'] == line)  # Base skill first, then its tiers
+SKILL_CD_KEY = {name: skill['line'] for name, skill in SKILL_TABLE.items()}
+SKILL_CODEX_GATES = tuple(dict.fromkeys(s['codex'] for s in SKILL_TABLE.values() if s['codex'] is not None))
+
+# Mobs
+MOB_ON_HIT = tuple(compile_on_hit(MOBS[m].get('effects', [])) for m in MOB_IDS.names)
+MOB_ABILITIES = tuple(tuple(compile_ability(a) for a in MOBS[m].get('abilities', [])) for m in MOB_IDS.names)
+MOB_FIRE_SLIME = MOB_IDS["Fire Slime"]
+MOB_WOLF = MOB_IDS["Wolf"]
+MOB_CORRUPTED_WOLF = MOB_IDS["Corrupted_Wolf"]
+MOB_SENTINEL = MOB_IDS["Auren_Sentinel"]
+
+# Biomes (encounter lists hold mob IDs)
+BIOME_TITLE = tuple(BIOMES[b].get("t", "Unknown") for b in BIOME_IDS.names)
+BIOME_HAS_ENCOUNTERS = tuple(BIOMES[b].get("e", False) for b in BIOME_IDS.names)
+BIOME_MOBS = tuple(tuple(MOB_IDS[m] for m in BIOMES[b].get("m", [])) for b in BIOME_IDS.names)
+BIOME_ICON = tuple(BIOME_ICONS.get(b, '?') for b in BIOME_IDS.names)
+BIOME_PLAINS = BIOME_IDS["plains"]
+BIOME_HILLS = BIOME_IDS["hills"]
+BIOME_SWAMP = BIOME_IDS["swamp"]
+BIOME_RUINS = BIOME_IDS["ruins"]
+BIOME_TOWN = BIOME_IDS["town"]
+BIOME_SHOP = BIOME_IDS["shop"]
+BIOME_MAYOR = BIOME_IDS["mayor"]
+BIOME_CAVE = BIOME_IDS["cave"]
+BIOME_ENTERABLE = frozenset([BIOME_SHOP, BIOME_MAYOR, BIOME_CAVE, BIOME_TOWN])
+
+
+# ==============================================================================
+# ## 2. HELPER & UTILITY FUNCTIONS ##
+# (Basic utility functions)
+# ==============================================================================
+
+## NEW (v1.9): Runtime context ##
+# Everything the game takes from the outside world (dice, time, terminal) goes
+# through the installed GameRuntime, so tools can swap in a seeded RNG, skip
+# every pause, or capture output without touching the handlers.
+
+def _clear_terminal():
+    os.system("cls" if os.name == "nt" else "clear")
+
+
+def _noop(*args):
+    pass
+
+
+class GameRuntime:
+    # Holds the RNG, sleeper, input reader, screen clearer and output sink.
+    def __init__(self, rng=None, sleep=None, read_input=None, clear=None, out=None, animate=True,
+                 background_saves=True):
+        self.rng = rng or random  # The random module itself unless a Random instance is given
+        self.sleep = sleep or time.sleep
+        self.read_input = read_input or input
+        self.clear = clear or _clear_terminal
+        self.out = out  # Text stream for all output (None = the real stdout)
+        self.animate = animate  # False prints typewriter text in one go
+        self.background_saves = background_saves  # False waits for each save (output order stays fixed)
+
+
+def fast_runtime(rng=None, read_input=None, out=None):
+    # A runtime with no pauses, no screen clearing and no typewriter animation.
+    return GameRuntime(rng=rng, sleep=_noop, read_input=read_input, clear=_noop,
+                       out=out, animate=False, background_saves=False)
+
+
+RUNTIME = GameRuntime()
+
+
+@contextlib.contextmanager
+def use_runtime(runtime):
+    # Installs `runtime` for every handler until the block exits.
+    global RUNTIME
+    previous = RUNTIME
+    RUNTIME = runtime
+    try:
+        if runtime.out is not None:
+            with contextlib.redirect_stdout(runtime.out):
+                yield runtime
+        else:
+            yield runtime
+    finally:
+        RUNTIME = previous
+
+
+def pause(seconds):
+    # Waits using the installed runtime's sleeper.
+    RUNTIME.sleep(seconds)
+
+
+def clear_screen():
+    # Clears the terminal screen.
+    RUNTIME.clear()
+
+
+def draw_line():
+    # Prints a separator line.
+    print("xX--------------------xX")
+
+
+def typewriter_effect(text, delay=0.03):
+    # Prints text with a typewriter effect.
+    if not RUNTIME.animate:
+        print(text)
+        return
+    for char in text:
+        sys.stdout.write(char)
+        sys.stdout.flush()
+        pause(delay)
+    print()
+
+
+## NEW (v1.6.4): Safe input wrapper ##
+def safe_input(prompt):
+    # Handles EOFError (Ctrl+D) during input. Failed background saves are
+    # reported here, on the UI thread, before the prompt is shown.
+    report_save_errors()
+    try:
+        return RUNTIME.read_input(prompt)
+    except EOFError:
+        print("\n(Input cancelled.)")
+        return ""
+
+
+## NEW (v1.9): Chunked world map ##
+# Worlds are stored as fixed-size square chunks of uint8 biome IDs:
+#   header  "EOAW", version, width, height, chunk size, biome name table
+#   chunks  row-major, chunk_size * chunk_size bytes each (edges padded)
+# A WorldMap reads chunks lazily from a memory-mapped file (or an in-memory
+# buffer for the built-in MAP_DATA) and keeps only a small LRU of hot chunks,
+# so memory use does not depend on the size of the world.
+WORLD_MAGIC = b"EOAW"
+WORLD_FORMAT_VERSION = 1
+WORLD_HEADER = struct.Struct("<4sHIIHH")  # magic, version, width, height, chunk size, biome count
+
+
+def write_world(stream, width, height, tile_fn, chunk_size=32, biomes=None):
+    # Writes a world to a binary stream one chunk at a time.
+    # tile_fn(x, y) returns the biome code of each tile.
+    biomes = list(biomes or BIOMES)
+    biome_ids = {code: i for i, code in enumerate(biomes)}
+    stream.write(WORLD_HEADER.pack(WORLD_MAGIC, WORLD_FORMAT_VERSION, width, height, chunk_size, len(biomes)))
+    for code in biomes:
+        name = code.encode("utf-8")
+        stream.write(bytes([len(name)]) + name)
+
+    for chunk_y in range(0, height, chunk_size):
+        for chunk_x in range(0, width, chunk_size):
+            chunk = bytearray(chunk_size * chunk_size)
+            for y in range(chunk_y, min(chunk_y + chunk_size, height)):
+                offset = (y - chunk_y) * chunk_size
+                for x in range(chunk_x, min(chunk_x + chunk_size, width)):
+                    chunk[offset + x - chunk_x] = biome_ids[tile_fn(x, y)]
+            stream.write(chunk)
+
+
+def build_world_file(path, width, height, tile_fn, chunk_size=32, biomes=None):
+    # Creates a world file on disk (see write_world).
+    with open(path, "wb") as f:
+        write_world(f, width, height, tile_fn, chunk_size, biomes)
+
+
+class WorldMap:
+    # Read-only tile grid backed by a chunked buffer with an LRU of hot chunks.
+    def __init__(self, buffer, max_chunks=64, source=None):
+        magic, version, width, height, chunk_size, biome_count = WORLD_HEADER.unpack_from(buffer, 0)
+        if magic != WORLD_MAGIC or version != WORLD_FORMAT_VERSION:
+            raise ValueError("Not a supported world map file.")
+        offset = WORLD_HEADER.size
+        biomes = []
+        for _ in range(biome_count):
+            length = buffer[offset]
+            biomes.append(bytes(buffer[offset + 1:offset + 1 + length]).decode("utf-8"))
+            offset += 1 + length
+        unknown = [code for code in biomes if code not in BIOME_IDS.index]
+        if unknown:
+            raise ValueError(f"World map uses unknown biomes: {', '.join(unknown)}")
+
+        self.buffer = buffer
+        self.source = source  # Open file object when memory-mapped
+        self.width, self.height, self.chunk_size = width, height, chunk_size
+        self.biomes = tuple(biomes)
+        self.biome_ids = tuple(BIOME_IDS[code] for code in biomes)  # File order -> registry IDs
+        self.data_offset = offset
+        self.chunks_x = (width + chunk_size - 1) // chunk_size
+        self.max_chunks = max_chunks
+        self.chunks = collections.OrderedDict()
+
+    @classmethod
+    def from_rows(cls, rows, chunk_size=16):
+        # Builds an in-memory world from a list of rows of biome codes.
+        stream = io.BytesIO()
+        write_world(stream, len(rows[0]), len(rows), lambda x, y: rows[y][x], chunk_size)
+        return cls(stream.getvalue())
+
+    @classmethod
+    def open(cls, path, max_chunks=64):
+        # Memory-maps a world file written by build_world_file.
+        f = open(path, "rb")
+        return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), max_chunks, source=f)
+
+    def _chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        size = self.chunk_size * self.chunk_size
+        start = self.data_offset + (chunk_y * self.chunks_x + chunk_x) * size
+        chunk = bytes(self.buffer[start:start + size])
+        self.chunks[key] = chunk
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return chunk
+
+    def contains(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def tile_at(self, x, y):
+        # Returns the biome code at (x, y), or None outside the map.
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        size = self.chunk_size
+        chunk = self._chunk(x // size, y // size)
+        return self.biomes[chunk[(y % size) * size + x % size]]
+
+    def biome_at(self, x, y):
+        # Interned biome ID at (x, y), or None outside the map.
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        size = self.chunk_size
+        chunk = self._chunk(x // size, y // size)
+        return self.biome_ids[chunk[(y % size) * size + x % size]]
+
+    def close(self):
+        if self.source:
+            self.buffer.close()
+            self.source.close()
+            self.source = None
+
+
+WORLD = WorldMap.from_rows(MAP_DATA)
+
+
+def load_world(path):
+    # Switches the game to a world file created with build_world_file.
+    global WORLD
+    WORLD.close()
+    WORLD = WorldMap.open(path)
+    return WORLD
+
+
+def tile_at(x, y):
+    # Biome code of a tile in the current world (None outside the map).
+    return WORLD.tile_at(x, y)
+
+
+def biome_at(x, y):
+    # Interned biome ID of a tile in the current world (None outside the map).
+    return WORLD.biome_at(x, y)
+
+
+## NEW (v1.9): Bit-packed fog of war ##
+class VisitedMask:
+    # Set of explored tiles stored as one bit per tile (index = y * width + x).
+    __slots__ = ("width", "height", "bits")
+
+    def __init__(self, width, height, bits=None):
+        self.width = width
+        self.height = height
+        self.bits = bytearray(bits) if bits is not None else bytearray((width * height + 7) // 8)
+
+    def copy(self):
+        return VisitedMask(self.width, self.height, self.bits)
+
+    def __contains__(self, pos):
+        x, y = pos
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        index = y * self.width + x
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def add(self, x, y):
+        # Marks a tile as visited. Returns True if it was not visited before.
+        if 0 <= x < self.width and 0 <= y < self.height:
+            index = y * self.width + x
+            bit = 1 << (index & 7)
+            if not self.bits[index >> 3] & bit:
+                self.bits[index >> 3] |= bit
+                return True
+        return False
+
+    def __len__(self):
+        return sum(bin(byte).count("1") for byte in self.bits)
+
+    def __iter__(self):
+        # Yields visited (x, y) pairs in row order.
+        for index in range(self.width * self.height):
+            if self.bits[index >> 3] & (1 << (index & 7)):
+                yield index % self.width, index // self.width
+
+    def to_save(self):
+        # Compact JSON form: map size plus the bitmap as base64.
+        return {"w": self.width, "h": self.height, "bits": base64.b64encode(bytes(self.bits)).decode("ascii")}
+
+    @classmethod
+    def from_save(cls, data, width, height):
+        # Builds a mask for a width x height map from a saved mask or a
+        # legacy list of [x, y] pairs.
+        if isinstance(data, dict):
+            saved = cls(data['w'], data['h'], base64.b64decode(data['bits']))
+            if (saved.width, saved.height) == (width, height):
+                return saved
+            data = list(saved)  # Map size changed: re-key the tiles
+        mask = cls(width, height)
+        for x, y in data or []:
+            mask.add(x, y)
+        return mask
+
+
+def get_visited_mask(player):
+    # Returns the player's fog-of-war mask, migrating legacy lists in place.
+    visited = player.get('visited_tiles')
+    if not isinstance(visited, VisitedMask):
+        visited = VisitedMask.from_save(visited or [[player['x'], player['y']]], WORLD.width, WORLD.height)
+        player['visited_tiles'] = visited
+    return visited
+
+
+## NEW (v1.9): Status effect container ##
+class StatusEffects:
+    # Active status effects of a player or enemy, with one slot per effect
+    # type (indexed by EFFECT_IDS) for the remaining turns and magnitude, so
+    # applying, refreshing, curing and control checks are O(1). `order` stamps
+    # keep effects ticking and listing in the order they were applied, like
+    # the list of {"id", "turns"} dicts they replace (still the save form).
+    __slots__ = ("turns", "magnitude", "order", "applied")
+
+    def __init__(self):
+        self.turns = [0] * len(EFFECT_IDS)
+        self.magnitude = [0] * len(EFFECT_IDS)
+        self.order = [0] * len(EFFECT_IDS)
+        self.applied = 0  # Effects applied so far (the next order stamp)
+
+    def copy(self):
+        clone = StatusEffects.__new__(StatusEffects)
+        clone.turns, clone.magnitude, clone.order = self.turns[:], self.magnitude[:], self.order[:]
+        clone.applied = self.applied
+        return clone
+
+    def __contains__(self, fx):
+        return self.turns[fx] > 0
+
+    def __iter__(self):
+        # Active effect IDs in the order they were applied.
+        active = [fx for fx, turns in enumerate(self.turns) if turns > 0]
+        active.sort(key=self.order.__getitem__)
+        return iter(active)
+
+    def __len__(self):
+        return sum(1 for turns in self.turns if turns > 0)
+
+    def add(self, fx, turns):
+        # Applies an effect, or refreshes it to the longer duration. Returns
+        # True if the target wasn't already affected.
+        if self.turns[fx] > 0:
+            self.turns[fx] = max(self.turns[fx], turns)
+            return False
+        self.turns[fx] = turns
+        self.magnitude[fx] = EFFECT_VALUE[fx]
+        self.order[fx] = self.applied
+        self.applied += 1
+        return True
+
+    def remove(self, fx):
+        # Ends an effect. Returns True if it was active.
+        was_active = self.turns[fx] > 0
+        self.turns[fx] = 0
+        return was_active
+
+    def clear(self, keep_kind=None):
+        # Ends every effect (except those of kind `keep_kind`, e.g. FX_HOT).
+        for fx in range(len(self.turns)):
+            if EFFECT_KIND[fx] != keep_kind:
+                self.turns[fx] = 0
+
+    def names(self):
+        return [EFFECT_IDS.names[fx] for fx in self]
+
+    def to_save(self):
+        return [{"id": EFFECT_IDS.names[fx], "turns": self.turns[fx]} for fx in self]
+
+    @classmethod
+    def from_save(cls, effects):
+        # Builds the container from the saved list (unknown effect IDs are dropped).
+        status = cls()
+        for effect in effects or []:
+            fx = EFFECT_IDS.get(effect.get('id'))
+            if fx is not None and effect.get('turns', 0) > 0:
+                status.add(fx, effect['turns'])
+        return status
+
+
+def get_status_effects(target):
+    # Returns the status effects of a player or enemy, converting a saved list in place.
+    effects = target.active_effects
+    if not isinstance(effects, StatusEffects):
+        effects = StatusEffects.from_save(effects)
+        target.active_effects = effects
+    return effects
+
+
+## NEW (v1.9): Incremental minimap rendering ##
+MINIMAP_VIEWPORT = None  # (width, height) window around the player, or None for the whole map
+MINIMAP_LARGE_MAP_VIEWPORT = (15, 9)  # Used instead of the whole map for loaded worlds bigger than this
+
+
+class MinimapCache:
+    # Keeps pre-rendered minimap rows. Only rows touched by the last move
+    # (new vision, old and new player position) are rebuilt; a viewport
+    # limits the work to a fixed window around the player.
+    __slots__ = ("visited", "viewport", "origin", "player_pos", "rows")
+
+    def __init__(self, visited, viewport=None):
+        self.visited = visited
+        self.viewport = viewport
+        self.origin = None
+        self.player_pos = None
+        self.rows = {}
+
+    def _window(self, px, py):
+        # Returns (x0, y0, width, height) of the visible part of the map.
+        map_h, map_w = WORLD.height, WORLD.width
+        if not self.viewport:
+            return 0, 0, map_w, map_h
+        view_w, view_h = min(self.viewport[0], map_w), min(self.viewport[1], map_h)
+        x0 = min(max(0, px - view_w // 2), map_w - view_w)
+        y0 = min(max(0, py - view_h // 2), map_h - view_h)
+        return x0, y0, view_w, view_h
+
+    def _render_row(self, y, x0, view_w, px, py):
+        line = []
+        for x in range(x0, x0 + view_w):
+            if x == px and y == py:
+                line.append(f"[{BIOME_ICONS.get('PLAYER', '@')}] ")
+            elif (x, y) in self.visited:
+                line.append(f" {BIOME_ICON[biome_at(x, y)]}  ")
+            else:
+                line.append(f" {BIOME_ICONS.get('FOG', ' ')}  ")
+        return "".join(line)
+
+    def render(self, px, py, touched_rows=()):
+        # Returns the visible rows, re-rendering only the dirty ones.
+        x0, y0, view_w, view_h = self._window(px, py)
+        if (x0, y0) != self.origin:  # Viewport scrolled: every row changed
+            self.rows = {}
+            self.origin = (x0, y0)
+
+        dirty = set(touched_rows)
+        dirty.add(py)
+        if self.player_pos:
+            dirty.add(self.player_pos[1])
+        for y in range(y0, y0 + view_h):
+            if y in dirty or y not in self.rows:
+                self.rows[y] = self._render_row(y, x0, view_w, px, py)
+        self.player_pos = (px, py)
+        return [self.rows[y] for y in range(y0, y0 + view_h)]
+
+
+## MODIFIED (v1.9): Uses the visited mask and the cached renderer ##
+def draw_minimap(player, viewport=None):
+    # Draws the game map with fog of war.
+    print("--- MAP ---")
+    px, py = player['x'], player['y']
+    visited = get_visited_mask(player)
+    viewport = viewport or MINIMAP_VIEWPORT
+    if viewport is None and (WORLD.width > MINIMAP_LARGE_MAP_VIEWPORT[0] or WORLD.height > MINIMAP_LARGE_MAP_VIEWPORT[1]):
+        viewport = MINIMAP_LARGE_MAP_VIEWPORT
+    VISION_RANGE = 1
+
+    # Update visited tiles
+    touched_rows = set()
+    for y_vision in range(py - VISION_RANGE, py + VISION_RANGE + 1):
+        for x_vision in range(px - VISION_RANGE, px + VISION_RANGE + 1):
+            if visited.add(x_vision, y_vision):
+                touched_rows.add(y_vision)
+
+    # Draw the map grid (kept on the player as a transient, unsaved cache)
+    cache = player.get('_minimap')
+    if cache is None or cache.visited is not visited or cache.viewport != viewport:
+        cache = MinimapCache(visited, viewport)
+        player['_minimap'] = cache
+    for line in cache.render(px, py, touched_rows):
+        print(line)
+
+    print("-----------")
+
+
+def show_biome_flavor(player):
+    # Displays descriptive text for the current biome.
+    tile = tile_at(player['x'], player['y'])
+    flavor = BIOME_FLAVORS.get(tile)
+    if not flavor or RUNTIME.rng.random() >= flavor['prob']: return
+    line = RUNTIME.rng.choice(flavor['lines'])
+    typewriter_effect(line, delay=0.02)
+    pause(0.6)
+
+
+## MODIFIED (v1.9): Slot summaries come from a small index file ##
+# Each save directory has a SAVE_INDEX_FILE mapping slot file names to their
+# (mtime, size) and the few fields the slot menus show. An entry is only
+# trusted while the file's mtime and size still match, so saves copied in or
+# edited by hand are simply re-read.
+
+def save_slot_summary(player_data):
+    # The part of a save the slot menus need.
+    return {
+        "name": player_data.get('name', 'Unknown'),
+        "level": player_data.get('level', 1),
+        # Approximate ATK for display
+        "atk": player_data.get('total_atk', player_data.get('base_atk', player_data.get('atk', 3))),
+        "x": player_data.get('x', 0),
+        "y": player_data.get('y', 0)
+    }
+
+
+def _file_signature(stat):
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_save_index(directory):
+    try:
+        with open(os.path.join(directory, SAVE_INDEX_FILE), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        return index if isinstance(index, dict) else {}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_save_index(directory, index):
+    # The index is only a cache, so failing to write it is not an error.
+    try:
+        write_file_atomic(os.path.join(directory, SAVE_INDEX_FILE),
+                          json.dumps(index, separators=(",", ":")).encode("utf-8"))
+    except OSError:
+        pass
+
+
+_SAVE_INDEX_LOCK = threading.Lock()  # The background SaveWriter updates the index too
+
+
+def update_save_index(slot_file, player_data):
+    # Records the summary of a save that was just written to `slot_file`.
+    directory, name = os.path.split(os.path.abspath(slot_file))
+    with _SAVE_INDEX_LOCK:
+        index = load_save_index(directory)
+        index[name] = {"sig": _file_signature(os.stat(slot_file)), "summary": save_slot_summary(player_data)}
+        _write_save_index(directory, index)
+
+
+def get_save_slot_infos(slot_files, signatures=None):
+    # Menu info for each slot (None for empty slots). An index entry is only
+    # written for a save that was verified (written by us, or decoded with
+    # its checksum checked), so slots whose entry still matches the file's
+    # signature are neither read nor re-verified. Only the others are checked.
+    # A corrupted slot (or one whose primary file is missing) gets
+    # {"corrupted": True, "missing": ..., "backup": ...} plus the menu info
+    # of that backup, if there is one. `signatures` can pass in already known
+    # [mtime_ns, size] pairs by path.
+    signatures = signatures or {}
+    indexes = {}  # directory -> index
+    changed = set()
+    infos = []
+    for slot_file in slot_files:
+        directory, name = os.path.split(os.path.abspath(slot_file))
+        if directory not in indexes:
+            indexes[directory] = load_save_index(directory)
+        index = indexes[directory]
+
+        sig = signatures.get(slot_file)
+        if sig is None:
+            for path in [slot_file, legacy_save_path(slot_file)]:  # A legacy JSON save stands in for its .sav
+                try:
+                    sig = _file_signature(os.stat(path))
+                    break
+                except (OSError, TypeError):
+                    continue
+
+        entry = index.get(name)
+        if entry and sig and entry.get('sig') == sig:
+            infos.append(_slot_menu_info(entry['summary']))
+            continue
+
+        state, backup = check_save_slot(slot_file)
+        if state == "empty":
+            infos.append(None)
+            continue
+        if state in ("corrupted", "missing"):
+            info = {"corrupted": True, "missing": state == "missing", "backup": backup}
+            if backup:
+                try:
+                    with open(backup, "rb") as f:
+                        info.update(_slot_menu_info(save_slot_summary(parse_save_bytes(f.read()))))
+                except (OSError, SaveFormatError):
+                    info['backup'] = None
+            infos.append(info)
+            continue
+        try:
+            player_data, from_journal = read_save_file(slot_file)
+        except (FileNotFoundError, SaveFormatError):
+            infos.append(None)  # Gone or undecodable since the check
+            continue
+        summary = save_slot_summary(player_data)
+        if sig and not from_journal:
+            index[name] = {"sig": sig, "summary": summary}
+            changed.add(directory)
+        infos.append(_slot_menu_info(summary))
+
+    for directory in changed:
+        _write_save_index(directory, indexes[directory])
+    return infos
+
+
+def _slot_menu_info(summary):
+    x, y = summary['x'], summary['y']
+    # Failsafe for loading saves before map expansion
+    if not WORLD.contains(x, y):
+        x, y = 2, 3  # Default to town
+
+    return {
+        "name": summary['name'],
+        "level": summary['level'],
+        "atk": summary['atk'],
+        "location": BIOME_TITLE[biome_at(x, y)]
+    }
+
+
+def get_save_slot_info(slot_file):
+    # Reads basic info from a save file for display.
+    return get_save_slot_infos([slot_file])[0]
+
+
+## NEW (v1.9): Save slot manager ##
+class SaveSlots:
+    # Any number of save_<n>.sav slots in one directory.
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, number):
+        return os.path.join(self.directory, f"{SAVE_SLOT_PREFIX}{number}{SAVE_SLOT_EXT}")
+
+    @staticmethod
+    def slot_number(name):
+        # 3 for "save_3.sav" (or a legacy "save_3.json"), None for other files.
+        root, ext = os.path.splitext(name)
+        if ext not in (SAVE_SLOT_EXT, ".json") or not root.startswith(SAVE_SLOT_PREFIX):
+            return None
+        number = root[len(SAVE_SLOT_PREFIX):]
+        return int(number) if number.isdigit() else None
+
+    def scan(self):
+        # One os.scandir pass. Returns ({slot number: path}, {path: signature}).
+        slots, signatures = {}, {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return slots, signatures
+        for entry in entries:
+            number = self.slot_number(entry.name)
+            if number is None and ".bak" in entry.name:
+                # Journal snapshot: keeps a slot whose primary file is missing listed
+                root = entry.name.split(".bak")[0]
+                if root.endswith(SAVE_SLOT_EXT) and entry.is_file():
+                    number = self.slot_number(root)
+                    if number is not None:
+                        slots.setdefault(number, self.path(number))
+                continue
+            if number is None or not entry.is_file():
+                continue
+            path = self.path(number)
+            if entry.name.endswith(SAVE_SLOT_EXT):
+                slots[number] = path
+                signatures[path] = _file_signature(entry.stat())
+            else:
+                slots.setdefault(number, path)  # Legacy JSON, read through the .sav path
+        return slots, signatures
+
+    def list(self, with_empty=False):
+        # [(path, menu info)] for every readable slot, in slot order. With
+        # with_empty, unused numbers up to one past the highest slot (and at
+        # least SAVE_SLOTS_MIN_SHOWN) are included with info None.
+        slots, signatures = self.scan()
+        if with_empty:
+            numbers = range(1, max(max(slots, default=0) + 1, SAVE_SLOTS_MIN_SHOWN) + 1)
+        else:
+            numbers = sorted(slots)
+        used = [slots[number] for number in sorted(slots)]
+        infos = dict(zip(used, get_save_slot_infos(used, signatures)))
+        return [(self.path(number), infos.get(self.path(number))) for number in numbers
+                if with_empty or infos.get(self.path(number))]
+
+    def files(self):
+        # Every file belonging to the slots (saves, journals, autosave logs, legacy saves, index).
+        names = []
+        for entry in os.scandir(self.directory) if os.path.isdir(self.directory) else []:
+            name = entry.name
+            base = name.split(".bak")[0]
+            if base.endswith(AUTOSAVE_LOG_EXT):
+                base = base[:-len(AUTOSAVE_LOG_EXT)]
+            if entry.is_file() and (self.slot_number(base) is not None or name == SAVE_INDEX_FILE):
+                names.append(name)
+        return sorted(names)
+
+
+SLOTS = SaveSlots(GAME_SAVE_DIRECTORY)
+
+
+def set_save_directory(directory):
+    # Points the slot manager at another directory. Returns the previous one.
+    previous = SLOTS.directory
+    SLOTS.directory = directory
+    return previous
+
+
+# ==============================================================================
+# ## 3. CORE DATA HANDLERS ##
+# (Functions for managing player data)
+# ==============================================================================
+
+def create_new_player(name, slot_file):
+    # Initializes a new player.
+    start_pos = [1, 3]
+    player_data = Player({
+        "name": name,
+        "hp": 50, "hp_max": 50,
+        "base_atk": 3, "base_def": 0,
+        "bonus_atk": 0, "bonus_def": 0,
+        "total_atk": 3, "total_def": 0, "gold_bonus": 0.0,
+
+        "pot": 1, "elix": 0, "gold": 0,
+        "x": start_pos[0], "y": start_pos[1],
+        "seal": True,
+        "key": False,
+        "level": 1, "xp": 0, "xp_to_next_level": 40,
+        "dev_mode": False,
+        "rage_potions": 0,
+        "stone_potions": 0,
+        "active_buff": None,
+        "codex": [],
+        "skills_cd": {},
+        "skip_next": False,
+        "guard": False,
+        "respawned": False,
+        "visited_tiles": VisitedMask.from_save([start_pos], WORLD.width, WORLD.height),
+        "main_quest_id": "MQ_01",
+        "quest_progress": {},
+        "active_side_quests": [],
+        "completed_side_quests": [],  # v1.8: Added
+        "save_slot": slot_file,
+        "active_effects": StatusEffects(),
+        "equipment": {"weapon": None, "armor": None, "charm": None},
+        "inventory": ["EQ_W_001"],
+        "equipped_echo": None,
+        "save_version": SAVE_VERSION
+    })
+
+    # Calculate initial stats and fully heal
+    player_data = recalculate_player_stats(player_data)
+    player_data['hp'] = player_data['hp_max']
+    return player_data
+
+
+## NEW (v1.9): Converts in-memory player state to its save form ##
+def player_to_save(player):
+    # Returns a JSON-ready copy of the player for writing to disk. Lists and
+    # dicts are copied too, so the game can keep playing while it is written.
+    # Keys starting with "_" are runtime caches and are never saved.
+    data = {key: _copy_save_value(value) for key, value in player.items() if not key.startswith('_')}
+    visited = data.get('visited_tiles')
+    if isinstance(visited, VisitedMask):
+        data['visited_tiles'] = visited.to_save()  # Bitmap as base64
+    if isinstance(player.get('active_effects'), StatusEffects):
+        data['active_effects'] = player['active_effects'].to_save()
+    data['quest_progress'] = prune_quest_progress(data)
+    data['save_version'] = SAVE_VERSION
+    return data
+
+
+def _copy_save_value(value):
+    # Structural copy of JSON-ready data (far cheaper than copy.deepcopy).
+    if isinstance(value, list):
+        return [_copy_save_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _copy_save_value(item) for key, item in value.items()}
+    return value
+
+
+def prune_quest_progress(player_data):
+    # Quest progress entries still relevant to the active main and side quests.
+    active_quests = player_data.get('active_side_quests', [])
+    main_quest = player_data.get('main_quest_id', '')
+    return {q_id: value for q_id, value in player_data.get('quest_progress', {}).items()
+            if q_id in active_quests or q_id == main_quest or main_quest.startswith(q_id)}  # v1.8: Fix for quest chains
+
+
+## NEW (v1.9): Save migrations ##
+# Every save records the save_version that wrote it. Older saves (files from
+# before v1.9 have no version and count as 0) are brought up to date by
+# running the steps below in order, each a pure function from one version's
+# save dict to the next. Saves that are already current skip all of them.
+
+def _migrate_v1_6(data):
+    # v1.6: codex, skill cooldowns, fog of war and quests
+    data.setdefault('codex', [])
+    data.setdefault('skills_cd', {})
+    data.setdefault('skip_next', False)
+    data.setdefault('guard', False)
+    data.setdefault('respawned', False)
+    data.setdefault('key', False)
+    data.setdefault('visited_tiles', [[data.get('x', 0), data.get('y', 0)]])
+    data.setdefault('main_quest_id', 'MQ_01')
+    data.setdefault('quest_progress', {})
+    data.setdefault('active_side_quests', [])
+    return data
+
+
+def _migrate_v1_7(data):
+    # v1.7: equipment, echoes, split base/bonus stats and status effects
+    data.setdefault('equipment', {"weapon": None, "armor": None, "charm": None})
+    data.setdefault('inventory', [])
+    data.setdefault('equipped_echo', None)
+    data.setdefault('base_atk', data.get('atk', 3))
+    data.setdefault('base_def', 0)
+    data.setdefault('bonus_atk', 0)
+    data.setdefault('bonus_def', 0)
+    data.setdefault('active_effects', [])
+    return data
+
+
+def _migrate_v1_8(data):
+    # v1.8: completed side quests, stale quest progress from the old quest chains
+    data.setdefault('completed_side_quests', [])
+    data['quest_progress'] = prune_quest_progress(data)
+    return data
+
+
+# (version it upgrades from, label, step); the step produces version + 1
+SAVE_MIGRATIONS = [
+    (0, "v1.6", _migrate_v1_6),
+    (1, "v1.7", _migrate_v1_7),
+    (2, "v1.8", _migrate_v1_8),
+]
+SAVE_VERSION = len(SAVE_MIGRATIONS)
+
+
+def migrate_save(data):
+    # Returns (up-to-date save dict, list of migration labels that ran).
+    version = data.get('save_version', 0)
+    if not isinstance(version, int) or version > SAVE_VERSION:
+        raise SaveFormatError(f"Save file is from a newer version of the game (save version {version}).")
+    applied = []
+    if version < SAVE_VERSION:
+        data = dict(data)  # Steps may mutate their input; keep the caller's dict intact
+        for from_version, label, step in SAVE_MIGRATIONS[version:]:
+            data = step(data)
+            data['save_version'] = from_version + 1
+            applied.append(label)
+    return data, applied
+
+
+def upgrade_save_file(slot_file):
+    # Migrates one save in place (a legacy JSON save is rewritten as its .sav slot).
+    # Returns (slot file, version before, list of migrations run).
+    player_data, _ = read_save_file(slot_file)
+    before = player_data.get('save_version', 0)
+    upgraded, applied = migrate_save(player_data)
+    if applied or not os.path.exists(slot_file):
+        upgraded['save_slot'] = slot_file
+        write_save_file(slot_file, upgraded, index=False)
+    return slot_file, before, applied
+
+
+def import_legacy_saves(source=LEGACY_SAVE_DIRECTORY, directory=GAME_SAVE_DIRECTORY):
+    # Moves pre-v1.9 save_N.json files from `source` (the old working-directory
+    # location) into the default save directory and converts them to .sav
+    # slots. Only run on request (--import-legacy), as it takes the files away
+    # from the working directory. A save keeps its slot number unless that
+    # slot is taken, then it gets the next free one. Logs and returns
+    # [(old path, slot file)].
+    if os.path.abspath(source) == os.path.abspath(directory):
+        return []
+    try:
+        names = sorted(entry.name for entry in os.scandir(source) if entry.is_file())
+    except OSError:
+        return []
+    slot_manager = SaveSlots(directory)
+    legacy = [name for name in names if name.endswith(".json") and slot_manager.slot_number(name) is not None]
+    if not legacy:
+        return []
+
+    os.makedirs(directory, exist_ok=True)
+    slots, _ = slot_manager.scan()
+    moved = []
+    for name in legacy:
+        number = slot_manager.slot_number(name)
+        if number in slots:
+            number = max(slots) + 1
+        slot_file = slot_manager.path(number)
+        old_path = os.path.join(source, name)
+        shutil.move(old_path, legacy_save_path(slot_file))  # Read as the slot's legacy save until converted
+        slots[number] = slot_file
+        try:
+            upgrade_save_file(slot_file)
+            update_save_index(slot_file, read_save_file(slot_file)[0])
+            print(f"Moved old save {old_path} to {slot_file}")
+        except (OSError, SaveFormatError) as e:
+            print(f"Moved old save {old_path} to {legacy_save_path(slot_file)} (could not convert it: {e})")
+        moved.append((old_path, slot_file))
+    return moved
+
+
+def upgrade_save_directory(directory=None, workers=None):
+    # Migrates every slot in a save directory, in parallel. workers=1 runs in
+    # this process. Returns one (slot file, version before, migrations) per slot.
+    slots, _ = SaveSlots(directory or SLOTS.directory).scan()
+    paths = [slots[number] for number in sorted(slots)]
+    if workers == 1:
+        return [upgrade_save_file(path) for path in paths]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(upgrade_save_file, paths))
+
+
+## NEW (v1.9): Binary save format ##
+# A save file is a fixed header followed by the payload:
+#   header   "EOAS", schema version, payload size, CRC-32 of the payload
+#   payload  string table (every ID/name used, stored once)
+#            presence mask over SAVE_SCHEMA, then each present field:
+#            ints as zigzag varints, strings as string table refs,
+#            lists/maps of IDs as counted refs, fog of war as its raw bitmask
+#            JSON of any fields the schema doesn't cover (future proofing)
+# decode_save returns the same JSON-ready dict that player_to_save produces.
+SAVE_MAGIC = b"EOAS"
+SAVE_SCHEMA_VERSION = 1
+SAVE_HEADER = struct.Struct("<4sHII")  # magic, schema version, payload size, CRC-32
+
+SAVE_SCHEMA = (
+    ("name", "str"), ("save_slot", "str"),
+    ("hp", "int"), ("hp_max", "int"), ("base_atk", "int"), ("base_def", "int"),
+    ("bonus_atk", "int"), ("bonus_def", "int"), ("total_atk", "int"), ("total_def", "int"),
+    ("gold_bonus", "float"), ("pot", "int"), ("elix", "int"), ("gold", "int"),
+    ("x", "int"), ("y", "int"), ("level", "int"), ("xp", "int"), ("xp_to_next_level", "int"),
+    ("rage_potions", "int"), ("stone_potions", "int"), ("active_buff", "str"),
+    ("seal", "bool"), ("key", "bool"), ("dev_mode", "bool"), ("skip_next", "bool"),
+    ("guard", "bool"), ("respawned", "bool"),
+    ("main_quest_id", "str"), ("quest_progress", "counts"),
+    ("active_side_quests", "strs"), ("completed_side_quests", "strs"),
+    ("codex", "strs"), ("equipped_echo", "str"), ("inventory", "strs"),
+    ("equipment", "equipment"), ("skills_cd", "counts"), ("active_effects", "effects"),
+    ("visited_tiles", "visited"),
+    ("save_version", "int"),  # New fields go at the end: the presence mask is positional
+    ("save_generation", "int")
+)
+SAVE_EQUIPMENT_SLOTS = ("weapon", "armor", "charm")
+
+
+class SaveFormatError(ValueError):
+    # Raised for save files that are truncated, damaged or of an unknown format.
+    pass
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_str(value):
+    return value is None or isinstance(value, str)
+
+
+# Which values each field kind can store; anything else goes to the JSON extras
+SAVE_KIND_CHECKS = {
+    "int": _is_int,
+    "bool": lambda v: isinstance(v, bool),
+    "float": lambda v: isinstance(v, float) or _is_int(v),
+    "str": _is_str,
+    "strs": lambda v: isinstance(v, list) and all(isinstance(i, str) for i in v),
+    "counts": lambda v: isinstance(v, dict) and all(isinstance(k, str) and _is_int(n) for k, n in v.items()),
+    "effects": lambda v: isinstance(v, list) and all(
+        isinstance(e, dict) and set(e) == {"id", "turns"} and isinstance(e['id'], str) and _is_int(e['turns'])
+        for e in v),
+    "equipment": lambda v: isinstance(v, dict) and set(v) == set(SAVE_EQUIPMENT_SLOTS) and all(
+        _is_str(i) for i in v.values()),
+    "visited": lambda v: isinstance(v, dict) and set(v) == {"w", "h", "bits"}
+}
+
+# Looser per-kind types a migrated save must have (old saves may still hold
+# legacy shapes, e.g. visited_tiles as a list of [x, y] pairs)
+SAVE_KIND_TYPES = {
+    "int": (int,), "bool": (bool,), "float": (int, float), "str": (str, type(None)),
+    "strs": (list,), "counts": (dict,), "effects": (list,), "equipment": (dict,), "visited": (dict, list)
+}
+SAVE_REQUIRED_FIELDS = ("name", "hp", "level", "x", "y")  # Present in saves of every version
+
+
+def check_save_fields(data):
+    # Raises SaveFormatError unless `data` looks like a (migrated) player save:
+    # the required fields are there and every SAVE_SCHEMA field has its type.
+    if not isinstance(data, dict):
+        raise SaveFormatError("Not a save file.")
+    missing = [key for key in SAVE_REQUIRED_FIELDS if key not in data]
+    if missing:
+        raise SaveFormatError(f"Not a save file (missing {', '.join(missing)}).")
+    for key, kind in SAVE_SCHEMA:
+        if key in data and not isinstance(data[key], SAVE_KIND_TYPES[kind]):
+            raise SaveFormatError(f"Save field {key} has the wrong type ({type(data[key]).__name__}).")
+
+
+class _SaveWriter:
+    # Accumulates a save payload. Strings are interned into a table on the fly.
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}
+
+    def uint(self, value):
+        while value > 0x7F:
+            self.out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.out.append(value)
+
+    def int(self, value):
+        self.uint(value * 2 if value >= 0 else -value * 2 - 1)  # Zigzag
+
+    def str(self, value):
+        # 0 = None, otherwise string table index + 1
+        if value is None:
+            self.uint(0)
+            return
+        index = self.strings.setdefault(value, len(self.strings))
+        self.uint(index + 1)
+
+    def blob(self, data):
+        self.uint(len(data))
+        self.out += data
+
+    def field(self, kind, value):
+        if kind == "int" or kind == "bool":
+            self.int(int(value))
+        elif kind == "float":
+            self.out += struct.pack("<d", value)
+        elif kind == "str":
+            self.str(value)
+        elif kind == "strs":
+            self.uint(len(value))
+            for item in value:
+                self.str(item)
+        elif kind == "counts":
+            self.uint(len(value))
+            for item, count in value.items():
+                self.str(item)
+                self.int(count)
+        elif kind == "effects":
+            self.uint(len(value))
+            for effect in value:
+                self.str(effect['id'])
+                self.int(effect['turns'])
+        elif kind == "equipment":
+            for slot in SAVE_EQUIPMENT_SLOTS:
+                self.str(value[slot])
+        elif kind == "visited":
+            self.uint(value['w'])
+            self.uint(value['h'])
+            self.blob(base64.b64decode(value['bits']))
+
+
+class _SaveReader:
+    # Reads a save payload written by _SaveWriter.
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        self.pos = 0
+        self.strings = ()
+
+    def uint(self):
+        shift = value = 0
+        while True:
+            if self.pos >= len(self.buffer):
+                raise SaveFormatError("Save file is truncated.")
+            byte = self.buffer[self.pos]
+            self.pos += 1
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value
+            shift += 7
+
+    def int(self):
+        value = self.uint()
+        return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+    def str(self):
+        index = self.uint()
+        if index == 0:
+            return None
+        if index > len(self.strings):
+            raise SaveFormatError("Save file has a bad string reference.")
+        return self.strings[index - 1]
+
+    def blob(self):
+        size = self.uint()
+        if self.pos + size > len(self.buffer):
+            raise SaveFormatError("Save file is truncated.")
+        data = bytes(self.buffer[self.pos:self.pos + size])
+        self.pos += size
+        return data
+
+    def field(self, kind):
+        if kind == "int":
+            return self.int()
+        if kind == "bool":
+            return bool(self.int())
+        if kind == "float":
+            if self.pos + 8 > len(self.buffer):
+                raise SaveFormatError("Save file is truncated.")
+            value, = struct.unpack_from("<d", self.buffer, self.pos)
+            self.pos += 8
+            return value
+        if kind == "str":
+            return self.str()
+        if kind == "strs":
+            return [self.str() for _ in range(self.uint())]
+        if kind == "counts":
+            return {self.str(): self.int() for _ in range(self.uint())}
+        if kind == "effects":
+            return [{"id": self.str(), "turns": self.int()} for _ in range(self.uint())]
+        if kind == "equipment":
+            return {slot: self.str() for slot in SAVE_EQUIPMENT_SLOTS}
+        if kind == "visited":
+            width, height = self.uint(), self.uint()
+            return {"w": width, "h": height, "bits": base64.b64encode(self.blob()).decode("ascii")}
+        raise SaveFormatError(f"Unknown save field kind: {kind}")
+
+
+def encode_save(data):
+    # Encodes a JSON-ready save dict (see player_to_save) as binary save bytes.
+    body = _SaveWriter()
+    present = 0
+    extra = dict(data)
+    for bit, (key, kind) in enumerate(SAVE_SCHEMA):
+        if key in data and SAVE_KIND_CHECKS[kind](data[key]):
+            present |= 1 << bit
+            body.field(kind, extra.pop(key))
+    body.blob(json.dumps(extra, separators=(",", ":")).encode("utf-8") if extra else b"")
+
+    payload = _SaveWriter()
+    payload.uint(len(body.strings))
+    for text in body.strings:  # Dicts keep insertion order = table index
+        payload.blob(text.encode("utf-8"))
+    payload.uint(present)
+    payload.out += body.out
+    return SAVE_HEADER.pack(SAVE_MAGIC, SAVE_SCHEMA_VERSION, len(payload.out), zlib.crc32(payload.out)) + payload.out
+
+
+def _checked_payload(buffer):
+    # The payload of binary save bytes, after checking the header and checksum.
+    if len(buffer) < SAVE_HEADER.size:
+        raise SaveFormatError("Save file is truncated.")
+    magic, version, size, checksum = SAVE_HEADER.unpack_from(buffer, 0)
+    if magic != SAVE_MAGIC:
+        raise SaveFormatError("Not a save file.")
+    if version > SAVE_SCHEMA_VERSION:
+        raise SaveFormatError(f"Save file is from a newer version of the game (schema {version}).")
+    payload = memoryview(buffer)[SAVE_HEADER.size:SAVE_HEADER.size + size]
+    if len(payload) != size or zlib.crc32(payload) != checksum:
+        raise SaveFormatError("Save file is damaged (checksum mismatch).")
+    return payload
+
+
+def decode_save(buffer):
+    # Decodes binary save bytes back into the JSON-ready save dict.
+    reader = _SaveReader(_checked_payload(buffer))
+    try:
+        reader.strings = tuple(reader.blob().decode("utf-8") for _ in range(reader.uint()))
+    except UnicodeDecodeError:
+        raise SaveFormatError("Save file has a bad string table.") from None
+    present = reader.uint()
+    data = {}
+    for bit, (key, kind) in enumerate(SAVE_SCHEMA):
+        if present & (1 << bit):
+            data[key] = reader.field(kind)
+    extra = reader.blob()
+    if extra:
+        try:
+            extra = json.loads(extra.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise SaveFormatError("Save file has damaged extra fields.") from None
+        if not isinstance(extra, dict):
+            raise SaveFormatError("Save file has damaged extra fields.")
+        data.update(extra)
+    return data
+
+
+def write_save_binary(stream, data):
+    # Streams one encoded save to a binary file object.
+    stream.write(encode_save(data))
+
+
+def read_save_binary(stream):
+    # Reads one encoded save from a binary file object.
+    header = stream.read(SAVE_HEADER.size)
+    if len(header) < SAVE_HEADER.size:
+        raise SaveFormatError("Save file is truncated.")
+    size = SAVE_HEADER.unpack(header)[2]
+    return decode_save(header + stream.read(size))
+
+
+def parse_save_bytes(raw):
+    # Decodes a save in either the binary format or the pre-v1.9 JSON format.
+    if raw[:len(SAVE_MAGIC)] == SAVE_MAGIC:
+        return decode_save(raw)
+    try:
+        data = json.loads(raw.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise SaveFormatError("Save file is damaged.") from None
+    if not isinstance(data, dict):
+        raise SaveFormatError("Save file is damaged.")
+    return data
+
+
+def verify_save_bytes(raw):
+    # Raises SaveFormatError unless `raw` is an intact save. Binary saves are
+    # only checksummed, not decoded; legacy JSON saves have to be parsed.
+    if raw[:len(SAVE_MAGIC)] == SAVE_MAGIC:
+        _checked_payload(raw)
+    else:
+        parse_save_bytes(raw)
+
+
+def legacy_save_path(slot_file):
+    # Pre-v1.9 JSON save that a binary slot falls back to (save_1.sav -> save_1.json).
+    root, ext = os.path.splitext(slot_file)
+    return root + ".json" if ext == ".sav" else None
+
+
+def export_save_json(slot_file, json_path):
+    # Writes a slot as readable JSON (for debugging or hand editing).
+    data, _ = read_save_file(slot_file)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+
+def import_save_json(json_path, slot_file):
+    # Writes a JSON save (exported or pre-v1.9) into a slot in the binary format.
+    with open(json_path, "rb") as f:
+        data = parse_save_bytes(f.read())
+    data['save_slot'] = slot_file
+    write_save_file(slot_file, data)
+
+
+## NEW (v1.9): Player state object ##
+# The player used to be a plain dict that doubled as the save format. Player
+# keeps one __slots__ field per SAVE_SCHEMA entry plus the runtime caches
+# whose keys start with "_", and converts explicitly with from_save()/to_save().
+# The battle engine uses the fields directly (player.hp); the other handlers
+# still use string keys, so it also works as the old dict: player['hp'],
+# player.get('skills_cd', {}), 'guard' in player. Keys without a field (e.g.
+# from a newer save) are kept in a side dict and saved back unchanged.
+
+class Player(collections.abc.MutableMapping):
+    CACHES = ("_stats", "_combat_profile", "_skills", "_minimap", "_autosave_deltas", "_loaded_version")
+    FIELDS = tuple(key for key, _ in SAVE_SCHEMA) + CACHES
+    FIELD_SET = frozenset(FIELDS)
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, fields=()):
+        self._extra = {}
+        for key, value in dict(fields).items():
+            self[key] = value
+
+    @classmethod
+    def from_save(cls, data):
+        # Builds a player from a save dict, decoding the fog-of-war bitmap and status effects.
+        player = cls(data)
+        get_visited_mask(player)
+        get_status_effects(player)
+        return player
+
+    def to_save(self):
+        return player_to_save(self)
+
+    def copy(self):
+        # Independent copy for simulations, far cheaper than copy.deepcopy.
+        # The tuple caches are shared; the minimap cache is tied to the
+        # original fog of war and is dropped.
+        clone = Player.__new__(Player)
+        for key in self.FIELDS:
+            if key == "_minimap" or not hasattr(self, key):
+                continue
+            value = getattr(self, key)
+            if isinstance(value, (StatusEffects, VisitedMask)):
+                value = value.copy()
+            elif isinstance(value, (list, dict)):
+                value = _copy_save_value(value)
+            setattr(clone, key, value)
+        clone._extra = _copy_save_value(self._extra)
+        return clone
+
+    def __getitem__(self, key):
+        if key in self.FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.FIELD_SET:
+            setattr(self, key, value)
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        else:
+            del self._extra[key]
+
+    def __iter__(self):
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        return hasattr(self, key) if key in self.FIELD_SET else key in self._extra
+
+    def get(self, key, default=None):
+        if key in self.FIELD_SET:
+            return getattr(self, key, default)
+        return self._extra.get(key, default)
+
+    def __repr__(self):
+        return f"Player({self.get('name')!r}, level {self.get('level')})"
+
+
+## NEW (v1.9): Crash-safe save files ##
+# A save is written to a temp file next to the slot, fsynced and renamed over
+# the slot, so the slot always holds either the old or the new save in full.
+# The save being replaced is first rotated into a short journal
+# (save_1.sav.bak1 .. bakN); loading falls back to the newest readable one.
+
+def save_journal_paths(slot_file):
+    # Journal snapshots of a slot, newest first.
+    return [f"{slot_file}.bak{i}" for i in range(1, SAVE_JOURNAL_DEPTH + 1)]
+
+
+def _fsync_directory(path):
+    # Makes a rename durable. Directories can't be opened on Windows; skip there.
+    if os.name == "nt":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_file_atomic(path, data, before_replace=None):
+    # Replaces `path` with `data` (bytes) in one buffered write + fsync + rename.
+    # before_replace() runs once the new data is safely on disk.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if before_replace:
+            before_replace()
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(path)
+
+
+def write_save_file(slot_file, data, index=True):
+    # Writes a save snapshot (JSON-ready dict), rotating the old one into the journal.
+    # index=False leaves the slot index alone (for parallel batch writers).
+    payload = encode_save(data)
+    journal = save_journal_paths(slot_file)
+
+    def rotate_journal():
+        # The live slot is copied, not moved, into .bak1 so the slot always
+        # has a primary file, even if the game dies before the final rename.
+        # A damaged slot is not rotated: it would push good snapshots out.
+        if not journal or not os.path.exists(slot_file):
+            return
+        try:
+            verify_save_file(slot_file)
+        except SaveFormatError:
+            return
+        for older, newer in zip(reversed(journal[1:]), reversed(journal[:-1])):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+        shutil.copy2(slot_file, journal[0])
+
+    write_file_atomic(slot_file, payload, rotate_journal)
+    if index:
+        update_save_index(slot_file, data)
+
+
+def read_save_file(slot_file):
+    # Returns (player_data, from_journal) for the newest readable snapshot of a slot,
+    # falling back to a pre-v1.9 JSON save last. Raises FileNotFoundError if the
+    # slot is empty, SaveFormatError if nothing is readable.
+    journal = save_journal_paths(slot_file)
+    legacy = legacy_save_path(slot_file)
+    error = None
+    for path in [slot_file] + journal + ([legacy] if legacy else []):
+        try:
+            with open(path, "rb") as f:
+                return parse_save_bytes(f.read()), path in journal
+        except FileNotFoundError as e:
+            error = error or e
+        except SaveFormatError as e:
+            error = e
+    raise error
+
+
+## NEW (v1.9): Background save writer ##
+# Saves are handed to one writer thread so the game never waits on the disk
+# (noticeable on network home directories). Each slot has at most one queued
+# write: a newer save of a slot that is still waiting replaces the older one.
+
+class SaveWriter:
+    def __init__(self, depth=SAVE_QUEUE_DEPTH):
+        self.queue = queue.Queue(maxsize=depth)  # Slot files waiting to be written
+        self.pending = {}  # slot file -> newest (data, after) not written yet
+        self.lock = threading.Lock()
+        self.errors = []
+        self.thread = None
+
+    def submit(self, slot_file, data, after=None):
+        # Queues `data` (a player_to_save() snapshot) for `slot_file`.
+        # after(slot_file) runs once it is written. Failures are kept for
+        # take_errors(); the writer thread never prints.
+        with self.lock:
+            queued = slot_file in self.pending
+            self.pending[slot_file] = (data, after)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+                self.thread.start()
+        if not queued:
+            self.queue.put(slot_file)  # Only blocks while SAVE_QUEUE_DEPTH slots are waiting
+
+    def _run(self):
+        while True:
+            slot_file = self.queue.get()
+            try:
+                with self.lock:
+                    data, after = self.pending.pop(slot_file)
+                write_save_file(slot_file, data)
+                if after:
+                    after(slot_file)
+            except Exception as e:
+                with self.lock:
+                    self.errors.append(e)
+            finally:
+                self.queue.task_done()
+
+    def take_errors(self):
+        # Errors from writes since the last call.
+        with self.lock:
+            errors, self.errors = self.errors, []
+        return errors
+
+    def flush(self):
+        # Waits for every queued save. Returns the errors of failed writes.
+        self.queue.join()
+        return self.take_errors()
+
+
+SAVE_WRITER = SaveWriter()
+
+
+def report_save_errors(errors=None):
+    # Prints failed background saves (by default the ones not reported yet).
+    for error in SAVE_WRITER.take_errors() if errors is None else errors:
+        print("Failed to save:", error)
+
+
+## NEW (v1.9): Save integrity checks ##
+# Every binary save carries a CRC32 of its payload in the header, so a slot
+# can be verified without decoding it. A slot whose file fails the check is
+# "corrupted" (not empty): the menus show it as such and offer to restore the
+# newest journal snapshot that passes.
+
+def verify_save_file(path):
+    # Raises FileNotFoundError / SaveFormatError unless `path` is an intact save.
+    with open(path, "rb") as f:
+        verify_save_bytes(f.read())
+
+
+def check_save_slot(slot_file):
+    # Returns (state, backup): state is "ok", "corrupted", "missing" (no
+    # primary file, but an intact journal snapshot) or "empty"; backup is the
+    # newest intact journal snapshot of a corrupted or missing slot (or None).
+    legacy = legacy_save_path(slot_file)
+    state = "missing"
+    for path in [slot_file] + ([legacy] if legacy else []):
+        try:
+            verify_save_file(path)
+            return "ok", None
+        except FileNotFoundError:
+            continue
+        except SaveFormatError:
+            state = "corrupted"
+            break
+    for path in save_journal_paths(slot_file):
+        try:
+            verify_save_file(path)
+            return state, path
+        except (FileNotFoundError, SaveFormatError):
+            continue
+    return ("corrupted", None) if state == "corrupted" else ("empty", None)
+
+
+def verify_save_directory(directory=None):
+    # Checks every slot in a save directory. Returns (slot file, state, backup) per slot.
+    slots, _ = SaveSlots(directory or SLOTS.directory).scan()
+    return [(slots[number],) + check_save_slot(slots[number]) for number in sorted(slots)]
+
+
+def restore_save_backup(slot_file, backup):
+    # Replaces a corrupted slot with its journal snapshot `backup`.
+    with open(backup, "rb") as f:
+        raw = f.read()
+    verify_save_bytes(raw)
+    write_file_atomic(slot_file, raw)
+    update_save_index(slot_file, parse_save_bytes(raw))
+
+
+def save_game(player):
+    # Saves the player data to their assigned slot file.
+    slot_file = player.get('save_slot')
+    if not slot_file:
+        print("Error: No save slot associated with player.")
+        pause(1.5)
+        return
+
+    try:
+        # A full save supersedes the autosave log (see Autosaver)
+        player['save_generation'] = player.get('save_generation', 0) + 1
+        SAVE_WRITER.submit(slot_file, player_to_save(player), after=clear_autosave_log)
+        if RUNTIME.background_saves:
+            report_save_errors()  # Earlier writes; a failure of this one shows at the next prompt
+            print("Game saved!")
+        else:  # Headless runtimes wait, so the outcome is reported here
+            errors = SAVE_WRITER.flush()
+            report_save_errors(errors)
+            if not errors:
+                print("Game saved!")
+    except Exception as e:
+        print("Failed to save:", e)
+
+
+def load_save_data(slot_file):
+    # Reads a slot as the game sees it: newest readable snapshot, migrated to
+    # the current version, with its autosave log replayed on top.
+    # Returns (player_data, from_journal); raises like read_save_file().
+    player, from_journal = read_save_file(slot_file)
+
+    # v1.9: Bring saves from older versions up to date (no-op for current saves)
+    version = player.get('save_version', 0)
+    player, _ = migrate_save(player)
+    player['_loaded_version'] = version
+    player['save_slot'] = slot_file  # v1.9: Slots moved into the save directory as .sav files
+
+    # v1.9: Replay progress autosaved since the last full save
+    deltas = read_autosave_log(slot_file, player.get('save_generation', 0))
+    for delta in deltas:
+        apply_save_delta(player, delta)
+    player['_autosave_deltas'] = len(deltas)
+    return player, from_journal
+
+
+def load_game(slot_file):
+    try:
+        player, from_journal = load_save_data(slot_file)
+        if from_journal:
+            print("The save file was damaged. Restored the most recent good backup.")
+
+        # Failsafe for loading saves before map expansion
+        if not WORLD.contains(player['x'], player['y']):
+            player['x'], player['y'] = 2, 3
+            print("Detected old save location. Warping to Town Centre.")
+
+        # v1.9: Decode the fog-of-war bitmap (or migrate a legacy [x, y] list) and status effects
+        player = Player.from_save(player)
+
+        # Always recalculate stats on load
+        player = recalculate_player_stats(player)
+
+        # Ensure HP isn't higher than max after potential stat changes
+        if player['hp'] > player['hp_max']:
+            player['hp'] = player['hp_max']
+
+        print(f"Welcome back, {player['name']}!")
+        safe_input("> ")
+        return player
+    except (FileNotFoundError, SaveFormatError):
+        print("No valid save file found.")
+        pause(1.2)
+        return None
+
+
+## NEW (v1.9): Autosave delta log ##
+# Between full saves, the game appends what changed since the last autosave to
+# save_1.sav.log: one JSON line per checkpoint holding the changed save keys
+# (and only the changed bytes of the fog-of-war bitmap). The first line names
+# the save_generation of the snapshot the deltas apply to, so a log left over
+# from an older snapshot (e.g. a crash between a full save and clearing the
+# log) is ignored. A torn last line from a crash mid-append is dropped.
+
+AUTOSAVE_LOG_EXT = ".log"
+
+
+def autosave_log_path(slot_file):
+    return slot_file + AUTOSAVE_LOG_EXT
+
+
+def clear_autosave_log(slot_file):
+    try:
+        os.remove(autosave_log_path(slot_file))
+    except FileNotFoundError:
+        pass
+
+
+def diff_save(old, new):
+    # The delta turning save dict `old` into `new`, or None if they match.
+    delta = {}
+    changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    old_visited, new_visited = old.get('visited_tiles'), changed.get('visited_tiles')
+    if (isinstance(old_visited, dict) and isinstance(new_visited, dict)
+            and (old_visited['w'], old_visited['h']) == (new_visited['w'], new_visited['h'])):
+        old_bits = base64.b64decode(old_visited['bits'])
+        new_bits = base64.b64decode(new_visited['bits'])
+        delta['visited'] = [[i, b] for i, (a, b) in enumerate(zip(old_bits, new_bits)) if a != b]
+        del changed['visited_tiles']
+    if changed:
+        delta['set'] = changed
+    if removed:
+        delta['del'] = removed
+    return delta or None
+
+
+def apply_save_delta(data, delta):
+    # Applies a diff_save() delta to a save (or player) dict in place.
+    data.update(delta.get('set', {}))
+    for key in delta.get('del', []):
+        data.pop(key, None)
+    if delta.get('visited'):
+        visited = data.get('visited_tiles')
+        if isinstance(visited, VisitedMask):
+            for i, b in delta['visited']:
+                visited.bits[i] = b
+        else:
+            bits = bytearray(base64.b64decode(visited['bits']))
+            for i, b in delta['visited']:
+                bits[i] = b
+            data['visited_tiles'] = dict(visited, bits=base64.b64encode(bytes(bits)).decode("ascii"))
+    return data
+
+
+def append_autosave_delta(slot_file, generation, delta, new_log=False):
+    # Appends one delta durably. new_log starts the log over for `generation`.
+    lines = [json.dumps({"base": generation})] if new_log else []
+    lines.append(json.dumps(delta, separators=(",", ":")))
+    with open(autosave_log_path(slot_file), "w" if new_log else "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_autosave_log(slot_file, generation):
+    # The deltas logged on top of the snapshot with this save_generation.
+    try:
+        with open(autosave_log_path(slot_file), "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+    except FileNotFoundError:
+        return []
+    deltas = []
+    for i, line in enumerate(lines):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            break
+        if i == 0:
+            if not isinstance(entry, dict) or entry.get("base") != generation:
+                return []
+        elif isinstance(entry, dict):
+            deltas.append(entry)
+    return deltas
+
+
+AUTOSAVE_LEAVE_STATES = ("shop", "town", "mayor", "cave")
+
+
+class Autosaver:
+    # Autosaves one player at a time: main() calls checkpoint() at key
+    # transitions, which logs a delta against the last autosaved state. Every
+    # `every` deltas (and on close) the log is compacted into a full save.
+    def __init__(self, every=AUTOSAVE_DELTAS_PER_SNAPSHOT):
+        self.every = every
+        self.player = None
+        self.slot_file = None
+        self.saved = None  # Save dict as of the last checkpoint
+        self.deltas = 0
+
+    def track(self, player, new_game=False):
+        # Starts autosaving a player that was just loaded (or created, with
+        # new_game: the first checkpoint then writes a full save over the slot).
+        self.close()
+        self.player = player
+        self.slot_file = player.get('save_slot')
+        self.deltas = player.pop('_autosave_deltas', 0)
+        self.saved = None if new_game else player_to_save(player)
+        if new_game and self.slot_file:
+            clear_autosave_log(self.slot_file)  # The old save in this slot is being replaced
+
+    def quests_changed(self, player):
+        return self.saved is not None and any(
+            player.get(key) != self.saved.get(key)
+            for key in ('main_quest_id', 'active_side_quests', 'completed_side_quests'))
+
+    def checkpoint(self, player):
+        if not player or not self.slot_file or player.get('save_slot') != self.slot_file:
+            return
+        current = player_to_save(player)
+        if self.saved is None or current.get('save_generation') != self.saved.get('save_generation'):
+            # Nothing saved yet, or save_game() wrote a full save since the last checkpoint
+            self.compact(current, player)
+            return
+        delta = diff_save(self.saved, current)
+        if delta is None:
+            return
+        if self.deltas + 1 >= self.every:
+            self.compact(current, player)
+            return
+        if self.deltas == 0:
+            SAVE_WRITER.flush()  # A queued full save would clear the new log once written
+        try:
+            append_autosave_delta(self.slot_file, current.get('save_generation', 0), delta, new_log=self.deltas == 0)
+        except OSError:
+            return  # Autosaving is best effort; the next checkpoint retries
+        previous, self.saved = self.saved, current
+        self.deltas += 1
+        if save_slot_summary(current) != save_slot_summary(previous):
+            update_save_index(self.slot_file, current)  # Keep the slot menus current
+
+    def compact(self, data, player=None):
+        # Queues `data` as a full save; the log is dropped once it is written.
+        data['save_generation'] = data.get('save_generation', 0) + 1
+        SAVE_WRITER.submit(self.slot_file, data, after=clear_autosave_log)
+        if player is not None:
+            player['save_generation'] = data['save_generation']
+        self.saved, self.deltas = data, 0
+
+    def close(self):
+        # Folds any logged deltas into a full save (on quit or when switching
+        # players), unless save_game() has saved the player since.
+        if (self.slot_file and self.saved is not None and self.deltas
+                and self.player.get('save_generation') == self.saved.get('save_generation')):
+            self.compact(self.saved, self.player)
+        self.player, self.slot_file, self.saved, self.deltas = None, None, None, 0
+
+
+## MODIFIED (v1.9): Derived stats are cached on the player ##
+# player['_stats'] holds (inputs, totals). The inputs are the only fields the
+# totals depend on (level, base and bonus stats, equipment, Focused Echo), so
+# any change to them invalidates the cache without every caller having to
+# mark the player dirty.
+
+def player_stat_totals(player):
+    # (total_atk, total_def, hp_max, gold_bonus) for the player's current build.
+    equipment = tuple(player['equipment'].values())
+    echo_id = player['equipped_echo']
+    inputs = (player['level'], player['base_atk'], player['base_def'],
+              player.get('bonus_atk', 0), player.get('bonus_def', 0), equipment, echo_id)
+    cached = player.get('_stats')
+    if cached and cached[0] == inputs:
+        return cached[1]
+
+    # Start with base stats from level and permanent bonuses
+    total_atk = player['base_atk'] + player.get('bonus_atk', 0)
+    total_def = player['base_def'] + player.get('bonus_def', 0)
+    total_hp_max = 50 + ((player['level'] - 1) * 10)
+    total_gold_bonus = 0.0
+
+    # Add stats from Equipment, then the single Focused Echo
+    vectors = [EQUIPMENT_STATS[EQUIPMENT_IDS[item_id]] for item_id in equipment if item_id in EQUIPMENT_IDS.index]
+    if echo_id in CODEX_IDS.index:
+        vectors.append(CODEX_STATS[CODEX_IDS[echo_id]])
+    for atk, def_, hp_max, gold_bonus in vectors:
+        total_atk += atk
+        total_def += def_
+        total_hp_max += hp_max
+        total_gold_bonus += gold_bonus
+
+    totals = (total_atk, total_def, total_hp_max, total_gold_bonus)
+    player['_stats'] = (inputs, totals)
+    return totals
+
+
+## NEW (v1.9): Compiled combat profile of the player's loadout ##
+CombatProfile = collections.namedtuple("CombatProfile", [
+    "on_hit",       # (effect, chance, turns) tuples tried on every hit (weapon, charm, echo)
+    "burn_resist",  # Share of burn/fire damage resisted (armor first, then the echo)
+    "resist_msg",   # Message for a resisted hit ("{}" is "burn" or "fire"), or None
+    "evade",        # Chance to evade a regular enemy attack
+    "evade_item",   # Name of the item granting the evade, for the message
+])
+
+
+def compile_combat_profile(weapon, armor, charm, echo_id):
+    on_hit = []
+    for item_id in (weapon, charm):
+        if item_id in EQUIPMENT_IDS.index:
+            on_hit.extend(EQUIPMENT_ON_HIT[EQUIPMENT_IDS[item_id]])
+    if echo_id in CODEX_IDS.index:
+        on_hit.extend(CODEX_ON_HIT[CODEX_IDS[echo_id]])
+
+    burn_resist, resist_msg, evade, evade_item = 0.0, None, 0.0, None
+    sources = [EQUIPMENT_DB.get(item_id, {}) for item_id in (weapon, armor, charm)]
+    sources.append(CODEX_ENTRIES.get(echo_id, {}))
+    for source in sources:
+        resist, evade_chance, msg = SPECIAL_RULES.get(source.get('special'), (0.0, 0.0, None))
+        if resist and not burn_resist:
+            burn_resist, resist_msg = resist, msg
+        if evade_chance and not evade:
+            evade, evade_item = evade_chance, source.get('name')
+    return CombatProfile(tuple(on_hit), burn_resist, resist_msg, evade, evade_item)
+
+
+def player_combat_profile(player):
+    # The player's CombatProfile, cached on the player like '_stats' and
+    # recompiled only when the equipment or the Focused Echo changes.
+    equipment = player.equipment or {}
+    loadout = (equipment.get('weapon'), equipment.get('armor'), equipment.get('charm'), player.equipped_echo)
+    cached = getattr(player, '_combat_profile', None)
+    if cached and cached[0] == loadout:
+        return cached[1]
+    profile = compile_combat_profile(*loadout)
+    player._combat_profile = (loadout, profile)
+    return profile
+
+
+def resist_burn(profile, damage, source, log=None):
+    # Applies the profile's burn resistance to burn/fire damage (at least 1 gets through).
+    if profile.burn_resist > 0.0:
+        log_event(log, profile.resist_msg.format(source))
+        damage = max(1, int(damage * (1.0 - profile.burn_resist)))
+    return damage
+
+
+def recalculate_player_stats(player):
+    current_hp_percent = player.get('hp', 1) / max(1, player.get('hp_max', 1))
+
+    # Update player object with calculated totals
+    player['total_atk'], player['total_def'], player['hp_max'], player['gold_bonus'] = player_stat_totals(player)
+
+    # Restore HP based on percentage, clamped to 1 minimum
+    new_hp = max(1, int(player['hp_max'] * current_hp_percent))
+
+    # Ensure HP doesn't exceed new max
+    player['hp'] = min(new_hp, player['hp_max'])
+
+    return player
+
+
+def apply_level_growth(player):
+    # Spends banked XP on levels (no output). Returns True if any level was gained.
+    leveled_up = False
+    max_level = MAX_LEVEL
+
+    while player['xp'] >= player['xp_to_next_level'] and player['level'] < max_level:
+        leveled_up = True
+        overflow = player['xp'] - player['xp_to_next_level']
+        player['level'] += 1
+        player['base_atk'] += 1  # Increase BASE ATK
+        player['xp'] = overflow
+        player['xp_to_next_level'] = int(player['xp_to_next_level'] * 1.6)
+
+        # If max level is reached, set XP requirements high
+        if player['level'] == max_level:
+            player['xp'] = 0
+            player['xp_to_next_level'] = 9999999  # Effectively infinite
+
+    return leveled_up
+
+
+def handle_level_up(player):
+    # Handles player leveling up.
+    max_level = MAX_LEVEL
+    leveled_up = apply_level_growth(player)
+
+    if leveled_up:
+        draw_line()
+        print(f"LEVEL UP! You are now level {player['level']}!")
+        # Recalculate stats BEFORE fully healing
+        player = recalculate_player_stats(player)
+        player['hp'] = player['hp_max']  # Full heal to new max HP
+
+        print(f"HP MAX increased to {player['hp_max']}!")
+        print(f"Base ATK increased to {player['base_atk']}!")
+        print(f"(Total ATK is now {player['total_atk']})")
+        if player['level'] == max_level:
+            print("You have reached the maximum level!")
+        else:
+            print(f"Next level at {player['xp_to_next_level']} XP.")
+        draw_line()
+    return player
+
+
+def codex_add(player, entry_id):
+    if entry_id not in CODEX_ENTRIES: return player
+    if entry_id not in player.get('codex', []):
+        player.setdefault('codex', []).append(entry_id)
+        print(f"(New Echo added to Codex: {CODEX_ENTRIES[entry_id]['title']})")
+        player = check_quest_completion(player, "COLLECT_ECHO", entry_id)
+    return player
+
+
+def show_codex(player):
+    clear_screen()
+    draw_line()
+    print("ECHO CODEX (Collected Memories)")
+    draw_line()
+    if not player.get('codex'):
+        print("You have not collected any echoes yet.")
+        print("\n(Visit the Echo Guild in Town to Focus on a memory)")
+    else:
+        codex_list = sorted(player.get('codex', []))
+        for i, eid in enumerate(codex_list, 1):
+            entry = CODEX_ENTRIES.get(eid, {})
+            print(f"[{i}] {entry.get('title', 'Unknown')}")
+    draw_line()
+    print("\nEnter number to read, or press Enter to return.")
+    choice = safe_input("# ")
+
+    codex_list = sorted(player.get('codex', []))
+
+    if choice.strip().isdigit():
+        idx = int(choice.strip()) - 1
+        if 0 <= idx < len(codex_list):
+            eid_to_read = codex_list[idx]
+            entry = CODEX_ENTRIES.get(eid_to_read, {})
+
+            # Sub-menu for displaying echo details
+            clear_screen()
+            draw_line()
+            print(f"{entry.get('title', 'Unknown')}")
+            draw_line()
+            typewriter_effect(entry.get('text', ''), delay=0.03)
+            draw_line()
+
+            # Show potential buffs and effects
+            if entry.get('buff'):
+                print(f"Focus Buff: {entry['buff']}")
+            if entry.get('effect_on_hit'):
+                eff = entry['effect_on_hit']
+                print(f"Focus Effect (On Hit): {eff.get('chance', 0) * 100}% chance to inflict {eff.get('id', '?')}")
+            if entry.get('combat_effect'):
+                eff = entry['combat_effect']
+                print(f"Focus Effect (Combat Start): Applies {eff.get('id', '?')}")
+
+            draw_line()
+            print("(To Focus this memory, visit the Echo Guild in Town)")
+            safe_input("\n> Press Enter to return to Codex...")
+            show_codex(player)  # Return to the codex list
+    # Return if user pressed Enter or invalid input
+    return
+
+
+## MODIFIED (v1.9): Skills come from the SKILLS registry ##
+def player_skills(player):
+    # (unlocked skill names, battle menu skills) for the player's level and codex.
+    # Cached on the player until a level-up or a new skill-granting codex entry.
+    codex = player.codex
+    inputs = (player.level,) + tuple(entry in codex for entry in SKILL_CODEX_GATES)
+    cached = getattr(player, '_skills', None)
+    if cached and cached[0] == inputs:
+        return cached[1]
+
+    level = inputs[0]
+    unlocked = frozenset(name for name, skill in SKILL_TABLE.items()
+                         if (skill['level'] is not None and level >= skill['level'])
+                         or (skill['codex'] is not None and skill['codex'] in codex))
+    menu = []
+    for tiers in SKILL_LINES:
+        best = [name for name in tiers if name in unlocked]
+        if best: menu.append(best[-1])
+
+    skills = (unlocked, tuple(menu))
+    player._skills = (inputs, skills)
+    return skills
+
+
+def skill_available(player, skill_name):
+    # Checks if a skill is available based on level or codex.
+    return skill_name in player_skills(player)[0]
+
+
+def skill_on_cooldown(player, skill_name):
+    # Checks if a skill is currently on cooldown.
+    return player.skills_cd.get(SKILL_CD_KEY.get(skill_name, skill_name), 0) > 0
+
+
+def set_skill_cd(player, skill_name, turns):
+    # Sets the cooldown for a skill.
+    player.skills_cd[SKILL_CD_KEY.get(skill_name, skill_name)] = turns
+
+
+def decrement_skill_cooldowns(player):
+    # Reduces cooldown turns for all active cooldowns.
+    skills_cd = player.skills_cd
+    for k in skills_cd:
+        if skills_cd[k] > 0:
+            skills_cd[k] -= 1
+
+
+# ==============================================================================
+# ## 4. GAME STATE HANDLERS ##
+# (Functions handling each game screen/state)
+# ==============================================================================
+
+def handle_main_menu():
+    # Displays the main game menu.
+    clear_screen()
+    draw_line()
+    # Simple ASCII Art for the title
+    print(r"""
+█▀▀░█▀▀░█░█░█▀█░█▀▀░█▀▀░░█▀█░█▀▀░░█▀█░█░█░█▀▄░█▀▀░█▀█
+█▀▀░█░░░█▀█░█░█░█▀▀░▀▀█░░█░█░█▀▀░░█▀█░█░█░█▀▄░█▀▀░█░█
+▀▀▀░▀▀▀░▀░▀░▀▀▀░▀▀▀░▀▀▀░░▀▀▀░▀░░░░▀░▀░▀▀▀░▀░▀░▀▀▀░▀░▀
+    """)
+    draw_line()
+    print("1. NEW GAME")
+    print("2. LOAD GAME")
+    print("3. QUIT GAME")
+    choice = safe_input("# ")
+    if choice == "1":
+        return "new_game_menu"
+    if choice == "2":
+        return "load_game_menu"
+    if choice == "3":
+        return "exit"
+    return "main_menu"  # Default: reload main menu
+
+
+## MODIFIED (v1.9): Any number of slots, shown a page at a time ##
+def show_slot_page(entries, page):
+    # Prints one page of (slot_file, info) entries. Returns the entries shown.
+    first = page * SAVE_SLOTS_PER_PAGE
+    shown = entries[first:first + SAVE_SLOTS_PER_PAGE]
+    for i, (slot_file, info) in enumerate(shown, 1):
+        if info and info.get('corrupted'):
+            print(f"{i}. [Missing Save]" if info.get('missing') else f"{i}. [Corrupted Save]")
+            if info['backup']:
+                print(f"   Backup: [Lvl {info['level']}] {info['name']} (ATK: {info['atk']})")
+            else:
+                print("   No readable backup")
+        elif info:
+            print(f"{i}. [Lvl {info['level']}] {info['name']} (ATK: {info['atk']})")
+            print(f"   Location: {info['location']}")
+        else:
+            print(f"{i}. [Empty Slot]")
+    page_count = (len(entries) + SAVE_SLOTS_PER_PAGE - 1) // SAVE_SLOTS_PER_PAGE
+    if page_count > 1:
+        print(f"(Page {page + 1}/{page_count}) N - Next page | P - Previous page")
+    return shown
+
+
+def turn_slot_page(choice, entries, page):
+    # Returns the new page for an N/P choice, or None if the choice isn't paging.
+    page_count = (len(entries) + SAVE_SLOTS_PER_PAGE - 1) // SAVE_SLOTS_PER_PAGE
+    choice = choice.strip().lower()
+    if choice == "n":
+        return min(page + 1, max(page_count - 1, 0))
+    if choice == "p":
+        return max(page - 1, 0)
+    return None
+
+
+def handle_new_game_menu():
+    # Handles the new game slot selection screen.
+    SAVE_WRITER.flush()  # List what is about to be on disk
+    entries = SLOTS.list(with_empty=True)
+    page = 0
+    while True:
+        clear_screen()
+        draw_line()
+        print("SELECT A SLOT FOR YOUR NEW GAME")
+        draw_line()
+
+        shown = show_slot_page(entries, page)
+
+        print("0. Back to Main Menu")
+        draw_line()
+        choice = safe_input("# ")
+
+        new_page = turn_slot_page(choice, entries, page)
+        if new_page is not None:
+            page = new_page
+            continue
+        break
+
+    if choice.strip().isdigit():
+        slot_index = int(choice) - 1
+
+        if choice == "0":
+            return "main_menu", None  # Return state and player (None)
+
+        if 0 <= slot_index < len(shown):
+            selected_file, info = shown[slot_index]
+
+            # Confirm overwrite if slot is not empty
+            if info and info.get('corrupted'):
+                print("\nWARNING: This will overwrite a corrupted save.")
+                confirm = safe_input("Are you sure? (y/n): ").lower()
+                if confirm != 'y':
+                    return "new_game_menu", None
+            elif info:
+                print(
+                    f"\nWARNING: This will overwrite [Lvl {info['level']}] {info['name']}.")
+                confirm = safe_input("Are you sure? (y/n): ").lower()
+                if confirm != 'y':
+                    return "new_game_menu", None  # Return to slot selection
+
+            # Get player name and create new player
+            clear_screen()
+            name = safe_input("# What's your name, hero? ")
+            if not name: name = "Wanderer"  # Default name
+
+            player = create_new_player(name, selected_file)
+
+            # Activate dev mode for specific names
+            if name in ["Congchi Lee", "admin"]:
+                player['dev_mode'] = True;
+                print("\n*** Dev Mode Activated ***");
+                pause(1.2)
+
+            show_lore()  # Show intro lore
+            return "playing", player  # Start the game
+
+    return "new_game_menu", None  # Invalid input, reload menu
+
+
+def handle_load_game_menu():
+    # Handles the load game slot selection screen.
+    SAVE_WRITER.flush()  # List what is about to be on disk
+    entries = SLOTS.list()  # Only non-empty slots
+    page = 0
+    while True:
+        clear_screen()
+        draw_line()
+        print("SELECT A SLOT TO LOAD")
+        draw_line()
+
+        shown = show_slot_page(entries, page)
+        if not entries:
+            print("No saved games found.")
+
+        print("0. Back to Main Menu")
+        draw_line()
+        choice = safe_input("# ")
+
+        new_page = turn_slot_page(choice, entries, page)
+        if new_page is not None:
+            page = new_page
+            continue
+        break
+
+    if choice == "0":
+        return "main_menu", None  # Return state and player (None)
+
+    if choice.strip().isdigit() and 1 <= int(choice) <= len(shown):
+        selected_file, info = shown[int(choice) - 1]
+        if info.get('corrupted'):
+            # v1.9: Offer the newest intact backup instead of failing to load
+            if not info['backup']:
+                print("\nThis save is corrupted and has no readable backup.")
+                pause(1.5)
+                return "load_game_menu", None
+            problem = "is missing" if info.get('missing') else "is corrupted"
+            print(f"\nThis save {problem}. Restore the backup ([Lvl {info['level']}] {info['name']})?")
+            if safe_input("(y/n): ").lower() != 'y':
+                return "load_game_menu", None
+            try:
+                restore_save_backup(selected_file, info['backup'])
+            except (OSError, SaveFormatError) as e:
+                print("Failed to restore the backup:", e)
+                pause(1.5)
+                return "load_game_menu", None
+        player = load_game(selected_file)  # Attempt to load
+        if player:
+            return "playing", player  # Load successful, start game
+        else:
+            # load_game() prints error message
+            pause(1)
+            return "load_game_menu", None  # Return to load menu on failure
+
+    return "load_game_menu", None  # Invalid input, reload menu
+
+
+def show_lore():
+    # Displays the introductory lore sequence.
+    clear_screen()
+    draw_line()
+    typewriter_effect(f"Echoes of {WORLD_NAME}", delay=0.04)
+    draw_line()
+    pause(0.5)
+
+    paragraphs = [
+        f"There was once a land named {WORLD_NAME}...",
+        "They lived with a flame the elders called the Breath of Dawn...",
+        "It was not a fire that burned, but one that *remembered*.",
+        "It held the shape of their songs, the weight of their promises, and the quiet joy of their long afternoons.",
+        "But a shadow fell. A great, silent beast whose roar was not sound, but *forgetting*.",
+        f"To save {WORLD_NAME}, the ancestors forged a Seal, sacrificing their own memories to bind the creature... and the Breath of Dawn with it.",
+        "Now, the land is quiet. The fire is gone.",
+        "All that remains... are echoes.",
+        "Faint whispers of what was lost, clinging to stone and wind.",
+        "The Seal is weakening. The echoes are growing restless, calling for someone to remember what the world forgot.",
+        "You awaken to that call."
+    ]
+
+    for line in paragraphs:
+        typewriter_effect(line, delay=0.03)
+        pause(0.6)
+    draw_line()
+    print()
+    print("1 - Answer the call and begin your journey.")
+    print("2 - Stay in the village (decline).")
+    choice = safe_input("# ")
+    if choice.strip() != "1":
+        clear_screen()
+        typewriter_effect("You turn away. The echo fades... but not forever.")
+        safe_input("> Press Enter to change your mind.")
+        show_lore()  # Recursive call to retry choice
+    else:
+        typewriter_effect("The wind carries your name. Auren remembers.")
+        safe_input("\n> Press Enter to begin your quest.")
+
+
+## MODIFIED (v1.7): Added new event ##
+def handle_random_event(player):
+    # Handles random encounters/events on the map.
+    clear_screen()
+    draw_line()
+    title = f"An echo stirs across {WORLD_NAME}..."
+    typewriter_effect(title)
+    draw_line()
+    events = ["shrine_prayer", "fallen_knight", "crimson_flower", "merchant_spirit", "mirror_echo"]
+
+    # NEW (v1.7): Add event by region
+    current_tile = biome_at(player['x'], player['y'])
+    if current_tile == BIOME_RUINS:
+        events.append("ruined_king")
+
+    event = RUNTIME.rng.choice(events)
+
+    if event == "shrine_prayer":
+        typewriter_effect("You find a small, forgotten shrine, thick with moss.")
+        typewriter_effect("A quiet melody seems to hang in the air.")
+        print("1 - Kneel and listen")
+        print("2 - Leave it be")
+        choice = safe_input("# ")
+        if choice.strip() == "1":
+            typewriter_effect("You close your eyes. The song is of safety and stone.")
+            player['hp'] = min(player['hp_max'], player['hp'] + 10)  # Heal
+            print("(You healed 10 HP.)")
+            player = codex_add(player, "shrine_memory")  # Add echo
+    elif event == "fallen_knight":
+        typewriter_effect("Beneath a withered tree lies a fallen knight...")
+        typewriter_effect("Their armor is old, but their vow feels... new.")
+        print("1 - Search their belongings")
+        if player['pot'] > 0:
+            print("2 - Leave a healing potion (1)")
+        print("3 - Pay respects and leave")
+        choice = safe_input("# ")
+        if choice.strip() == "1":
+            typewriter_effect("You find 15 Gold, but feel a pang of... something.")
+            player['gold'] += 15
+            player = codex_add(player, "fallen_knight")
+        elif choice.strip() == "2" and player['pot'] > 0:
+            typewriter_effect("You leave the potion. The air feels lighter.")
+            player['pot'] -= 1
+            player = codex_add(player, "fallen_knight")  # Still add echo for interaction
+    elif event == "crimson_flower":
+        typewriter_effect("A single, impossibly crimson flower grows on a rock.")
+        print("1 - Pluck it")
+        print("2 - Touch it")
+        choice = safe_input("# ")
+        if choice.strip() == "1":
+            typewriter_effect("You pluck it. It turns to dust in your hand.")
+            player['hp'] = max(1, player['hp'] - 5)  # Take minor damage
+            print("(You lost 5 HP.)")
+        elif choice.strip() == "2":
+            typewriter_effect("You touch a petal. It feels like a fresh wound, but also a seed.")
+            player = codex_add(player, "crimson_flower")
+    elif event == "merchant_spirit":
+        typewriter_effect("A small, lantern-eyed spirit appears on the path.")
+        typewriter_effect("It holds out a single Elixir.")
+        print("1 - 'I'll take it.' (50 Gold)")
+        print("2 - 'No thank you.'")
+        choice = safe_input("# ")
+        if choice.strip() == "1" and player['gold'] >= 50:
+            typewriter_effect("It smiles without lips and vanishes.")
+            player['gold'] -= 50
+            player['elix'] += 1
+            player = codex_add(player, "merchant_spirit")
+        elif choice.strip() == "1" and player['gold'] < 50:
+            typewriter_effect("You can't afford it. It vanishes.")
+        else:  # Chose 2 or invalid
+            typewriter_effect("It vanishes.")
+    elif event == "mirror_echo":
+        typewriter_effect("You find a shard of a mirror.")
+        typewriter_effect("Your reflection is... different. Stronger.")
+        print("1 - Reach into the reflection")
+        print("2 - Shatter the shard")
+        choice = safe_input("# ")
+        if choice.strip() == "1":
+            typewriter_effect("Your hand meets... yourself. You feel a jolt of power.")
+            player['bonus_atk'] = player.get('bonus_atk', 0) + 1  # Increase permanent bonus ATK
+            player = recalculate_player_stats(player)  # Recalculate totals
+            print(f"(You gained +1 Bonus ATK! Total ATK is now {player['total_atk']}!)")
+            player = codex_add(player, "mirror_echo")
+        else:  # Chose 2 or invalid
+            typewriter_effect("You shatter the shard. The echo is gone.")
+
+    elif event == "ruined_king":
+        typewriter_effect("You find a tarnished, broken crown resting on a pile of rubble.")
+        typewriter_effect("As you touch it, you feel a wave of immense sadness and authority.")
+        print("1 - Take the memory")
+        print("2 - Leave it in peace")
+        choice = safe_input("# ")
+        if choice.strip() == "1":
+            typewriter_effect("You absorb the echo of the Fallen King.")
+            player = codex_add(player, "ruined_king_memory")
+        else:
+            typewriter_effect("You back away slowly, leaving the crown to its rest.")
+
+    safe_input("\n> Press Enter to continue...")
+    return "playing", player  # Always return to playing state, updated player
+
+
+# v1.8: REFACTORED to handle quest chains
+def check_quest_completion(player, quest_type, target):
+    # Checks if collecting an echo completes the current main quest objective.
+    main_q_id = player.get('main_quest_id', '')
+    main_q_data = MAIN_QUESTS.get(main_q_id, {})
+
+    if not main_q_data: return player
+
+    # Check if the quest type is COLLECT_ECHO, matches the target, and isn't already marked complete
+    is_main_quest_objective = (main_q_data.get('type') == quest_type and
+                               main_q_data.get('target_codex') == target and
+                               main_q_id not in player['quest_progress'])
+
+    if is_main_quest_objective:
+        print(f"\nMain Quest Completed: {main_q_data.get('title')}")
+        player['quest_progress'][main_q_id] = 1  # Mark as complete
+
+        # Grant rewards (if any)
+        reward_g = main_q_data.get('reward_gold', 0)
+        reward_x = main_q_data.get('reward_xp', 0)
+        if reward_g > 0 or reward_x > 0:
+            player['gold'] += reward_g
+            player['xp'] += reward_x
+            print(f"Reward: {reward_g} Gold, {reward_x} XP!")
+            player = handle_level_up(player)  # Check for level up
+
+        # --- v1.8: Quest Chain Logic ---
+        next_quest_id = None
+        if main_q_id == "MQ_04":
+            next_quest_id = "MQ_04_COMPLETE"
+        elif main_q_id == "MQ_05_HERO_A":
+            next_quest_id = "MQ_05_HERO_B"
+        elif main_q_id == "MQ_05_HERO_B":
+            next_quest_id = "MQ_05_HERO_C"
+            player['quest_progress']["MQ_05_HERO_C"] = 0  # Initialize kill quest
+
+        if next_quest_id:
+            player['main_quest_id'] = next_quest_id
+            print(f"Main Quest Updated! (Check Quest Log for details)")
+        # --- End v1.8 Logic ---
+
+        safe_input("> ")
+
+    # Check side quests (v1.8: Farmer Quest)
+    for q_id in player.get('active_side_quests', [])[:]:
+        quest = SIDE_QUEST_POOL.get(q_id, {})
+        if (quest.get('type') == quest_type and
+                quest.get('target_codex') == target and
+                player['quest_progress'].get(q_id, 0) == 0):  # Check if not already complete
+
+            player['quest_progress'][q_id] = 1  # Mark as complete
+            print(f"Side Quest: '{quest.get('title', 'Unknown')}' objective complete! Turn in.")
+            safe_input("> ")
+
+    return player
+
+
+## MODIFIED (v1.6.4): Added Echo Focus menu, safe_input ##
+def handle_town(player):
+    # Handles interactions within the Town Centre.
+    while True:
+        clear_screen()
+        draw_line()
+        print("TOWN CENTRE - Auren")
+        draw_line()
+        print("You step into the town square. People move with practiced care.")
+        draw_line()
+        print("1 - Rest at the Inn (Full HP) - 15 Gold")
+        print("2 - Visit the Quest Board")
+        print("3 - Visit the Echo Guild")
+        print("4 - Talk to the Locals")
+        print("5 - Leave Town")
+        draw_line()
+        print(f"HP: {player['hp']}/{player['hp_max']} | GOLD: {player['gold']}")
+        draw_line()
+        choice = safe_input("# ")
+
+        if choice.strip() == "1":  # Rest at Inn
+            if player['gold'] >= 15:
+                player['gold'] -= 15;
+                player['hp'] = player['hp_max']  # Full heal
+                # Clear negative status effects (dot, control)
+                get_status_effects(player).clear(keep_kind=FX_HOT)
+                typewriter_effect("You sleep in a creaking bed. The world feels gentle.")
+                print("(Negative status effects have been cleared.)")
+                safe_input("> ")
+            else:
+                typewriter_effect("You lack the coin for the inn.")
+                safe_input("> ")
+        elif choice.strip() == "2":  # Quest Board
+            player = handle_quest_board(player)
+            # handle_quest_board now returns player, loop continues
+        elif choice.strip() == "3":  # Echo Guild
+            clear_screen()
+            draw_line()
+            print("ECHO GUILD - Archivist Lira")
+            draw_line()
+            typewriter_effect("'The echoes you gather... they mend what memory forgot,' Lira says softly.")
+            draw_line()
+            print("1 - Browse Echo Codex (Read Only)")
+            print("2 - Ask Lira about the land (Quest)")
+            print("3 - Focus on a Memory (Change Echo)")  # Option to change equipped echo
+            print("4 - Return to Town Square")
+            sub = safe_input("# ")
+
+            if sub.strip() == "1":  # Read Codex
+                show_codex(player)
+                # show_codex returns None, loop continues
+
+
+            elif sub.strip() == "2":  # Talk to Lira (Quests)
+                main_q_id = player.get('main_quest_id')
+                main_q_data = MAIN_QUESTS.get(main_q_id, {})
+                # --- TUTORIAL (v1.7.1): Integrated Tutorial Logic ---
+                if main_q_id == "MQ_02" and main_q_data.get('target') == "LIRA":
+                    # --- TUTORIAL (PART 1: Give Echo) ---
+                    if "ECHO_GIFT_01" not in player.get('codex', []):
+                        typewriter_effect("'The Mayor sent you? Good. The echoes are restless.'")
+                        typewriter_effect("'But you are not yet strong enough to hear them fully.'")
+                        typewriter_effect("'To fight the echoes, you must use their own memories.'")
+                        typewriter_effect(
+                            "'Take this. It is 'The First Echo' that answered your call.'")
+                        player = codex_add(player, "ECHO_GIFT_01")
+                        print("\n(Lira gives you your first Echo!)")
+
+                    # --- TUTORIAL (PART 2: Check Focus & Start Battle) ---
+                    if player['equipped_echo'] == "ECHO_GIFT_01":
+                        typewriter_effect(
+                            "'Excellent. You feel the memory's power, yes? A faint boost to your strength?'")
+                        typewriter_effect("'Now, you must prove your strength. A true test.'")
+                        player['main_quest_id'] = "MQ_03"  # Advance quest
+                        player['quest_progress']['MQ_03'] = 0  # Initialize progress
+                        print("\n(Main Quest Updated!)")
+                        safe_input("> ")
+                        print("\n(Lira leads you to the training yard...)")
+                        safe_input("> ")
+                        # Trigger the tutorial battle
+                        player = handle_tutorial_battle(player)
+                        # After battle, Lira gives final words
+                        clear_screen()
+                        draw_line()
+                        print("ECHO GUILD - Archivist Lira")
+                        draw_line()
+                        typewriter_effect("'Well done,' Lira says, nodding.")
+                        typewriter_effect("'You have learned the basics. Now, go. Fulfill the quest.'")
+                        typewriter_effect("'The Goblins are in the hills. Good luck.'")
+                    else:  # Player hasn't focused the echo yet
+                        typewriter_effect("'You have the memory, but you must *focus* it.'")
+                        typewriter_effect("'Select option 3, 'Focus on a Memory', and choose the 'The First Echo'.'")
+                        typewriter_effect("'Return to me once you have focused it.'")
+                # --- END TUTORIAL LOGIC ---
+                elif main_q_id == "MQ_03":
+                    typewriter_effect("'You must prove your strength. The Goblins in the hills...'")
+                elif main_q_id == "MQ_04":
+                    typewriter_effect("'Find the Knight's Echo in the forest. It calls to you.'")
+                # --- v1.8: Hero Path Quest Dialogue ---
+                elif main_q_id == "MQ_05_HERO_A":
+                    typewriter_effect(
+                        "'You chose wisely. To master the seal, you must first master patience. Find the Shrine of Moss.'")
+                elif main_q_id == "MQ_05_HERO_B":
+                    typewriter_effect(
+                        "'Good. Now, you must understand *why* the seal was made. Find the Cultist's Diary at the cave entrance.'")
+                elif main_q_id == "MQ_05_HERO_C":
+                    typewriter_effect(
+                        "'You are ready. I have summoned a Sentinel in the hills. Prove your strength and wisdom.'")
+                # --- End v1.8 ---
+                else:  # Generic dialogue
+                    typewriter_effect("Lira speaks: 'Collect enough, and Auren will remember.'")
+                safe_input("> ")
+            elif sub.strip() == "3":  # Focus Echo
+                player = handle_echo_focus_menu(player)
+                # handle_echo_focus_menu returns updated player, loop continues
+
+            elif sub.strip() == "4":  # Return
+                continue  # Go back to outer loop (Town Centre menu)
+            # Implicit else: Invalid input, loop continues in Echo Guild menu
+
+        elif choice.strip() == "4":  # Talk to Locals
+            # v1.8: Dialogue changes based on world state
+            lines = []
+            if player['main_quest_id'] == "MQ_05_RECKLESS":
+                lines = [
+                    "'The sky... it feels wrong! What did you do at the cave?'",
+                    "'Monsters are everywhere! The guards are overwhelmed! This is a nightmare...'",
+                    "'The Mayor locked himself in his office. He looks terrified...'"
+                ]
+            elif player['main_quest_id'].startswith("MQ_05_HERO"):
+                lines = [
+                    "'We are all counting on you. Lira says you are taking the wise path.'",
+                    "'The air feels tense, but stable. Thank you for your caution, traveler.'",
+                ]
+            else:
+                lines = [
+                    "An old woman whispers about a path behind the inn that glows at dusk.",
+                    "Children play near the fountain, singing words that sound like an old hymn.",
+                    "A blacksmith hums a tune that used to call warriors home."
+                ]
+
+            line = RUNTIME.rng.choice(lines)
+            typewriter_effect(line)
+            # Chance to gain the Town Rumor echo
+            if RUNTIME.rng.random() < 0.30 and not player['main_quest_id'] == "MQ_05_RECKLESS":
+                player = codex_add(player, "town_rumor")
+            safe_input("> ")
+        elif choice.strip() == "5":  # Leave Town
+            return "playing", player, None  # Return state, player, and None (no enemy)
+        # Implicit else: Invalid input, loop continues in Town Centre menu
+
+
+## NEW (v1.6.4): Menu to change focused Echo, uses safe_input ##
+def handle_echo_focus_menu(player):
+    # Handles the menu for selecting the single focused Echo.
+    while True:
+        clear_screen()
+        draw_line()
+        print("FOCUS ON A MEMORY")
+        draw_line()
+        typewriter_effect("'Which memory... which part of Auren... do you wish to become?'", delay=0.02)
+        draw_line()
+
+        # Display currently focused echo
+        print("--- CURRENTLY FOCUSED ---")
+        current_echo_id = player.get('equipped_echo')
+        if not current_echo_id:
+            print("None. (Your mind is clear)")
+        else:
+            echo_name = CODEX_ENTRIES.get(current_echo_id, {}).get('title', 'Unknown')
+            print(f"- {echo_name}")
+        draw_line()
+
+        # Display list of collected echoes to choose from
+        print("--- CHOOSE A MEMORY TO FOCUS ON ---")
+        collected_echoes = sorted(player.get('codex', []))  # Sort for consistent list order
+        if not collected_echoes:
+            print("You have not collected any memories to focus on.")
+        else:
+            for i, eid in enumerate(collected_echoes, 1):
+                entry = CODEX_ENTRIES.get(eid, {})
+                # Show buff summary for easier selection
+                buff_text = ""
+                if entry.get('buff'):
+                    buff_text = f" (Buff: {entry['buff']})"
+                # Add check for other effect types if needed in future
+                print(f"[{i}] {entry.get('title', 'Unknown')}{buff_text}")
+
+        draw_line()
+        print("Enter number to Focus, '99' to Unfocus, or '0' to return.")
+        choice = safe_input("# ")
+
+        if choice == '0':
+            return player  # Return updated player to caller (handle_town)
+
+        elif choice == '99':  # Unfocus current echo
+            if player['equipped_echo'] is None:
+                print("You are already unfocused.")
+            else:
+                player['equipped_echo'] = None
+                print("Memory unfocused. Your mind is clear.")
+                player = recalculate_player_stats(player)  # Recalculate stats
+            safe_input("> ")
+
+        elif choice.strip().isdigit():  # Focus a new echo
+            idx = int(choice.strip()) - 1
+            if 0 <= idx < len(collected_echoes):
+                eid_to_focus = collected_echoes[idx]
+
+                if eid_to_focus == player['equipped_echo']:
+                    print(f"You are already focusing on '{CODEX_ENTRIES[eid_to_focus]['title']}'.")
+                else:
+                    player['equipped_echo'] = eid_to_focus
+                    print(f"You focus your mind on '{CODEX_ENTRIES[eid_to_focus]['title']}'.")
+                    player = recalculate_player_stats(player)  # Recalculate stats
+                safe_input("> ")
+            else:
+                print("Invalid number.")
+                safe_input("> ")
+        else:
+            print("Invalid input.")
+            safe_input("> ")
+        # Loop continues to refresh the menu
+
+
+def handle_quest_board(player):
+    # Handles interactions with the Quest Board in town.
+    while True:
+        clear_screen()
+        draw_line()
+        print("QUEST BOARD")
+        draw_line()
+        player_level = player['level']
+
+        # Check for completed quests
+        completed_quests = []
+        active_quests = player.get('active_side_quests', [])
+
+        if active_quests:
+            print("--- Active Bounties ---")
+            for q_id in active_quests:
+                quest = SIDE_QUEST_POOL.get(q_id)
+                if not quest: continue
+                progress = player['quest_progress'].get(q_id, 0)
+
+                # Handle different quest types
+                if quest.get('type') == 'KILL':
+                    needed = quest.get('needed', 0)
+                    print(f"> {quest.get('title', 'Unknown Quest')} ({progress}/{needed})")
+                    if progress >= needed:
+                        completed_quests.append(q_id)
+                elif quest.get('type') == 'COLLECT_ECHO':  # v1.8: Handle Farmer Quest
+                    needed = 1
+                    print(f"> {quest.get('title', 'Unknown Quest')} ({progress}/{needed})")
+                    if progress >= needed:
+                        completed_quests.append(q_id)
+        else:
+            print("You have no active side quests.")
+
+        draw_line()
+        # Turn in completed quests
+        if completed_quests:
+            print("You have completed bounties to turn in!")
+            for q_id in completed_quests:
+                quest = SIDE_QUEST_POOL[q_id]
+                typewriter_effect(f"Turning in: {quest.get('title', 'Unknown Quest')}...")
+                reward_g = quest.get('reward_gold', 0)
+                reward_x = quest.get('reward_xp', 0)
+                player['gold'] += reward_g
+                player['xp'] += reward_x
+                print(f"Reward: {reward_g} Gold, {reward_x} XP!")
+
+                player['active_side_quests'].remove(q_id)  # Remove from active list
+                if q_id not in player.get('completed_side_quests', []):  # v1.8: Add to history
+                    player.setdefault('completed_side_quests', []).append(q_id)
+                if q_id in player['quest_progress']:
+                    del player['quest_progress'][q_id]  # Clean up progress entry
+
+            player = handle_level_up(player)  # Check level up after XP gain
+            safe_input("\n> Press Enter to continue...")
+            continue  # Refresh the board
+
+        # Generate and display available quests
+        print("--- Available Bounties ---")
+        available_pool = []
+        # v1.8: REFACTORED to filter quests
+        for q_id, quest in SIDE_QUEST_POOL.items():
+            if q_id in active_quests: continue  # Skip already active quests
+
+            # --- v1.8: Quest Filtering Logic ---
+            # 1. Skip non-board quests
+            if quest.get("is_board_quest", True) == False:
+                continue
+
+            # 2. Check Exclusive Path
+            quest_path = quest.get("exclusive_path")
+            main_q = player['main_quest_id']
+
+            if quest_path == "RECKLESS" and main_q != "MQ_05_RECKLESS":
+                continue  # Skip if not on Reckless Path
+            if quest_path == "HERO" and not main_q.startswith("MQ_05_HERO"):
+                continue  # Skip if not on Hero Path
+            # --- End v1.8 Logic ---
+
+            quest_min_level = quest.get('min_level', 1)
+            # Show quests appropriate for player level (within a range)
+            if (player_level >= quest_min_level) and (player_level <= quest_min_level + 5):
+                available_pool.append(q_id)
+
+        # Handle cases where no quests are available or player has max quests
+        if not available_pool or len(active_quests) >= 3:
+            if len(active_quests) >= 3:
+                print("Your hands are full. (Max 3 bounties)")
+            else:
+                print("No new bounties appropriate for your level right now.")
+            print("\n0 - Back to Town")
+            choice = safe_input("# ")
+            if choice == "0": return player  # Return player to caller (handle_town)
+            # Otherwise loop continues
+        else:
+            # Display available quests (up to 2)
+            choices = RUNTIME.rng.sample(available_pool, k=min(len(available_pool), 2))
+            for i, q_id in enumerate(choices, 1):
+                quest = SIDE_QUEST_POOL[q_id]
+                print(f"{i} - Accept: {quest.get('title', 'Unknown Quest')} (Lv. {quest.get('min_level', 1)})")
+                print(f"    Reward: {quest.get('reward_gold', 0)} Gold, {quest.get('reward_xp', 0)} XP")
+            print("0 - Back to Town")
+
+            choice = safe_input("# ")
+            if choice == "0": return player  # Return player to caller (handle_town)
+            if choice.strip().isdigit() and 0 < int(choice) <= len(choices):
+                q_id_to_accept = choices[int(choice) - 1]
+                player['active_side_quests'].append(q_id_to_accept)
+                player['quest_progress'][q_id_to_accept] = 0  # Initialize progress
+                print(f"Accepted bounty: {SIDE_QUEST_POOL[q_id_to_accept]['title']}")
+                safe_input("> ")
+                continue  # Refresh the board after accepting
+            # Invalid input, loop continues
+        # Fallback return in case of unexpected flow
+        return player
+
+
+def handle_quest_log(player):
+    # Displays the current main and side quests.
+    clear_screen()
+    draw_line()
+    print("QUEST LOG")
+    draw_line()
+
+    # Display Main Quest
+    print("--- Main Quest ---")
+    main_q_id = player.get('main_quest_id', 'MQ_01')
+    main_q_data = MAIN_QUESTS.get(main_q_id, {})
+    if main_q_data:
+        print(f"[{main_q_data.get('title', 'Unknown Quest')}]")
+        print(f"> {main_q_data.get('desc', '...')}")
+
+        q_type = main_q_data.get('type')
+        if q_type == 'KILL':
+            progress = player['quest_progress'].get(main_q_id, 0)
+            needed = main_q_data.get('needed', 0)
+            print(f"  Progress: ({progress}/{needed})")
+        elif q_type == 'STAT_CHECK':
+            print(f"  Level: {player['level']}/{main_q_data.get('target_level', 0)}")
+            print(f"  ATK:   {player['total_atk']}/{main_q_data.get('target_atk', 0)}")
+        elif q_type == 'COLLECT_ECHO':  # v1.8: Added
+            progress = 1 if main_q_id in player['quest_progress'] else 0
+            print(f"  Progress: ({progress}/1)")
+    else:
+        print("No active main quest.")
+
+    draw_line()
+
+    # Display Side Quests
+    print("--- Side Quests (Bounties) ---")
+    active_side_quests = player.get('active_side_quests', [])
+    if not active_side_quests:
+        print("No active side quests.")
+        print("(Visit the Quest Board in Town or explore the world)")
+    else:
+        for q_id in active_side_quests:
+            quest = SIDE_QUEST_POOL.get(q_id, {})
+            progress = player['quest_progress'].get(q_id, 0)
+
+            if quest.get('type') == 'KILL':
+                needed = quest.get('needed', 0)
+                print(f"> {quest.get('title', 'Unknown')} ({progress}/{needed})")
+            elif quest.get('type') == 'COLLECT_ECHO':
+                needed = 1
+                print(f"> {quest.get('title', 'Unknown')} ({progress}/{needed})")
+            else:
+                print(f"> {quest.get('title', 'Unknown')} (In Progress)")
+
+    draw_line()
+    safe_input("> Press Enter to return...")
+    return  # Return None, caller handles state
+
+
+def handle_map_legend():
+    # Displays the map legend.
+    clear_screen()
+    draw_line()
+    print("MAP LEGEND")
+    draw_line()
+    print(f" {BIOME_ICONS.get('PLAYER', '@')} : You (Your Location)")
+    print(f" {BIOME_ICONS.get('FOG', ' ')} : Fog (Unexplored)")
+    print("\n--- Locations ---")
+    print(f" {BIOME_ICONS.get('town', 'H')} : Town Centre / Mayor's Office")
+    print(f" {BIOME_ICONS.get('shop', '$')} : Shop")
+    print(f" {BIOME_ICONS.get('cave', '∩')} : Dragon's Cave")
+    print("\n--- Terrain ---")
+    print(f" {BIOME_ICONS.get('plains', '.')} : Plains")
+    print(f" {BIOME_ICONS.get('fields', '~')} : Fields")
+    print(f" {BIOME_ICONS.get('forest', 'T')} : Forest")
+    print(f" {BIOME_ICONS.get('hills', 'n')} : Hills")
+    print(f" {BIOME_ICONS.get('mountain', '▲')} : Mountain")
+    print(f" {BIOME_ICONS.get('bridge', '=')} : Bridge")
+    print(f" {BIOME_ICONS.get('swamp', 's')} : Murky Swamp")
+    print(f" {BIOME_ICONS.get('ruins', 'R')} : Haunted Ruins")
+    draw_line()
+    safe_input("> Press Enter to return...")
+    return  # Return None, caller handles state
+
+
+def handle_help_menu():
+    # Displays the How to Play / Help screen.
+    clear_screen()
+    draw_line()
+    print("HOW TO PLAY / HELP")
+    draw_line()
+    print("\n--- 1. COMBAT BASICS ---")
+    print("  ATK: Your Attack stat. Increases damage dealt.")
+    print("  DEF: Your Defense stat. Reduces damage taken from regular attacks.")
+    print("  GUARD (Skill): Reduces all damage taken for 1 turn by 50%.")
+    print("  SKILL II: Upgraded skills (e.g., Focus Strike II) automatically replace")
+    print("              the basic version when you reach the required level.")
+
+    print("\n--- 2. STATUS EFFECTS (v1.8) ---")
+    print("  POISON: Take damage every turn. Cured by Potion or Elixir.")
+    print("  BURN  : Take damage every turn. Cured by Purify skill or Elixir.")
+    print("  BLEED : Take damage every turn. Cured by Potion or Elixir.")
+    print("  STUN  : Lose your next turn.")
+    print("  SLEEP : Lose your next turn. Wakes up when hit.")
+    print("  REGEN : Heal HP every turn.")
+    print("  HARDENED: (Enemy) Reduces damage from the next hit by 50%.")
+    print("  MANA DRAIN: (Player) Puts a random skill on cooldown.")
+
+    print("\n--- 3. ECHOES & CODEX ---")
+    print("  The Codex stores all 'Echoes' (memories) you find.")
+    print("  Visit Lira at the Echo Guild to 'Focus on a Memory'.")
+    print("  You can only Focus ONE Echo at a time.")
+    print("  The Focused Echo provides powerful passive buffs (stats, effects).")
+
+    print("\n--- 4. EXPLORATION ---")
+    print("  Some locations on the map hide secrets. If you see an option like")
+    print("  '7 - Examine...' try it to find new quests, echoes, or lore.")
+
+    draw_line()
+    safe_input("> Press Enter to return...")
+    return
+
+
+# --- v1.9: Headless combat rules ---
+# The resolve_* functions below hold the actual combat math. They never touch
+# the terminal: messages are appended to an optional `log` list as
+# (text, pause_seconds) pairs and all dice come from `rng`. The classic
+# process_status_effects / apply_hit_effects / handle_enemy_turn functions
+# are thin wrappers that play the log back on screen.
+
+def log_event(log, text, pause=0.0):
+    # Appends a message (and the pause that should follow it) to a battle log.
+    if log is not None:
+        log.append((text, pause))
+
+
+def render_battle_log(log):
+    # Prints a battle log built by the resolve_* functions, then empties it.
+    for text, delay in log:
+        if text is not None:
+            print(text)
+        if delay:
+            pause(delay)
+    del log[:]
+
+
+## MODIFIED (v1.6.4): Improved HP clamping for mobs ##
+## MODIFIED (v1.8): Added BURN resistance logic ##
+## MODIFIED (v1.9): Rules moved to resolve_status_effects ##
+def process_status_effects(target, target_name):
+    # Processes status effects (DOTs, HOTs, Control) for player or enemy.
+    # Returns the updated target and a boolean indicating if stunned.
+    log = []
+    is_stunned = resolve_status_effects(target, target_name, log)
+    render_battle_log(log)
+    return target, is_stunned
+
+
+def resolve_status_effects(target, target_name, log=None):
+    # I/O-free status effect tick. Returns True if the target is stunned/asleep.
+    effects = get_status_effects(target)
+    stunned_by = None  # First Stun/Sleep still active after this tick
+
+    # One pass in the order the effects were applied
+    for fx in effects:
+        effect_kind = EFFECT_KIND[fx]
+
+        if effect_kind == FX_DOT:  # Damage Over Time
+            dmg = effects.magnitude[fx]
+
+            # v1.8: Burn resistance (v1.9: from the compiled loadout profile)
+            if fx == FX_BURN and target_name == "You":
+                dmg = resist_burn(player_combat_profile(target), dmg, "burn", log)
+
+            target.hp -= dmg
+            log_event(log, f"{target_name} {EFFECT_MSG_TICK[fx] or 'takes damage.'}")
+
+        elif effect_kind == FX_HOT:  # Heal Over Time
+            heal = effects.magnitude[fx]
+            max_hp = target.hp_max
+            target.hp = min(max_hp, target.hp + heal)
+            log_event(log, f"{target_name} {EFFECT_MSG_TICK[fx] or 'heals.'}")
+
+        elif fx == FX_MANA_DRAIN and target_name == "You":
+            log_event(log, f"Your energy is drained!")
+
+        # Decrement turn counter; the effect ends when it runs out
+        effects.turns[fx] -= 1
+        if effects.turns[fx] <= 0:
+            effects.turns[fx] = 0
+            log_event(log, f"{target_name} is no longer {EFFECT_TITLE[fx] or 'affected'}.")
+        elif stunned_by is None and (fx == FX_STUN or fx == FX_SLEEP) and effect_kind == FX_CONTROL:  # v1.8: Sleep
+            stunned_by = fx
+
+    # Report Stun/Sleep *after* processing other effects
+    if stunned_by is not None:
+        log_event(log, f"{target_name} {EFFECT_MSG_TICK[stunned_by] or 'cannot move!'}")
+    return stunned_by is not None
+
+
+## MODIFIED (v1.6.4): Prevents duplicate effect stacking ##
+## MODIFIED (v1.8): Added SLEEP echo logic ##
+## MODIFIED (v1.9): Rules moved to resolve_hit_effects ##
+def apply_hit_effects(attacker, defender, attacker_name, defender_name):
+    # Applies status effects from attacker (player or enemy) to defender.
+    log = []
+    resolve_hit_effects(attacker, defender, attacker_name, defender_name, log)
+    render_battle_log(log)
+    return defender
+
+
+def resolve_hit_effects(attacker, defender, attacker_name, defender_name, log=None, rng=None):
+    # I/O-free on-hit effect application. Mutates and returns the defender.
+    rng = rng or RUNTIME.rng
+
+    # Potential effects from Player (Weapon, Charm, Echo)
+    if attacker_name == "You":
+        effects_to_try = player_combat_profile(attacker).on_hit
+
+    # Gather potential effects from Enemy
+    else:
+        mob = attacker.get('mob_id')
+        effects_to_try = MOB_ON_HIT[mob] if mob is not None else compile_on_hit(attacker.get('effects', []))
+
+    defender_effects = get_status_effects(defender)
+
+    for fx, chance, turns in effects_to_try:
+        if rng.random() < chance:
+            if fx == FX_MANA_DRAIN and defender_name == "You":
+                log_event(log, f"The {attacker_name}'s attack drains your energy!")
+                skills_to_drain = [s for s in defender.get('skills_cd', {}).keys() if
+                                   s not in ["Focus Strike", "Guard"]]
+                if not skills_to_drain: skills_to_drain = ["Meditate", "Limit Break"]
+                skill_drained = rng.choice(skills_to_drain)
+                set_skill_cd(defender, skill_drained, turns)
+                log_event(log, f"Your {skill_drained} skill is now on cooldown!")
+                continue
+
+            if defender_effects.add(fx, turns):  # Already affected: only refreshes the duration
+                log_event(log, f"{defender_name} {EFFECT_MSG_INFLICT[fx]}")
+
+    return defender
+
+
+## MODIFIED (v1.7): Added new mob skills ##
+## MODIFIED (v1.8): Added Auren_Sentinel logic ##
+## MODIFIED (v1.9): Rules moved to resolve_enemy_turn, mob skills to MOBS data ##
+def handle_enemy_turn(enemy, player, player_def):
+    # Handles the enemy's turn in combat.
+    log = []
+    resolve_enemy_turn(enemy, player, player_def, log)
+    render_battle_log(log)
+    return enemy, player
+
+
+def enemy_ability_ready(enemy, ability, rng):
+    # Checks an ability's conditions: blocking flag, HP threshold, then the %
+    # roll. With roll_first the roll is drawn before the other checks.
+    if ability['roll_first'] and ability['chance'] is not None and rng.randint(1, 100) > ability['chance']:
+        return False
+    if ability['unless'] and enemy.get(ability['unless']):
+        return False
+    if ability['hp_at_most'] is not None and enemy['hp'] > ability['hp_at_most']:
+        return False
+    if ability['hp_pct_at_most'] is not None and enemy['hp'] > enemy['hp_max'] * ability['hp_pct_at_most']:
+        return False
+    return ability['roll_first'] or ability['chance'] is None or rng.randint(1, 100) <= ability['chance']
+
+
+def use_enemy_ability(enemy, player, player_def, ability, log=None, rng=None):
+    # Resolves one compiled mob ability. Mutates enemy and player in place.
+    rng = rng or RUNTIME.rng
+    damage = heal = 0
+    follow_up = []  # Logged after the ability's own message
+
+    if ability['drain_skill']:
+        skills_to_drain = [s for s in player.get('skills_cd', {}).keys() if s not in ["Focus Strike", "Guard"]]
+        if not skills_to_drain: skills_to_drain = ["Meditate", "Limit Break"]
+        skill_drained = rng.choice(skills_to_drain)
+        set_skill_cd(player, skill_drained, ability['drain_skill'])
+        follow_up.append((f"Your {skill_drained} skill is now on cooldown!", 0.0))
+
+    if ability['damage'] is not None:
+        for _ in range(ability['hits']):
+            damage = max(1, int(enemy.atk * ability['damage']) - player_def)
+            if player.guard: damage = int(damage * 0.5)
+            player.hp -= damage
+            if ability['hit_msg']:
+                follow_up.append((ability['hit_msg'].format(damage=damage), 0.6))
+            if player.hp <= 0: break
+
+    if ability['fire_damage']:
+        dmg_base = ability['fire_damage']
+        if player.guard: dmg_base = int(dmg_base * 0.5)
+        damage = max(1, dmg_base - player_def)
+
+        # v1.8: Burn resistance applies to fire attacks too
+        damage = resist_burn(player_combat_profile(player), damage, "fire", log)
+        player.hp -= damage
+
+    heal = int(damage * ability['siphon']) if ability['siphon'] else ability['heal']
+    if heal:
+        enemy.hp = min(enemy.hp_max, enemy.hp + heal)
+    enemy.atk += ability['atk_bonus']
+    if ability['sets']:
+        enemy[ability['sets']] = True
+
+    for line in ability['msg']:
+        log_event(log, line.format(name=enemy.name, damage=damage, heal=heal))
+    for text, delay in follow_up:
+        log_event(log, text, delay)
+
+
+def resolve_enemy_turn(enemy, player, player_def, log=None, rng=None):
+    # I/O-free enemy turn. Mutates enemy and player in place.
+    rng = rng or RUNTIME.rng
+    enemy_name = enemy.name
+    mob = enemy.get('mob_id', MOB_IDS.get(enemy_name))
+
+    # Process enemy's status effects (poison, stun etc.)
+    is_stunned = resolve_status_effects(enemy, enemy_name, log)
+    if enemy.hp <= 0:
+        return
+    if is_stunned:
+        log_event(log, None, 1.2)
+        return
+
+    if enemy.is_exhausted:
+        log_event(log, f"The {enemy_name} is exhausted and does nothing!", 1.2)
+        enemy.is_exhausted = False
+        return
+
+    # Special abilities (data-driven since v1.9, see MOBS)
+    used_special = False
+    for ability in MOB_ABILITIES[mob] if mob is not None else ():
+        if enemy_ability_ready(enemy, ability, rng):
+            use_enemy_ability(enemy, player, player_def, ability, log, rng)
+            used_special = True
+            break
+
+    # Regular Attack
+    if not used_special:
+        profile = player_combat_profile(player)
+        if profile.evade and rng.random() < profile.evade:
+            log_event(log, f"You evaded the {enemy_name}'s attack thanks to your {profile.evade_item}!")
+        else:
+            damage_dealt = max(1, enemy.atk - player_def)
+            if player.guard:
+                damage_dealt = int(damage_dealt * 0.5)
+            player.hp -= damage_dealt
+            log_event(log, f"The {enemy_name} dealt {damage_dealt} damage to {player.name}.")
+
+            # v1.8: Wake up on hit
+            if get_status_effects(player).remove(FX_SLEEP):
+                log_event(log, "You were woken up by the attack!")
+
+    # Apply on-hit effects
+    resolve_hit_effects(enemy, player, enemy_name, "You", log, rng)
+
+    player.guard = False
+    log_event(log, None, 1.2)
+    player.hp = max(0, player.hp)
+    enemy.hp = max(0, enemy.hp)
+
+
+def game_over(player):
+    # Handles the game over sequence. Returns updated player if respawning, None otherwise.
+    print("\n────────────────────────────")
+    pause(1)
+    print(" You fall to your knees...")
+    pause(1.5)
+    print(" The light fades from your eyes.")
+    pause(1.5)
+    print("\n Auren watches in silence.")
+    pause(2)
+
+    codex_entries = len(player.get("codex", []))
+    if codex_entries == 0:
+        print("\n > 'The world barely remembers you.'")
+    elif codex_entries < 3:
+        print("\n > 'The world still remembers what you couldn’t finish.'")
+    else:
+        print("\n > 'Even in silence, your story will be remembered.'")
+
+    print("\n────────────────────────────")
+    pause(2)
+    print(" GAME OVER")
+    print("────────────────────────────\n")
+    pause(2)
+
+    if player.get("respawned", False):
+        print(" The echoes fall silent. No light answers you this time.\n")
+        pause(2)
+        print(" Your name fades forever into Auren.\n")
+        pause(2)
+        return None
+
+    while True:
+        choice = safe_input("Do you wish to let the world forget you? (y/n): ").strip().lower()
+        if choice == "y":
+            print("\n The echo fades... completely.")
+            pause(2)
+            return None
+        elif choice == "n":
+            print("\n A faint light remains...")
+            pause(2)
+            player["hp"] = max(20, player["hp_max"] // 2)
+            player["gold"] = player["gold"] // 2
+            player["x"], player["y"] = 2, 3
+            player["respawned"] = True
+            player["active_effects"] = StatusEffects()
+            print(" HP and Gold reduced by half.")
+            print(" Returned to Town Centre.")
+            print(" The world will not remember you again.\n")
+            pause(2)
+            return player
+        else:
+            print(" Please choose y or n.")
+
+
+## NEW (v1.7.1): Scripted tutorial battle function ##
+def handle_tutorial_battle(player):
+    """
+    A scripted, step-by-step tutorial battle guided by Lira.
+    """
+    enemy = EnemyInstance("Tutorial_Dummy", name="Training Dummy")
+
+    player['pot'] = max(1, player['pot'])
+
+    temp_level_up = False
+    if not skill_available(player, "Focus Strike"):
+        player['level'] = 3
+        temp_level_up = True
+        print("(Lira temporarily grants you the memory of 'Focus Strike'!)")
+        pause(1.2)
+
+    player = recalculate_player_stats(player)
+    battle_atk, battle_def = player['total_atk'], player['total_def']
+    player['hp'] = player['hp_max']
+
+    tutorial_step = 1
+    is_stunned = False
+
+    while True:
+        clear_screen();
+        draw_line()
+        print(f"TRAINING YARD - Defeat the {enemy['name']}");
+        draw_line()
+        print(f"{enemy['name']}'s HP: {enemy['hp']}/{enemy['hp_max']}")
+        print(f"{player['name']}'s HP: {player['hp']}/{player['hp_max']}");
+        draw_line()
+
+        if tutorial_step == 1:
+            typewriter_effect("Lira: 'This is a Training Dummy. First, let's practice a basic ATTACK.'", 0.02)
+        elif tutorial_step == 2:
+            typewriter_effect("Lira: 'Good. Now, let's try a SKILL. Skills are powerful but have cooldowns.'", 0.02)
+        elif tutorial_step == 3:
+            typewriter_effect("Lira: 'Well done. The dummy will hit back, but it's weak.'", 0.02)
+            typewriter_effect("Lira: 'If you get low on HP, use a POTION. Try it now.'", 0.02)
+        elif tutorial_step == 4:
+            typewriter_effect("Lira: 'Excellent. You have learned the basics. Now, defeat the dummy.'", 0.02)
+
+        draw_line()
+
+        choice = ""
+        if not is_stunned:
+            if tutorial_step == 1:
+                print("1 - ATTACK")
+            elif tutorial_step == 2:
+                print("S - USE SKILL (Focus Strike)")
+            elif tutorial_step == 3:
+                print(f"2 - USE POTION ({player['pot']} left)")
+            elif tutorial_step >= 4:
+                if skill_available(player, "Focus Strike"): print("S - USE SKILL")
+                print("1 - ATTACK")
+                if player['pot'] > 0: print(f"2 - USE POTION ({player['pot']} left)")
+
+            draw_line();
+            choice = safe_input("# ")
+
+        action_taken = False
+        if not is_stunned:
+            if choice == "1" and tutorial_step in [1, 4]:  # Attack
+                damage = battle_atk
+                enemy['hp'] -= damage
+                print(f"You dealt {damage} damage.")
+                action_taken = True
+                if tutorial_step == 1: tutorial_step = 2
+
+            elif choice.upper() == "S" and tutorial_step in [2, 4]:  # Skill
+                if skill_available(player, "Focus Strike"):
+                    if skill_on_cooldown(player, "Focus Strike"):
+                        print("Lira: 'That skill is on cooldown. Wait for it to recover.'")
+                        pause(1)
+                    else:
+                        damage = int(battle_atk * SKILL_TABLE["Focus Strike"]['mult'])
+                        enemy['hp'] -= damage
+                        set_skill_cd(player, "Focus Strike", SKILL_TABLE["Focus Strike"]['cd'])
+                        print(f"You used Focus Strike for {damage} damage!")
+                        action_taken = True
+                        if tutorial_step == 2: tutorial_step = 3
+                else:
+                    print("Lira: 'You don't have that skill ready.'")
+                    pause(1)
+
+            elif choice == "2" and player['pot'] > 0 and tutorial_step in [3, 4]:  # Use Potion
+                player['pot'] -= 1;
+                player['hp'] = min(player['hp_max'], player['hp'] + 25)
+                print("HP refilled.")
+                action_taken = True
+                if tutorial_step == 3: tutorial_step = 4
+
+            elif not choice:
+                pass
+            else:
+                print("Lira: 'That's not the right action right now. Follow the instructions.'");
+                pause(1.2);
+                continue
+
+        if not action_taken and not is_stunned:
+            continue
+
+        pause(1)
+
+        if enemy['hp'] <= 0:
+            print(f"You defeated the {enemy['name']}!")
+            safe_input("> ")
+            if temp_level_up:
+                player['level'] = 1
+                player = recalculate_player_stats(player)
+            return player
+
+        if tutorial_step > 2:
+            damage_dealt = max(0, enemy['atk'] - battle_def)
+            player['hp'] -= damage_dealt
+            print(f"The {enemy['name']} hits you for {damage_dealt} damage.")
+            pause(1.2)
+
+        if player['hp'] <= 0:
+            print("Lira: 'Don't worry, this is just training.'")
+            player['hp'] = player['hp_max']
+            print("(You are fully healed.)")
+            pause(1)
+
+        decrement_skill_cooldowns(player)
+
+
+## NEW (v1.9): Enemy instances ##
+class EnemyInstance:
+    # One mob in one fight. Only the fields a fight changes live here; all
+    # other data (gold, xp, loot_table, effects, ...) is read straight from
+    # the shared MOBS template, which is never copied or modified. It reads
+    # like the old per-fight dict (enemy['hp'], enemy.get('loot_table')), and
+    # reset() starts a new fight in place so simulators don't allocate per fight.
+    __slots__ = ("template", "name", "mob_id", "hp", "hp_max", "atk",
+                 "is_hardened", "is_exhausted", "has_raged", "active_effects")
+    FIELDS = frozenset(__slots__) - {"template"}
+
+    def __init__(self, enemy_name, name=None):
+        self.active_effects = StatusEffects()
+        self.reset(enemy_name, name)
+
+    def reset(self, enemy_name=None, name=None):
+        # Restores full HP, base ATK and no flags or effects (optionally as another mob).
+        if enemy_name is not None:
+            self.template = MOBS[enemy_name]
+            self.mob_id = MOB_IDS[enemy_name]
+            self.name = name or enemy_name
+        self.hp = self.hp_max = self.template['hp']
+        self.atk = self.template['atk']
+        self.is_hardened = self.is_exhausted = self.has_raged = False
+        self.active_effects.clear()
+        return self
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return self.template[key]
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(f"{key!r} is part of the {self.name} template")
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS or key in self.template
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return self.template.get(key, default)
+
+
+## NEW (v1.9): Headless battle engine ##
+# A battle is a plain dict holding the player, the enemy instance and the
+# per-fight numbers (battle ATK/DEF after potion buffs, turn counter).
+# handle_battle renders it for the terminal; simulate_battle resolves it
+# with an action policy and no I/O at all.
+
+def begin_battle(player, enemy_name, log=None, enemy=None):
+    # Builds the battle state and applies start-of-battle echo effects.
+    # An EnemyInstance from an earlier fight can be passed in to be reused.
+    # A plain player dict is turned into a Player (battle['player']).
+    enemy = enemy.reset(enemy_name) if enemy else EnemyInstance(enemy_name)
+
+    if not isinstance(player, Player):
+        player = Player.from_save(player)
+    player = recalculate_player_stats(player)
+
+    echo_id = player.get('equipped_echo')
+    if echo_id:
+        echo_data = CODEX_ENTRIES.get(echo_id, {})
+        if 'combat_effect' in echo_data:
+            eff = echo_data['combat_effect']
+            effects = get_status_effects(player)
+            fx = EFFECT_IDS[eff['id']]
+            if fx not in effects:
+                effects.add(fx, eff.get('turns', 99))
+                log_event(log, f"Your focused memory ({echo_data.get('title', 'Unknown')}) activates {eff.get('id', '?')}!", 1)
+
+    return {
+        "player": player,
+        "enemy": enemy,
+        "enemy_name": enemy_name,
+        "atk": player['total_atk'],
+        "def": player['total_def'],
+        "turns": 0
+    }
+
+
+def apply_battle_buff(battle, log=None):
+    # Consumes the player's pre-battle potion buff (Rage / Stone Skin).
+    player = battle['player']
+    if player.active_buff == "rage":
+        battle['atk'] += 5;
+        log_event(log, "The Rage Potion takes effect! ATK boosted!")
+    elif player.active_buff == "stone":
+        battle['def'] += 2;
+        log_event(log, "The Stone Skin Potion takes effect! DEF boosted!")
+    player.active_buff = None
+
+
+def get_available_skills(player):
+    # Lists the skills shown in the battle menu (upgraded tiers replace base ones).
+    return player_skills(player)[1]
+
+
+def cure_potion_effects(player):
+    # A potion cures Poison and Bleed (v1.8). Returns the cured effect IDs, in the order applied.
+    effects = get_status_effects(player)
+    cured = [fx for fx in effects if fx in (FX_POISON, FX_BLEED)]
+    for fx in cured:
+        effects.remove(fx)
+    return [EFFECT_IDS.names[fx] for fx in cured]
+
+
+def wake_sleeping_enemy(battle):
+    # v1.8: Any player action removes SLEEP from the enemy. Returns True if it woke.
+    return get_status_effects(battle['enemy']).remove(FX_SLEEP)
+
+
+def _strike_enemy(battle, damage):
+    # Deals physical damage to the enemy, halving it against a hardened body.
+    enemy = battle['enemy']
+    if enemy.is_hardened:
+        damage = max(1, int(damage / 2));
+        enemy.is_hardened = False
+    enemy.hp -= damage
+    return damage
+
+
+## NEW (v1.9): Skill effect handlers, see SKILLS ##
+def _skill_strike(battle, skill, log, rng, is_woken_up):
+    player, enemy, enemy_name = battle['player'], battle['enemy'], battle['enemy_name']
+    damage = _strike_enemy(battle, int(battle['atk'] * skill['mult']))
+    if skill['skip_next']: player.skip_next = True
+    for msg in skill['msg']:
+        log_event(log, msg.format(skill=skill['name'], damage=damage))
+    if is_woken_up: log_event(log, f"The {enemy_name} was woken up!")
+    resolve_hit_effects(player, enemy, "You", enemy_name, log, rng)
+
+
+def _skill_guard(battle, skill, log, rng, is_woken_up):
+    battle['player'].guard = True
+    for msg in skill['msg']:
+        log_event(log, msg.format(skill=skill['name']))
+
+
+def _skill_meditate(battle, skill, log, rng, is_woken_up):
+    player = battle['player']
+    heal_amt = int(player.hp_max * skill['heal_pct'])
+    player.hp = min(player.hp_max, player.hp + heal_amt)
+    for msg in skill['msg']:
+        log_event(log, msg.format(skill=skill['name'], heal=heal_amt))
+
+
+def _skill_purify(battle, skill, log, rng, is_woken_up):
+    effects = get_status_effects(battle['player'])
+    for fx in effects:
+        if fx in skill['cures']:
+            effects.remove(fx)
+            for msg in skill['msg']:
+                log_event(log, msg.format(skill=skill['name'], cured=EFFECT_TITLE[fx] or EFFECT_IDS.names[fx]))
+            return
+    log_event(log, skill['miss_msg'].format(skill=skill['name']))
+
+
+SKILL_EFFECTS = {"strike": _skill_strike, "guard": _skill_guard, "meditate": _skill_meditate,
+                 "purify": _skill_purify}
+
+
+def resolve_player_action(battle, action, is_woken_up=False, log=None, rng=None):
+    # Resolves one player action: "attack", "potion", "elixir", a skill name,
+    # or None to pass the turn. Returns False if the action was rejected
+    # (the turn is not used up), True otherwise.
+    rng = rng or RUNTIME.rng
+    player, enemy = battle['player'], battle['enemy']
+    enemy_name = battle['enemy_name']
+    battle_atk = battle['atk']
+
+    if action is None:
+        return True
+
+    if action == "attack":
+        if enemy.is_hardened:
+            log_event(log, "Your attack clangs against the hardened body!")
+        damage = _strike_enemy(battle, battle_atk)
+        log_event(log, f"You dealt {damage} damage.")
+        if is_woken_up: log_event(log, f"The {enemy_name} was woken up!")
+        resolve_hit_effects(player, enemy, "You", enemy_name, log, rng)
+        return True
+
+    if action == "potion" and player.pot > 0:
+        player.pot -= 1;
+        player.hp = min(player.hp_max, player.hp + 25)
+        cured_effects = cure_potion_effects(player)
+        log_event(log, "HP refilled.")
+        if cured_effects: log_event(log, f"The potion cured your {', '.join(cured_effects)}!")
+        return True
+
+    if action == "elixir" and player.elix > 0:
+        player.elix -= 1;
+        player.hp = min(player.hp_max, player.hp + 50)
+        get_status_effects(player).clear(keep_kind=FX_HOT)
+        log_event(log, "HP refilled. All negative effects cured!")
+        return True
+
+    if action not in get_available_skills(player) or skill_on_cooldown(player, action):
+        if action in ["attack", "potion", "elixir"]:
+            log_event(log, "Invalid input.", 0.8)
+        else:
+            log_event(log, "Invalid skill choice.", 0.8)
+        return False
+
+    skill = SKILL_TABLE[action]
+    if skill['hp_pct_below'] is not None and player.hp > (player.hp_max * skill['hp_pct_below']):
+        log_event(log, f"Your HP is too high to use {action}!")
+        log_event(log, skill['requires'], 1.2)
+        return False
+    set_skill_cd(player, action, skill['cd'])
+    SKILL_EFFECTS[skill['effect']](battle, skill, log, rng, is_woken_up)
+    return True
+
+
+def battle_policy_attack(battle):
+    # Action policy: always use a regular attack.
+    return "attack"
+
+
+def battle_policy_basic(battle):
+    # Action policy: heal when low, otherwise use the strongest ready damage skill.
+    player = battle['player']
+    if player.hp <= player.hp_max * 0.3:
+        if player.pot > 0: return "potion"
+        if player.elix > 0: return "elixir"
+    skills = get_available_skills(player)
+    for skill_name in ["Limit Break", "Focus Strike II", "Focus Strike"]:
+        if skill_name in skills and not skill_on_cooldown(player, skill_name):
+            if skill_name != "Limit Break" or player.hp <= player.hp_max * 0.25:
+                return skill_name
+    return "attack"
+
+
+def simulate_battle(player, enemy_name, policy=battle_policy_basic, rng=None, max_turns=500, enemy=None):
+    # Resolves a whole fight with the handle_battle rules but no I/O.
+    # The given player (a Player or a plain player dict) is not modified.
+    # Returns a result record. `enemy` can be an EnemyInstance to reuse across fights.
+    rng = rng or RUNTIME.rng
+    if not isinstance(player, Player):
+        player = Player.from_save(player)
+    battle = begin_battle(player.copy(), enemy_name, enemy=enemy)
+    apply_battle_buff(battle)
+    player, enemy = battle['player'], battle['enemy']
+    outcome = "timeout"
+
+    while battle['turns'] < max_turns:
+        battle['turns'] += 1
+
+        # --- PLAYER'S TURN ---
+        is_stunned = resolve_status_effects(player, "You")
+        if player.hp <= 0:
+            outcome = "lost"
+            break
+
+        is_skipping = player.skip_next
+        player.skip_next = False
+        if not is_stunned and not is_skipping:
+            is_woken_up = wake_sleeping_enemy(battle)
+            if not resolve_player_action(battle, policy(battle), is_woken_up, None, rng):
+                resolve_player_action(battle, "attack", is_woken_up, None, rng)  # Rejected actions fall back to ATTACK
+
+        if enemy.hp <= 0:
+            outcome = "won"
+            break
+
+        # --- ENEMY'S TURN ---
+        resolve_enemy_turn(enemy, player, battle['def'], None, rng)
+        if player.hp <= 0:
+            outcome = "lost"
+            break
+
+        decrement_skill_cooldowns(player)
+
+    base_gold = enemy.get('gold', 0)
+    won = outcome == "won"
+    return {
+        "enemy": enemy_name,
+        "outcome": outcome,
+        "won": won,
+        "turns": battle['turns'],
+        "player_hp": max(0, player.hp),
+        "player_hp_max": player.hp_max,
+        "enemy_hp": max(0, enemy.hp),
+        "xp": enemy.get('xp', 0) if won and player.level < 50 else 0,
+        "gold": base_gold + int(base_gold * player.get('gold_bonus', 0.0)) if won else 0
+    }
+
+
+def grant_battle_rewards(player, enemy):
+    # Hands out XP, gold, loot and quest progress after a victory.
+    enemy_name = enemy['name']
+    xp_gain = enemy.get('xp', 0)
+    gold_bonus = player.get('gold_bonus', 0.0)
+    base_gold = enemy.get('gold', 0)
+    bonus_gold = int(base_gold * gold_bonus)
+    gold_gain = base_gold + bonus_gold
+
+    if player['level'] < 50:
+        player['xp'] += xp_gain
+        print(f"Gained {base_gold} gold (+{bonus_gold} bonus) and {xp_gain} XP!")
+    else:
+        print(f"Gained {base_gold} gold (+{bonus_gold} bonus) (Max level, no XP)")
+
+    player['gold'] += gold_gain
+    print(f"You defeated the {enemy_name}!")
+
+    # Check for Loot Drops
+    for item_id, chance in enemy.get('loot_table', {}).items():
+        if RUNTIME.rng.random() < chance:
+            item_name = EQUIPMENT_DB.get(item_id, {}).get('name', 'Unknown Item')
+            player['inventory'].append(item_id)
+            print(f"The enemy dropped: {item_name}!")
+
+    # Update Quest Progress
+    # Main Quest
+    main_q_id = player['main_quest_id']
+    main_q_data = MAIN_QUESTS.get(main_q_id, {})
+    if (main_q_data.get('type') == 'KILL' and
+            main_q_data.get('target_mob') == enemy_name):
+
+        progress_key = main_q_id
+        # v1.8: Handle chain quest progress
+        if main_q_id.startswith("MQ_05_HERO"):
+            progress_key = "MQ_05_HERO_C"  # All hero kills track under C
+
+        progress = player['quest_progress'].get(progress_key, 0) + 1
+        player['quest_progress'][progress_key] = progress
+        print(f"Main Quest: {progress}/{main_q_data.get('needed', 1)} {enemy_name} defeated.")
+
+        if progress >= main_q_data.get('needed', 1):
+            if main_q_id == "MQ_03":
+                player['main_quest_id'] = "MQ_04"
+                print("Main Quest Updated! Return to Lira.")
+            # --- v1.8: Hero Quest Chain ---
+            elif main_q_id == "MQ_05_HERO_C":
+                player['seal'] = False  # BREAK THE SEAL
+                player['main_quest_id'] = "MQ_06_HERO"
+                print("You feel a great shift. The seal has been safely undone!")
+                print("Main Quest Updated! Confront the Dragon!")
+            # --- End v1.S ---
+
+    # Side Quests
+    for q_id in player.get('active_side_quests', [])[:]:
+        quest = SIDE_QUEST_POOL.get(q_id, {})
+        if (quest.get('type') == 'KILL' and
+                quest.get('target_mob') == enemy_name and
+                player['quest_progress'].get(q_id, 0) < quest.get('needed', 0)):
+            progress = player['quest_progress'].get(q_id, 0) + 1
+            player['quest_progress'][q_id] = progress
+            print(f"Side Quest: {progress}/{quest.get('needed', 1)} {enemy_name} defeated.")
+            if progress >= quest.get('needed', 1):
+                print(f"Side Quest '{quest.get('title', 'Unknown')}' complete! Turn in at the Quest Board.")
+
+    player = handle_level_up(player)
+
+    if RUNTIME.rng.randint(1, 100) <= 30:
+        player['pot'] += 1;
+        print("You found a potion!")
+    return player
+
+
+## MODIFIED (v1.7): Handles skill upgrades and new skills ##
+## MODIFIED (v1.8): Handles Main Quest chain KILL quests ##
+## MODIFIED (v1.9): Renders the headless battle engine ##
+def handle_battle(player, enemy_name):
+    # Main combat loop handler.
+    log = []
+    battle = begin_battle(player, enemy_name, log)
+    render_battle_log(log)
+    player, enemy = battle['player'], battle['enemy']
+
+    if player['active_buff']:
+        clear_screen();
+        draw_line()
+        apply_battle_buff(battle, log)
+        render_battle_log(log)
+        draw_line();
+        safe_input("> Press Enter to start...")
+
+    # Main Battle Loop
+    while True:
+        battle['turns'] += 1
+        clear_screen();
+        draw_line()
+        print(f"Defeat the {enemy_name}!");
+        draw_line()
+
+        # Display Enemy HP and Status Effects
+        enemy_status = ""
+        if enemy.get('active_effects'):
+            enemy_status_list = get_status_effects(enemy).names()
+            if enemy.get('is_hardened'): enemy_status_list.append("HARDENED")
+            enemy_status = f" ({', '.join(enemy_status_list)})"
+        elif enemy.get('is_hardened'):
+            enemy_status = " (HARDENED)"
+        print(f"{enemy_name}'s HP: {enemy['hp']}/{enemy['hp_max']}{enemy_status}")
+
+        # Display Player HP and Status Effects
+        player_status = ""
+        if player.get('active_effects'):
+            player_status = f" ({', '.join(get_status_effects(player).names())})"
+        print(f"{player['name']}'s HP: {player['hp']}/{player['hp_max']}{player_status}");
+        draw_line()
+
+        # --- PLAYER'S TURN ---
+        player, is_stunned = process_status_effects(player, "You")
+        if player['hp'] <= 0:
+            player = game_over(player)
+            if player is None: return "game_over", None
+            return "playing", player
+
+        choice = ""
+        is_skipping = False
+        available_skills = []
+        if player.get('skip_next'):
+            print("(You are focused — you will skip this turn to gather strength.)")
+            player['skip_next'] = False
+            is_skipping = True
+        if is_stunned:
+            print("You are stunned and cannot act!")
+            pause(1)
+        elif is_skipping:
+            print("(You are focused — you will skip this turn to gather strength.)")
+            pause(1)
+        else:
+            # Display Action Menu
+            available_skills = get_available_skills(player)
+            if available_skills: print("S - USE SKILL")
+            print("1 - ATTACK")
+            if player['pot'] > 0: print(f"2 - USE POTION ({player['pot']} left)")
+            if player['elix'] > 0: print(f"3 - USE ELIXIR ({player['elix']} left)")
+            draw_line();
+            choice = safe_input("# ")
+
+        # Execute Player Action
+        if not is_stunned and not is_skipping:
+            is_woken_up = wake_sleeping_enemy(battle)
+
+            action = {"1": "attack", "2": "potion", "3": "elixir"}.get(choice)
+            if choice.upper() == "S":  # Use Skill
+                action = handle_skill_menu(player, available_skills)
+                if action is None:
+                    continue
+            elif choice != "" and action is None:
+                print("Invalid input.");
+                pause(0.8);
+                continue
+
+            if not resolve_player_action(battle, action, is_woken_up, log):
+                render_battle_log(log)
+                continue
+            render_battle_log(log)
+
+        pause(1)
+
+        # Check for Enemy Defeat
+        if enemy['hp'] <= 0:
+            player = grant_battle_rewards(player, enemy)
+            safe_input("> ")
+
+            if enemy_name == "Dragon" or enemy_name == "Dragon_WorldBoss":
+                return "game_won", player
+
+            return "playing", player
+
+        # --- ENEMY'S TURN ---
+        enemy, player = handle_enemy_turn(enemy, player, battle['def'])
+        if player['hp'] <= 0:
+            player = game_over(player)
+            if player is None: return "game_over", None
+            return "playing", player
+
+        decrement_skill_cooldowns(player)
+
+
+def handle_skill_menu(player, available_skills):
+    # Shows the in-battle skill list. Returns the chosen skill name, None on
+    # cancel, or "invalid" for an unknown choice.
+    clear_screen();
+    draw_line();
+    print("CHOOSE A SKILL");
+    draw_line()
+    skill_map = {}
+    skill_idx = 1
+
+    for skill_name in available_skills:
+        skill = SKILL_TABLE[skill_name]
+        cd = player.get('skills_cd', {}).get(skill['line'], 0)
+
+        if cd > 0:
+            print(f"[X] {skill_name} (CD: {cd})")
+        elif skill['hp_pct_below'] is not None and player['hp'] > (player['hp_max'] * skill['hp_pct_below']):
+            print(f"[ ] {skill_name} {skill['requires']}")
+        else:
+            print(f"{skill_idx} - {skill_name} {skill['details']}")
+            skill_map[str(skill_idx)] = skill_name;
+            skill_idx += 1
+
+    print("0 - Cancel")
+    draw_line()
+    skill_choice = safe_input("# ")
+
+    if skill_choice == "0":
+        return None
+    return skill_map.get(skill_choice, "invalid")
+
+
+## MODIFIED (v1.6.4): Uses safe_input, clearer feedback ##
+def handle_shop(player):
+    # Handles interactions within the shop.
+    while True:
+        clear_screen()
+        draw_line();
+        print("Welcome to the shop!");
+        draw_line()
+        print(f"GOLD: {player['gold']} | ATK: {player['total_atk']} | DEF: {player['total_def']}");
+        draw_line()
+        print("--- Consumables ---")
+        print(f"1 - BUY POTION (25HP, Cures Poison/Bleed) - 15 GOLD ({player['pot']} owned)")  # v1.8: Desc
+        print(f"2 - BUY ELIXIR (50HP, Cures All)      - 25 GOLD ({player['elix']} owned)")
+        print(f"3 - BUY RAGE POTION (+5 ATK next battle) - 40 GOLD ({player['rage_potions']} owned)")
+        print(f"4 - BUY STONE SKIN POTION (+2 DEF next battle) - 35 GOLD ({player['stone_potions']} owned)")
+        draw_line()
+        print("--- Equipment ---")
+        print(f"5 - BUY Poison Dagger (+1 ATK, 30% Poison) - 75 GOLD")
+        print(f"6 - BUY Chainmail Vest (+3 DEF) - 100 GOLD")
+        print(f"7 - BUY Lucky Coin (+10% Gold Bonus) - 120 GOLD")
+
+        # Calculate scaling upgrade cost
+        upgrade_level = (player['base_atk'] - 3)
+        upgrade_cost = 50 + (upgrade_level * 25)
+        print(f"8 - UPGRADE WEAPON (+1 Base ATK) - {upgrade_cost} GOLD")
+        print("9 - LEAVE")
+        draw_line();
+        choice = safe_input("# ")
+
+        action_taken = False
+        if choice == "1" and player['gold'] >= 15:
+            player['gold'] -= 15;
+            player['pot'] += 1;
+            action_taken = True
+            print("Bought 1 Potion.")
+        elif choice == "2" and player['gold'] >= 25:
+            player['gold'] -= 25;
+            player['elix'] += 1;
+            action_taken = True
+            print("Bought 1 Elixir.")
+        elif choice == "3" and player['gold'] >= 40:
+            player['gold'] -= 40;
+            player['rage_potions'] += 1;
+            action_taken = True
+            print("Bought 1 Rage Potion.")
+        elif choice == "4" and player['gold'] >= 35:
+            player['gold'] -= 35;
+            player['stone_potions'] += 1;
+            action_taken = True
+            print("Bought 1 Stone Skin Potion.")
+
+        elif choice == "5" and player['gold'] >= 75:
+            player['gold'] -= 75;
+            player['inventory'].append("EQ_W_003");
+            action_taken = True
+            print("Bought Poison Dagger!")
+        elif choice == "6" and player['gold'] >= 100:
+            player['gold'] -= 100;
+            player['inventory'].append("EQ_A_002");
+            action_taken = True
+            print("Bought Chainmail Vest!")
+        elif choice == "7" and player['gold'] >= 120:
+            player['gold'] -= 120;
+            player['inventory'].append("EQ_C_003");
+            action_taken = True
+            print("Bought Lucky Coin!")
+
+        elif choice == "8" and player['gold'] >= upgrade_cost:
+            player['gold'] -= upgrade_cost;
+            player['base_atk'] += 1
+            player = recalculate_player_stats(player)
+            print(f"Base ATK permanently increased to {player['base_atk']}!")
+            action_taken = True
+        elif choice == "9":
+            return "playing", player, None
+
+        if not action_taken and choice != '9':
+            print("Not enough gold or invalid choice!");
+
+        if action_taken or choice != '9':
+            safe_input("> ")
+
+
+def handle_mayor(player):
+    # Handles interactions with the Mayor.
+    main_q_id = player.get('main_quest_id')
+    main_q_data = MAIN_QUESTS.get(main_q_id, {})
+
+    while True:
+        clear_screen()
+        draw_line()
+        print(f"Hello there, {player['name']}!")
+        draw_line()
+
+        # Check for the "Fateful Choice" quest state
+        if main_q_id == "MQ_04_COMPLETE" and player['seal']:
+            if player['total_atk'] >= 10:
+                typewriter_effect("'You are stronger,' the Mayor says, 'But... still not enough.'")
+                typewriter_effect("'The seal is weakening. We have two choices:'")
+                draw_line()
+                print(
+                    "1 - 'Wait. Train as Lira advised (Lvl 10 / ATK 20 Total) to break the seal safely.' (The Hero's Path)")
+                print(
+                    "2 - 'Or, I have an ancient key... We can force the seal NOW! The risk is... unknown.' (The Reckless Path)")
+                draw_line()
+                choice = safe_input("# ")
+
+                if choice == "1":
+                    player['main_quest_id'] = "MQ_05_HERO_A"  # v1.8: Start Hero Chain
+                    player['quest_progress']['MQ_05_HERO_A'] = 0  # Init progress
+                    typewriter_effect("'A wise choice. Speak to Lira. She will guide your training.'")
+                    safe_input("> ")
+                    return "playing", player, None
+                elif choice == "2":
+                    player['key'] = True
+                    player['seal'] = False
+                    player['main_quest_id'] = "MQ_05_RECKLESS"
+                    player['quest_progress']['MQ_05_RECKLESS'] = 0  # Init progress
+                    typewriter_effect("'May Auren forgive us... The seal is forced!'")
+                    typewriter_effect("You hear an enraged roar echo across the world...")
+                    safe_input("> ")
+                    return "playing", player, None
+                else:
+                    continue
+            else:
+                typewriter_effect("'You have returned... but your echo is still weak,' the Mayor says.")
+                typewriter_effect(
+                    f"'I cannot offer you this choice until you are stronger (Current ATK: {player['total_atk']}/10).'")
+                typewriter_effect("'Continue your training.'")
+
+        elif main_q_id == "MQ_01" and main_q_data.get('target') == "town":
+            typewriter_effect("'Thank goodness you're here,' the Mayor says, his face grim.")
+            typewriter_effect("'The echoes... they're growing stronger. The seal is weakening.'")
+            player['main_quest_id'] = "MQ_02"
+            print("\n(Main Quest Updated!)")
+            safe_input("> ")
+            continue
+
+        elif not player['seal']:
+            if player['key']:
+                typewriter_effect("'The seal is broken... The dragon has escaped! You must find it!'")
+            else:
+                typewriter_effect("'The seal is safely broken. Go to the cave! Auren is counting on you!'")
+
+        # v1.8: Hero Path dialogue
+        elif main_q_id.startswith("MQ_05_HERO"):
+            typewriter_effect("'Speak to Lira at the Guild. She is guiding your path now. Be safe.'")
+
+        else:
+            typewriter_effect("'Continue your training, adventurer. Talk to Lira at the Guild.'")
+
+        draw_line()
+        print("1 - LEAVE")
+        draw_line()
+        choice = safe_input("# ")
+        if choice == "1": return "playing", player, None
+
+
+def handle_cave(player):
+    # Handles interactions at the Dragon's Cave entrance.
+    while True:
+        clear_screen()
+        draw_line()
+
+        if player['seal']:
+            typewriter_effect("A massive, glowing seal bars the cave entrance.")
+            typewriter_effect("It hums with ancient power. You are not yet strong enough.")
+            draw_line()
+            print("1 - TURN BACK")
+            # v1.8: Check for interactable
+            if "dragon_cultist_diary" not in player.get('codex', []):
+                print("7 - Examine the strange markings")
+            draw_line()
+            choice = safe_input("# ")
+            if choice == "1":
+                return "playing", player, None
+            # v1.8: Handle interactable
+            elif choice == "7" and "dragon_cultist_diary" not in player.get('codex', []):
+                typewriter_effect("You find a charred piece of parchment tucked into the rock...")
+                player = codex_add(player, "dragon_cultist_diary")
+                safe_input("> ")
+                continue  # Refresh cave menu
+
+        else:
+            if player['key']:
+                typewriter_effect("The seal is shattered... but the cave is empty.")
+                typewriter_effect("A cold wind blows from the darkness. The dragon has escaped.")
+                draw_line()
+                print("1 - TURN BACK")
+                draw_line()
+                choice = safe_input("# ")
+                if choice == "1": return "playing", player, None
+
+            else:
+                typewriter_effect("The seal has vanished. The path is open.")
+                typewriter_effect("You hear a hateful roar from within the darkness.")
+                draw_line()
+                print("1 - ENTER THE LAIR (Fight Dragon)")
+                print("2 - TURN BACK")
+                draw_line()
+                choice = safe_input("# ")
+                if choice == "1":
+                    return "battle", player, "Dragon"
+                elif choice == "2":
+                    return "playing", player, None
+
+
+def handle_debug_console(player):
+    # Provides a debug menu for testing (if dev_mode is enabled).
+    while True:
+        clear_screen()
+        draw_line();
+        print("    DEVELOPER CONSOLE (v1.8)");
+        draw_line()
+        print(
+            f"HP:{player['hp']}/{player['hp_max']} | ATK:{player['total_atk']} (Base:{player['base_atk']}+B{player.get('bonus_atk', 0)}) | DEF:{player['total_def']} (Base:{player['base_def']}+B{player.get('bonus_def', 0)})")
+        print(f"LVL:{player['level']} | XP:{player['xp']}/{player['xp_to_next_level']}")
+        print(
+            f"POS: ({player['x']}, {player['y']}) | Seal: {'Intact' if player['seal'] else 'Broken'} | Key: {player['key']}")
+        print(f"Main Quest: {player['main_quest_id']} | Gold: {player['gold']}")
+        print(f"Focused Echo: {player['equipped_echo']}")
+        print(f"Completed SQs: {player.get('completed_side_quests', [])}")
+        draw_line()
+        print(
+            "1. Add 1000 Gold\n2. Add 500 XP\n3. Add 1 Bonus ATK\n4. Heal to Full HP\n5. Get All Items & Echoes\n6. Toggle Dragon Seal\n7. Teleport (TOWN)\n0. Exit Console")
+        draw_line();
+        choice = safe_input("# ")
+
+        action_taken = True
+        if choice == "1":
+            player['gold'] += 1000
+        elif choice == "2":
+            player['xp'] += 500;
+            player = handle_level_up(player)
+        elif choice == "3":
+            player['bonus_atk'] = player.get('bonus_atk', 0) + 1
+            player = recalculate_player_stats(player)
+        elif choice == "4":
+            player['hp'] = player['hp_max']
+        elif choice == "5":
+            player['pot'] += 10
+            for item_id in EQUIPMENT_DB.keys():
+                if item_id not in player['inventory']:
+                    player['inventory'].append(item_id)
+            for echo_id in CODEX_ENTRIES.keys():
+                player = codex_add(player, echo_id)
+        elif choice == "6":
+            player['seal'] = not player['seal']
+        elif choice == "7":
+            player['x'], player['y'] = 2, 3
+        elif choice == "0":
+            return "playing", player, None
+        else:
+            action_taken = False
+            print("Invalid command.")
+
+        if action_taken:
+            print("Debug command executed.")
+        safe_input("\n> Press Enter to continue...")
+
+
+def handle_game_over():
+    # Final screen after player chooses not to respawn or dies permanently.
+    clear_screen()
+    draw_line()
+    print("GAME OVER")
+    draw_line()
+    safe_input("> Press Enter to return to the Main Menu...")
+    return "main_menu"
+
+
+def handle_game_won(player):
+    # Screen displayed after defeating the final boss.
+    clear_screen()
+    draw_line()
+    typewriter_effect("With a final, earth-shattering roar, the mighty Dragon falls.")
+    pause(1)
+    typewriter_effect("Silence descends upon the land...")
+    pause(1.5)
+
+    if player.get('key'):
+        typewriter_effect("The roar of *forgetting* is gone, but the world remains... quiet.")
+        typewriter_effect("You have saved Auren from the beast, but the echoes remain scattered.")
+        typewriter_effect("The Breath of Dawn... is still lost.")
+    else:
+        typewriter_effect("A faint warmth returns to the air. The Breath of Dawn stirs.")
+        typewriter_effect("The echoes begin to sing, their memories mended by your strength.")
+        typewriter_effect(f"{WORLD_NAME} remembers.")
+
+    print()
+    typewriter_effect(f"Your name, {player['name']}, will be sung by bards for generations.")
+    typewriter_effect("Congratulations, hero. You have won.")
+    draw_line()
+    safe_input("> Press Enter to return to the Main Menu...")
+    return "main_menu"
+
+
+## MODIFIED (v1.6.4): Uses safe_input, clearer options ##
+def handle_equipment_menu(player):
+    # Handles the equipment management screen.
+    while True:
+        clear_screen()
+        draw_line()
+        print("EQUIPMENT & INVENTORY")
+        draw_line()
+        print(f"ATK: {player['total_atk']} | DEF: {player['total_def']} | HP: {player['hp']}/{player['hp_max']}")
+        draw_line()
+
+        # Display equipped items
+        print("--- EQUIPPED ---")
+        wp_id = player['equipment']['weapon']
+        ar_id = player['equipment']['armor']
+        ch_id = player['equipment']['charm']
+
+        wp_name = EQUIPMENT_DB.get(wp_id, {}).get('name', 'None')
+        ar_name = EQUIPMENT_DB.get(ar_id, {}).get('name', 'None')
+        ch_name = EQUIPMENT_DB.get(ch_id, {}).get('name', 'None')
+
+        print(f"a. Weapon: {wp_name}")
+        print(f"b. Armor : {ar_name}")
+        print(f"c. Charm : {ch_name}")
+        draw_line()
+
+        # Display inventory items with numbers
+        print("--- INVENTORY ---")
+        if not player['inventory']:
+            print("Your inventory is empty.")
+        else:
+            # Sort inventory by type, then name
+            sorted_inventory = sorted(player['inventory'], key=lambda item_id: (
+                EQUIPMENT_DB.get(item_id, {}).get('type', 'z'),
+                EQUIPMENT_DB.get(item_id, {}).get('name', 'Unknown')
+            ))
+            player['inventory'] = sorted_inventory
+
+            for i, item_id in enumerate(player['inventory'], 1):
+                item = EQUIPMENT_DB.get(item_id, {})
+                stats = item.get('stats', {})
+                print(f"{i}. {item.get('name', 'Unknown')} [{item.get('type', '?')}] (Stats: {stats})")
+
+        draw_line()
+        print("Enter number to Equip, letter (a,b,c) to Unequip, or '0' to return.")
+        choice = safe_input("# ").lower()
+
+        if choice == '0':
+            return player
+
+        # Handle Unequip action
+        elif choice in ['a', 'b', 'c']:
+            slot_to_unequip = None
+            if choice == 'a':
+                slot_to_unequip = 'weapon'
+            elif choice == 'b':
+                slot_to_unequip = 'armor'
+            elif choice == 'c':
+                slot_to_unequip = 'charm'
+
+            item_id_to_unequip = player['equipment'].get(slot_to_unequip)
+            if item_id_to_unequip:
+                item_name = EQUIPMENT_DB.get(item_id_to_unequip, {}).get('name', 'Item')
+                player['equipment'][slot_to_unequip] = None
+                player['inventory'].append(item_id_to_unequip)
+                player = recalculate_player_stats(player)
+                print(f"Unequipped {item_name}.")
+                safe_input("> ")
+            else:
+                print("That slot is already empty.")
+                safe_input("> ")
+
+        # Handle Equip action
+        elif choice.strip().isdigit():
+            idx = int(choice) - 1
+            if 0 <= idx < len(player['inventory']):
+                item_id_to_equip = player['inventory'][idx]
+                item_data = EQUIPMENT_DB[item_id_to_equip]
+                item_type = item_data['type']
+
+                current_equipped_id = player['equipment'].get(item_type)
+                if current_equipped_id:
+                    player['inventory'].append(current_equipped_id)
+
+                player['equipment'][item_type] = item_id_to_equip
+                player['inventory'].pop(idx)
+
+                print(f"Equipped {item_data.get('name', 'Item')}.")
+                player = recalculate_player_stats(player)
+                safe_input("> ")
+            else:
+                print("Invalid item number.")
+                safe_input("> ")
+        else:
+            print("Invalid input.")
+            safe_input("> ")
+
+
+## MODIFIED (v1.6.4): Displays more stats, handles safe_input, returns tuple ##
+## MODIFIED (v1.8): Handles interactables and world-changing spawns ##
+def handle_playing(player):
+    # Main game screen handler (map view).
+    y_len, x_len = WORLD.height - 1, WORLD.width - 1
+
+    if player['y'] > y_len or player['x'] > x_len:
+        player['x'], player['y'] = 2, 3
+
+    current_tile = biome_at(player['x'], player['y'])
+    standing = True
+
+    if player['main_quest_id'] == "MQ_01" and player['x'] == 2 and player['y'] == 3:
+        player['main_quest_id'] = "MQ_02"
+
+    clear_screen()
+
+    player, _ = process_status_effects(player, "You")
+    if player['hp'] <= 0:
+        player = game_over(player)
+        if player is None: return "game_over", None, None
+        return "playing", player, None
+
+    draw_line()
+    draw_minimap(player)
+    show_biome_flavor(player)
+    draw_line()
+    print("LOCATION: " + BIOME_TITLE[current_tile])
+    draw_line()
+    print(f"NAME: {player['name']} | Lv: {player['level']}")
+    print(f"HP: {player['hp']}/{player['hp_max']} | ATK: {player['total_atk']} | DEF: {player['total_def']}")
+
+    player_status = ""
+    if player.get('active_effects'):
+        player_status = f" ({', '.join(get_status_effects(player).names())})"
+    print(f"XP: {player['xp']}/{player['xp_to_next_level']}{player_status}")
+
+    focused_echo_name = "None"
+    if player.get('equipped_echo'):
+        focused_echo_name = CODEX_ENTRIES.get(player['equipped_echo'], {}).get('title', 'Unknown')
+    print(f"FOCUSED ECHO: {focused_echo_name}")
+
+    print(f"GOLD: {player['gold']}")
+    draw_line()
+
+    # Display Action Menu
+    print("0 - SAVE AND QUIT")
+    if player['y'] > 0: print("1 - NORTH (↑)")
+    if player['x'] < x_len: print("2 - EAST (→)")
+    if player['y'] < y_len: print("3 - SOUTH (↓)")
+    if player['x'] > 0: print("4 - WEST (←)")
+    if player['pot'] > 0: print(f"5 - USE HEAL POTION ({player['pot']} left)")
+    if player['elix'] > 0: print(f"6 - USE ELIXIR ({player['elix']} left)")
+
+    # --- v1.8: Interactable Logic (Display) ---
+    interact_text = None
+    px, py = player['x'], player['y']
+    codex = player.get('codex', [])
+
+    if current_tile in BIOME_ENTERABLE:
+        interact_text = "7 - ENTER"
+    elif px == 1 and py == 2:  # Fields (1,2)
+        if "farmer_memory" not in codex:
+            interact_text = "7 - Examine the abandoned plow"
+        elif "SQ_FARMER_01" not in player.get('active_side_quests', []) and "SQ_FARMER_01" not in player.get(
+                'completed_side_quests', []):
+            interact_text = "7 - Talk to the farmer"
+        else:
+            interact_text = "7 - Greet the farmer"
+
+    elif px == 6 and py == 0 and "dragon_cultist_diary" not in codex and player['seal']:  # Cave Entrance (6,0)
+        interact_text = "7 - Examine the strange markings"
+
+    if interact_text:
+        print(interact_text)
+    # --- End v1.8 Logic ---
+
+    if player['rage_potions'] > 0: print(f"8 - USE RAGE POTION ({player['rage_potions']} left)")
+    if player['stone_potions'] > 0: print(f"9 - USE STONE SKIN POTION ({player['stone_potions']} left)")
+    print("10 - READ ECHO CODEX (Read Only)")
+    print("11 - VIEW QUEST LOG")
+    print("12 - MAP LEGEND")
+    print("13 - VIEW EQUIPMENT")
+    print("14 - HOW TO PLAY/HELP")
+    if player.get('dev_mode'): print("dev - DEV CONSOLE")
+    draw_line()
+
+    if player['active_buff']:
+        print(f"Active Buff for next battle: {player['active_buff'].upper()}!")
+        draw_line()
+
+    # v1.8: REMOVED auto-complete logic, handled by KILL quest now
+    main_q_id = player.get('main_quest_id')
+    # if (main_q_id == "MQ_05_HERO" and player['total_atk'] >= 20 and ...
+
+    dest = safe_input("# ")
+
+    next_state = "playing"
+    enemy_to_fight = None
+
+    if dest == "0":
+        save_game(player);
+        next_state = "main_menu"
+    elif dest in ["1", "2", "3", "4"]:
+        moved = False
+        if dest == "1" and player['y'] > 0:
+            player['y'] -= 1;
+            moved = True
+        elif dest == "2" and player['x'] < x_len:
+            player['x'] += 1;
+            moved = True
+        elif dest == "3" and player['y'] < y_len:
+            player['y'] += 1;
+            moved = True
+        elif dest == "4" and player['x'] > 0:
+            player['x'] -= 1;
+            moved = True
+        else:
+            print("You cannot move that way.")
+            pause(1)
+            standing = True
+
+        if moved:
+            standing = False
+            current_tile = biome_at(player['x'], player['y'])
+
+    elif dest == "5" and player['pot'] > 0:
+        player['pot'] -= 1;
+        player['hp'] = min(player['hp_max'], player['hp'] + 25)
+        cured_effects = cure_potion_effects(player)
+        print("HP refilled!");
+        if cured_effects: print(f"The potion cured your {', '.join(cured_effects)}!")
+        safe_input("> ")
+    elif dest == "6" and player['elix'] > 0:
+        player['elix'] -= 1;
+        player['hp'] = min(player['hp_max'], player['hp'] + 50)
+        get_status_effects(player).clear(keep_kind=FX_HOT)
+        print("HP refilled. All negative effects cured!");
+        safe_input("> ")
+    elif dest == "7":
+        px, py = player['x'], player['y']
+        codex = player.get('codex', [])
+
+        # Original Enter Logic
+        if current_tile == BIOME_SHOP:
+            next_state = "shop"
+        elif current_tile == BIOME_MAYOR:
+            next_state = "mayor"
+        elif current_tile == BIOME_CAVE:
+            next_state = "cave"
+        elif current_tile == BIOME_TOWN:
+            next_state = "town"
+
+        # --- v1.8: Interactable Logic (Action) ---
+        elif px == 1 and py == 2:  # Fields (1,2)
+            if "farmer_memory" not in codex:
+                typewriter_effect("You touch an old plow. A memory of cold earth and hunger surfaces...")
+                player = codex_add(player, "farmer_memory")
+                safe_input("> ")
+            elif "SQ_FARMER_01" not in player.get('active_side_quests', []) and "SQ_FARMER_01" not in player.get(
+                    'completed_side_quests', []):
+                typewriter_effect("An old farmer approaches you, his eyes weary.")
+                typewriter_effect(
+                    "'You... you can feel the echoes, can't you? Please... my grandchildren, they can't sleep. They need the 'Ancient Lullaby'.'")
+                typewriter_effect(
+                    "'I heard a Merchant Spirit... one of those echo-traders... was humming it in the woods.'")
+                print("\n(New Side Quest accepted: The Lost Lullaby!)")
+                player.setdefault('active_side_quests', []).append("SQ_FARMER_01")
+                player['quest_progress']['SQ_FARMER_01'] = 0  # Initialize progress
+                safe_input("> ")
+            else:
+                typewriter_effect("The farmer nods at you, hopeful. 'Still searching for that tune?'")
+                safe_input("> ")
+
+        elif px == 6 and py == 0 and "dragon_cultist_diary" not in codex and player['seal']:  # Cave Entrance (6,0)
+            typewriter_effect("You find a charred piece of parchment tucked into the rock...")
+            player = codex_add(player, "dragon_cultist_diary")
+            safe_input("> ")
+
+        elif interact_text:  # Player pressed 7, but it wasn't a standard building or known interactable
+            # Default message if '7' was shown but no specific action defined (like "Greet farmer")
+            typewriter_effect("You take a closer look around.")
+            pause(1)
+        else:  # Player pressed 7 where it wasn't an option
+            print("Nothing happens.")
+            pause(1)
+        # --- End v1.8 Logic ---
+    elif dest == "8" and player['rage_potions'] > 0:
+        player['rage_potions'] -= 1;
+        player['active_buff'] = "rage"
+        print("Your ATK will be boosted in the next battle.");
+        safe_input("> ")
+    elif dest == "9" and player['stone_potions'] > 0:
+        player['stone_potions'] -= 1;
+        player['active_buff'] = "stone"
+        print("You will take less damage in the next battle.");
+        safe_input("> ")
+    elif dest == "10":
+        show_codex(player);
+    elif dest == "11":
+        handle_quest_log(player)
+    elif dest == "12":
+        handle_map_legend()
+    elif dest == "13":
+        player = handle_equipment_menu(player)
+    elif dest == "14":
+        handle_help_menu()
+    elif dest == "dev" and player.get('dev_mode'):
+        next_state = "debug_console"
+    elif dest != "" and dest not in ["1", "2", "3", "4"]:  # Ignore empty input, allow movement
+        print("Invalid command.")
+        pause(1)
+
+        # Check for encounters AFTER movement or action
+    if not standing and BIOME_HAS_ENCOUNTERS[current_tile]:
+        roll = RUNTIME.rng.randint(1, 100)
+
+        # Check for World Boss encounter (Reckless Path only)
+        if not player['seal'] and player['key']:
+            if roll <= 10:
+                typewriter_effect("The sky darkens... a colossal shadow sweeps over you!")
+                typewriter_effect(f"THE DRAGON HAS FOUND YOU!")
+                safe_input("> ")
+                next_state = "battle"
+                enemy_to_fight = "Dragon_WorldBoss"
+
+        # Check for Random Event (if not fighting World Boss)
+        elif roll <= 18:  # 8% chance (11-18)
+            next_state, player = handle_random_event(player)
+
+        # Check for Regular Mob Encounter (if not fighting World Boss or having event)
+        # v1.8: REFACTORED to handle world changes
+        elif roll <= 48:  # 30% chance (19-48)
+            base_possible_mobs = BIOME_MOBS[current_tile]
+            if base_possible_mobs:
+                # --- v1.8: World Change & Path Logic ---
+                # Make a copy to modify
+                current_possible_mobs = list(base_possible_mobs)
+                main_q = player['main_quest_id']
+
+                # 1. Swamp Cleanup - Check completed quests
+                if "SQ_GUARD_01" in player.get('completed_side_quests', []):
+                    if current_tile == BIOME_SWAMP and MOB_FIRE_SLIME in current_possible_mobs:
+                        current_possible_mobs.remove(MOB_FIRE_SLIME)
+
+                # 2. Reckless Path Mobs
+                if main_q == "MQ_05_RECKLESS":
+                    if current_tile == BIOME_PLAINS and MOB_WOLF in current_possible_mobs:  # Check in Plains
+                        current_possible_mobs.remove(MOB_WOLF)
+                        if MOB_CORRUPTED_WOLF not in current_possible_mobs:
+                            current_possible_mobs.append(MOB_CORRUPTED_WOLF)
+
+                # 3. Hero Path Quest Mob - Spawn only if on this specific quest step
+                elif main_q == "MQ_05_HERO_C":
+                    if current_tile == BIOME_HILLS:
+                        # Force spawn Sentinel (always registered, see MOB_SENTINEL)
+                        current_possible_mobs = [MOB_SENTINEL]  # Prioritize quest mob
+                # --- End v1.8 Logic ---
+
+                if current_possible_mobs:  # Check if list isn't empty after filtering
+                    enemy_name = MOB_IDS.names[RUNTIME.rng.choice(current_possible_mobs)]
+                    next_state = "battle"
+                    enemy_to_fight = enemy_name
+
+    return next_state, player, enemy_to_fight
+
+
+# ==============================================================================
+# ## 5. SIMULATION & DEBUG TOOLS ##
+# (Headless helpers for balance testing, session replay and save tooling)
+# ==============================================================================
+
+## NEW (v1.9): Player builds used by the balance tools ##
+SIM_LOADOUTS = {
+    "none": {"weapon": None, "armor": None, "charm": None},
+    "starter": {"weapon": "EQ_W_001", "armor": None, "charm": None},
+    "shop": {"weapon": "EQ_W_003", "armor": "EQ_A_002", "charm": "EQ_C_003"},
+    "forest": {"weapon": "EQ_W_002", "armor": "EQ_A_001", "charm": "EQ_C_001"},
+    "fire": {"weapon": "EQ_W_002", "armor": "EQ_A_004", "charm": "EQ_C_002"},
+    "ruins": {"weapon": "EQ_W_004", "armor": "EQ_A_003", "charm": "EQ_C_004"}
+}
+
+
+def build_sim_player(level, loadout="starter", echo=None):
+    # Creates a fully healed player at `level` using the normal level-up growth.
+    player = create_new_player("Simulated", None)
+    while player['level'] < min(level, MAX_LEVEL):
+        player['xp'] = player['xp_to_next_level']
+        apply_level_growth(player)
+    player['equipment'] = dict(SIM_LOADOUTS[loadout])
+    if echo:
+        player['codex'].append(echo)
+        player['equipped_echo'] = echo
+    player = recalculate_player_stats(player)
+    player['hp'] = player['hp_max']
+    return player
+
+
+def _require_numpy():
+    # NumPy is only needed by the batch simulator, so it is imported on demand.
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The batch balance simulator requires NumPy (pip install numpy).") from None
+    return numpy
+
+
+def simulate_battles_vectorized(player, enemy_name, n, seed=None, max_turns=500):
+    # Runs `n` independent fights at once, one NumPy row per fight.
+    # Mirrors the regular attack, mob ability (MOB_ABILITIES) and status
+    # effect (DOT/HOT/stun) rules of resolve_enemy_turn and
+    # resolve_status_effects. The player attacks, using Focus Strike whenever
+    # it is off cooldown. Skill cooldowns are one column per SKILL_LINES entry,
+    # kept like the player's skills_cd.
+    np = _require_numpy()
+    rng = np.random.default_rng(seed)
+    if not isinstance(player, Player):
+        player = Player.from_save(player)
+    player = recalculate_player_stats(player.copy())
+    mob = MOBS[enemy_name]
+
+    # Effect timer columns are the interned effect IDs
+    kind = np.array(EFFECT_KIND, dtype=np.int64)
+    value = np.array(EFFECT_VALUE, dtype=np.int64)
+    dot_value = np.where(kind == FX_DOT, value, 0)
+    hot_value = np.where(kind == FX_HOT, value, 0)
+    stun_cols = [FX_STUN, FX_SLEEP]
+    sleep_col = FX_SLEEP
+
+    # v1.8 burn resistance only applies to the player
+    profile = player_combat_profile(player)
+    player_dot = dot_value.copy()
+    if profile.burn_resist > 0.0:
+        player_dot[FX_BURN] = max(1, int(dot_value[FX_BURN] * (1.0 - profile.burn_resist)))
+
+    # Player build
+    battle_atk, battle_def = player['total_atk'], player['total_def']
+    if player['active_buff'] == "rage":
+        battle_atk += 5
+    elif player['active_buff'] == "stone":
+        battle_def += 2
+    skill_damage = None
+    strike = [name for name in player_skills(player)[1] if SKILL_CD_KEY[name] == "Focus Strike"]
+    if strike:
+        skill_damage = int(battle_atk * SKILL_TABLE[strike[0]]['mult'])
+        strike_cd = SKILL_TABLE[strike[0]]['cd']
+
+    echo_data = CODEX_ENTRIES.get(player.get('equipped_echo'), {})
+    player_on_hit = [e for e in profile.on_hit if e[0] != FX_MANA_DRAIN]  # Mana drain does nothing to a mob
+    enemy_on_hit = [e for e in MOB_ON_HIT[MOB_IDS[enemy_name]] if e[0] != FX_MANA_DRAIN]
+    enemy_drain_hit = [e for e in MOB_ON_HIT[MOB_IDS[enemy_name]] if e[0] == FX_MANA_DRAIN]
+    abilities = MOB_ABILITIES[MOB_IDS[enemy_name]]
+
+    # State columns (one row per fight)
+    p_hp = np.full(n, player['hp'], dtype=np.int64)
+    p_fx = np.zeros((n, len(EFFECT_IDS)), dtype=np.int64)
+    for fx in get_status_effects(player):
+        p_fx[:, fx] = player['active_effects'].turns[fx]
+    if 'combat_effect' in echo_data and not p_fx[0, EFFECT_IDS[echo_data['combat_effect']['id']]]:
+        p_fx[:, EFFECT_IDS[echo_data['combat_effect']['id']]] = echo_data['combat_effect'].get('turns', 99)
+    e_hp = np.full(n, mob['hp'], dtype=np.int64)
+    e_fx = np.zeros((n, len(EFFECT_IDS)), dtype=np.int64)
+    e_atk = np.full(n, mob['atk'], dtype=np.int64)
+    flags = {flag: np.zeros(n, dtype=bool) for flag in ABILITY_FLAGS}
+    hardened = flags['is_hardened']
+
+    # Cooldown columns: skills_cd keys of the player (a key stays once set,
+    # which matters for the drain target choice)
+    cd_keys = [tiers[0] for tiers in SKILL_LINES]
+    cd_col = {key: i for i, key in enumerate(cd_keys)}
+    skill_cd = np.zeros((n, len(cd_keys)), dtype=np.int64)
+    cd_known = np.zeros((n, len(cd_keys)), dtype=bool)
+    for key, turns_left in player.get('skills_cd', {}).items():
+        if key in cd_col:
+            skill_cd[:, cd_col[key]] = turns_left
+            cd_known[:, cd_col[key]] = True
+    strike_col = cd_col["Focus Strike"]
+    undrainable = np.isin(np.arange(len(cd_keys)), [cd_col["Focus Strike"], cd_col["Guard"]])
+    drain_fallback = np.isin(np.arange(len(cd_keys)), [cd_col["Meditate"], cd_col["Limit Break"]])
+    running = np.ones(n, dtype=bool)
+    won = np.zeros(n, dtype=bool)
+    turns = np.zeros(n, dtype=np.int64)
+
+    def tick(hp, fx, dot, hp_max):
+        # One status effect tick for the given rows. Returns (hp, fx, stunned).
+        active = fx > 0
+        hp = hp - (active * dot).sum(axis=1)
+        heal = (active * hot_value).sum(axis=1)
+        hp = np.where(heal > 0, np.minimum(hp_max, hp + heal), hp)
+        fx = np.where(active, fx - 1, 0)
+        return hp, fx, (fx[:, stun_cols] > 0).any(axis=1)
+
+    def inflict(fx, rows, effects):
+        # Rolls each on-hit effect for `rows`, refreshing timers like apply_hit_effects.
+        for col, chance, effect_turns in effects:
+            hit = rows[rng.random(rows.size) < chance]
+            fx[hit, col] = np.maximum(fx[hit, col], effect_turns)
+
+    def drain(rows, drain_turns):
+        # Puts one random player skill on cooldown per row, picked like
+        # use_enemy_ability: a known key other than Focus Strike / Guard,
+        # else Meditate or Limit Break.
+        if rows.size == 0:
+            return
+        choices = cd_known[rows] & ~undrainable
+        choices[~choices.any(axis=1)] = drain_fallback
+        pick = (rng.random(rows.size) * choices.sum(axis=1)).astype(np.int64)
+        cols = (np.cumsum(choices, axis=1) > pick[:, None]).argmax(axis=1)
+        skill_cd[rows, cols] = drain_turns
+        cd_known[rows, cols] = True
+
+    for turn in range(1, max_turns + 1):
+        rows = np.flatnonzero(running)
+        if rows.size == 0:
+            break
+        turns[rows] = turn
+
+        # --- PLAYER'S TURN ---
+        hp, fx, stunned = tick(p_hp[rows], p_fx[rows], player_dot, player['hp_max'])
+        p_hp[rows], p_fx[rows] = hp, fx
+        dead = hp <= 0
+        running[rows[dead]] = False
+
+        acting = rows[~dead & ~stunned]
+        e_fx[acting, sleep_col] = 0  # Any action wakes the enemy
+        damage = np.full(acting.size, battle_atk, dtype=np.int64)
+        if skill_damage is not None:
+            ready = skill_cd[acting, strike_col] == 0
+            damage[ready] = skill_damage
+            skill_cd[acting[ready], strike_col] = strike_cd
+            cd_known[acting[ready], strike_col] = True
+        damage = np.where(hardened[acting], np.maximum(1, damage // 2), damage)
+        hardened[acting] = False
+        e_hp[acting] -= damage
+        inflict(e_fx, acting, player_on_hit)
+
+        rows = rows[~dead]
+        victory = e_hp[rows] <= 0
+        won[rows[victory]] = True
+        running[rows[victory]] = False
+        rows = rows[~victory]
+
+        # --- ENEMY'S TURN ---
+        hp, fx, stunned = tick(e_hp[rows], e_fx[rows], dot_value, mob['hp'])
+        e_hp[rows], e_fx[rows] = hp, fx
+        acting = rows[(hp > 0) & ~stunned]
+        tired = flags['is_exhausted'][acting]
+        flags['is_exhausted'][acting[tired]] = False
+        acting = acting[~tired]
+
+        special = np.zeros(acting.size, dtype=bool)
+        for ability in abilities:
+            ready = ~special
+            if ability['unless']:
+                ready &= ~flags[ability['unless']][acting]
+            if ability['hp_at_most'] is not None:
+                ready &= e_hp[acting] <= ability['hp_at_most']
+            if ability['hp_pct_at_most'] is not None:
+                ready &= e_hp[acting] <= mob['hp'] * ability['hp_pct_at_most']
+            if ability['chance'] is not None:
+                ready &= rng.integers(1, 101, acting.size) <= ability['chance']
+            special |= ready
+            users = acting[ready]
+            if ability['drain_skill']:
+                drain(users, ability['drain_skill'])
+
+            dealt = np.zeros(users.size, dtype=np.int64)
+            if ability['damage'] is not None:
+                for hit in range(ability['hits']):
+                    standing = p_hp[users] > 0 if hit else np.ones(users.size, dtype=bool)
+                    dealt = np.where(standing, np.maximum(1, (e_atk[users] * ability['damage']).astype(np.int64) - battle_def), dealt)
+                    p_hp[users[standing]] -= dealt[standing]
+            if ability['fire_damage']:
+                fire = max(1, ability['fire_damage'] - battle_def)
+                if profile.burn_resist > 0.0:
+                    fire = max(1, int(fire * (1.0 - profile.burn_resist)))
+                dealt[:] = fire
+                p_hp[users] -= fire
+            heal = (dealt * ability['siphon']).astype(np.int64) if ability['siphon'] else ability['heal']
+            e_hp[users] = np.minimum(mob['hp'], e_hp[users] + heal)
+            e_atk[users] += ability['atk_bonus']
+            if ability['sets']:
+                flags[ability['sets']][users] = True
+
+        attacking = acting[~special]
+        if profile.evade:
+            attacking = attacking[rng.random(attacking.size) >= profile.evade]
+        p_hp[attacking] -= np.maximum(1, e_atk[attacking] - battle_def)
+        p_fx[attacking, sleep_col] = 0  # v1.8: Wake up on hit
+        inflict(p_fx, acting, enemy_on_hit)
+        for col, chance, effect_turns in enemy_drain_hit:
+            drain(acting[rng.random(acting.size) < chance], effect_turns)
+        p_hp[acting] = np.maximum(p_hp[acting], 0)
+
+        dead = p_hp[rows] <= 0
+        running[rows[dead]] = False
+        rows = rows[~dead]
+        skill_cd[rows] = np.maximum(0, skill_cd[rows] - 1)
+
+    return {
+        "won": won,
+        "turns": turns,
+        "player_hp": np.maximum(p_hp, 0),
+        "enemy_hp": np.maximum(e_hp, 0)
+    }
+
+
+def summarize_battle_batch(enemy_name, level, loadout, results):
+    # Condenses a batch of fights into win rate and turn/HP percentiles.
+    np = _require_numpy()
+    won = results['won']
+    row = {"enemy": enemy_name, "level": level, "loadout": loadout,
+           "fights": int(won.size), "win_rate": float(won.mean()) if won.size else 0.0}
+    for column, values in [("turns", results['turns'][won]), ("hp_left", results['player_hp'][won])]:
+        for pct in [10, 50, 90]:
+            row[f"{column}_p{pct}"] = float(np.percentile(values, pct)) if values.size else None
+        row[f"{column}_mean"] = float(values.mean()) if values.size else None
+    return row
+
+
+def run_balance_sweep(mobs=None, levels=range(1, MAX_LEVEL + 1), loadout="starter", n=10000, seed=0, echo=None):
+    # Sweeps every mob against player builds at each level. Returns one summary row per pair.
+    np = _require_numpy()
+    mobs = list(mobs or MOBS)
+    levels = list(levels)
+    child_seeds = iter(np.random.SeedSequence(seed).spawn(len(mobs) * len(levels)))
+    rows = []
+    for enemy_name in mobs:
+        for level in levels:
+            player = build_sim_player(level, loadout, echo)
+            results = simulate_battles_vectorized(player, enemy_name, n, seed=next(child_seeds))
+            rows.append(summarize_battle_batch(enemy_name, level, loadout, results))
+    return rows
+
+
+## NEW (v1.9): Multi-core simulation campaigns ##
+# A campaign is a grid of independent (mob, level, loadout, seed) cells.
+# Every cell gets its own random.Random seeded from the cell key, so results
+# do not depend on how cells are spread across worker processes.
+
+BATTLE_POLICIES = {"attack": battle_policy_attack, "basic": battle_policy_basic}
+
+
+def campaign_grid(mobs=None, levels=range(1, MAX_LEVEL + 1), loadouts=("starter",), seeds=range(4)):
+    # Builds the list of campaign cells.
+    return [(enemy_name, level, loadout, seed)
+            for enemy_name in (mobs or MOBS)
+            for level in levels
+            for loadout in loadouts
+            for seed in seeds]
+
+
+def run_campaign_cell(cell, fights=100, policy="basic", base_seed=0):
+    # Runs one cell with its own RNG. Returns (cell, integer totals).
+    enemy_name, level, loadout, seed = cell
+    rng = random.Random(f"{base_seed}:{enemy_name}:{level}:{loadout}:{seed}")
+    player = build_sim_player(level, loadout)
+    policy_fn = BATTLE_POLICIES[policy]
+    totals = {"fights": 0, "wins": 0, "timeouts": 0, "win_turns": 0, "hp_left": 0}
+    enemy = EnemyInstance(enemy_name)
+    for _ in range(fights):
+        result = simulate_battle(player, enemy_name, policy_fn, rng, enemy=enemy)
+        totals['fights'] += 1
+        if result['won']:
+            totals['wins'] += 1
+            totals['win_turns'] += result['turns']
+            totals['hp_left'] += result['player_hp']
+        elif result['outcome'] == "timeout":
+            totals['timeouts'] += 1
+    return cell, totals
+
+
+def _run_campaign_chunk(cells, fights, policy, base_seed):
+    # Worker entry point: runs a batch of cells in one process.
+    return [run_campaign_cell(cell, fights, policy, base_seed) for cell in cells]
+
+
+def iter_campaign(cells, fights=100, policy="basic", base_seed=0, workers=None, chunk_size=8):
+    # Yields (cell, totals) pairs as soon as each batch finishes.
+    # workers=1 runs everything in this process.
+    cells = list(cells)
+    chunks = [cells[i:i + chunk_size] for i in range(0, len(cells), chunk_size)]
+    if workers == 1:
+        for chunk in chunks:
+            yield from _run_campaign_chunk(chunk, fights, policy, base_seed)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_campaign_chunk, chunk, fights, policy, base_seed) for chunk in chunks]
+        for future in concurrent.futures.as_completed(futures):
+            yield from future.result()
+
+
+def merge_campaign_results(results):
+    # Folds cell totals into one row per (mob, level, loadout), in a fixed order.
+    merged = {}
+    for (enemy_name, level, loadout, seed), totals in sorted(results, key=lambda r: r[0]):
+        row = merged.setdefault((enemy_name, level, loadout), {
+            "enemy": enemy_name, "level": level, "loadout": loadout,
+            "fights": 0, "wins": 0, "timeouts": 0, "win_turns": 0, "hp_left": 0})
+        for key, value in totals.items():
+            row[key] += value
+
+    report = []
+    for key in sorted(merged):
+        row = merged[key]
+        wins = row['wins']
+        row['win_rate'] = wins / row['fights'] if row['fights'] else 0.0
+        row['avg_turns_to_kill'] = row['win_turns'] / wins if wins else None
+        row['avg_hp_left'] = row['hp_left'] / wins if wins else None
+        report.append(row)
+    return report
+
+
+def run_campaign(cells, fights=100, policy="basic", base_seed=0, workers=None, on_result=None):
+    # Runs a whole campaign across a process pool and returns the merged report.
+    # on_result(cell, totals) is called for each cell as it streams back.
+    results = []
+    for cell, totals in iter_campaign(cells, fights, policy, base_seed, workers):
+        results.append((cell, totals))
+        if on_result:
+            on_result(cell, totals)
+    return merge_campaign_results(results)
+
+
+def write_report_csv(rows, path):
+    # Writes a list of report rows (dicts) to a CSV file.
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+## NEW (v1.9): Save corpus analytics ##
+# Aggregate stats over a directory tree of collected save files (e.g. from
+# playtesters). Files are read in chunks on a process pool, each chunk folds
+# its saves into Counters, and only those small totals travel back. Saves go
+# through load_save_data(), so old versions are migrated exactly as in-game.
+
+SAVE_CORPUS_CHUNK = 256  # Save files per worker task
+
+
+def iter_save_corpus(directory):
+    # Yields every slot file (save_N.sav or legacy save_N.json) below
+    # `directory`. A legacy .json save is skipped when its .sav sibling exists
+    # (reading the .sav already falls back to it).
+    pending = [directory]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                    continue
+                if SaveSlots.slot_number(entry.name) is None:
+                    continue
+                ext = os.path.splitext(entry.name)[1]
+                if ext == ".json" and os.path.exists(entry.path[:-len(ext)] + SAVE_SLOT_EXT):
+                    continue
+                yield entry.path
+
+
+def main_quest_path(player_data):
+    # "hero", "reckless" or "undecided" (before the Mayor's choice).
+    quest_id = player_data.get('main_quest_id') or ""
+    if player_data.get('key') or "RECKLESS" in quest_id:
+        return "reckless"
+    if "HERO" in quest_id or not player_data.get('seal', True):
+        return "hero"
+    return "undecided"
+
+
+def _new_corpus_totals():
+    return {"files": 0, "unreadable": 0, "skipped": 0, "codex_completion": 0.0,
+            "levels": collections.Counter(), "quests": collections.Counter(),
+            "paths": collections.Counter(), "equipment": collections.Counter(),
+            "codex": collections.Counter(), "versions": collections.Counter()}
+
+
+def _merge_corpus_totals(totals, other):
+    for key, value in other.items():
+        totals[key] += value  # Counters add per key, numbers just add
+
+
+def _summarize_save_chunk(paths):
+    # Folds one chunk of save files into corpus totals. Files that can't be
+    # read count as unreadable; files that decode but are not valid saves
+    # (wrong fields or types, failing migrations) count as skipped.
+    totals = _new_corpus_totals()
+    for path in paths:
+        totals['files'] += 1
+        try:
+            data, _ = load_save_data(path)
+        except (OSError, SaveFormatError):
+            totals['unreadable'] += 1
+            continue
+        except Exception:  # A malformed save that breaks a migration must not abort the analysis
+            totals['skipped'] += 1
+            continue
+        try:
+            check_save_fields(data)
+        except SaveFormatError:
+            totals['skipped'] += 1
+            continue
+        totals['versions'][data['_loaded_version']] += 1
+        totals['levels'][data.get('level', 1)] += 1
+        totals['quests'][data.get('main_quest_id')] += 1
+        totals['paths'][main_quest_path(data)] += 1
+        totals['equipment'].update(item for item in (data.get('equipment') or {}).values() if item)
+        codex = set(data.get('codex') or []) & CODEX_ENTRIES.keys()
+        totals['codex'].update(codex)
+        totals['codex_completion'] += len(codex) / len(CODEX_ENTRIES)
+    return totals
+
+
+def _iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def analyze_save_corpus(directory, workers=None, chunk_size=SAVE_CORPUS_CHUNK):
+    # Streams every save below `directory` through a process pool (workers=1
+    # runs in this process) and returns the report from save_corpus_report().
+    totals = _new_corpus_totals()
+    chunks = _iter_chunks(iter_save_corpus(directory), chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            _merge_corpus_totals(totals, _summarize_save_chunk(chunk))
+        return save_corpus_report(totals)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)  # Don't queue the whole tree up front
+        running = set()
+        for chunk in chunks:
+            running.add(pool.submit(_summarize_save_chunk, chunk))
+            if len(running) >= max_in_flight:
+                done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    _merge_corpus_totals(totals, future.result())
+        for future in concurrent.futures.as_completed(running):
+            _merge_corpus_totals(totals, future.result())
+    return save_corpus_report(totals)
+
+
+def save_corpus_report(totals):
+    # Turns corpus totals into named tables, each a dict of equal-length columns.
+    saves = totals['files'] - totals['unreadable'] - totals['skipped']
+
+    def share(count):
+        return count / saves if saves else 0.0
+
+    levels = sorted(totals['levels'])
+    quests = [q for q in MAIN_QUESTS if q in totals['quests']]  # Story order
+    quests += sorted((q for q in totals['quests'] if q not in MAIN_QUESTS), key=str)
+    paths = ["undecided", "hero", "reckless"]
+    items = [item for item, _ in totals['equipment'].most_common()]
+    codex = [entry for entry, _ in totals['codex'].most_common()]
+    codex += [entry for entry in CODEX_ENTRIES if entry not in totals['codex']]
+    return {
+        "summary": {
+            "files": [totals['files']], "saves": [saves], "unreadable": [totals['unreadable']],
+            "skipped": [totals['skipped']],
+            "migrated": [sum(n for v, n in totals['versions'].items() if v < SAVE_VERSION)],
+            "avg_codex_completion": [totals['codex_completion'] / saves if saves else 0.0]},
+        "levels": {
+            "level": levels,
+            "saves": [totals['levels'][level] for level in levels],
+            "share": [share(totals['levels'][level]) for level in levels]},
+        "quest_funnel": {
+            "quest": quests,
+            "title": [MAIN_QUESTS.get(q, {}).get('title', "Unknown") for q in quests],
+            "saves": [totals['quests'][q] for q in quests],
+            "share": [share(totals['quests'][q]) for q in quests]},
+        "paths": {
+            "path": paths,
+            "saves": [totals['paths'][path] for path in paths],
+            "share": [share(totals['paths'][path]) for path in paths]},
+        "equipment": {
+            "item": items,
+            "name": [EQUIPMENT_DB.get(item, {}).get('name', "Unknown") for item in items],
+            "type": [EQUIPMENT_DB.get(item, {}).get('type') for item in items],
+            "saves": [totals['equipment'][item] for item in items],
+            "share": [share(totals['equipment'][item]) for item in items]},
+        "codex": {
+            "entry": codex,
+            "title": [CODEX_ENTRIES.get(entry, {}).get('title', entry) for entry in codex],
+            "saves": [totals['codex'][entry] for entry in codex],
+            "completion_rate": [share(totals['codex'][entry]) for entry in codex]},
+    }
+
+
+def write_save_corpus_report(report, path):
+    # Writes the report as one JSON file (path ends in .json) or as one CSV
+    # per table in the directory `path`.
+    if path.endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return
+    os.makedirs(path, exist_ok=True)
+    for name, columns in report.items():
+        rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        write_report_csv(rows, os.path.join(path, name + ".csv"))
+
+
+## NEW (v1.9): Session recording & replay ##
+# A session log is an append-only text file with one event per line:
+#   S {...}        header: contents of the save slots when recording started
+#   I "text"       a safe_input() answer     X   input cancelled (EOF)
+#   R 0.123...     a random() draw           B k n   a getrandbits(k) draw
+# Every other RNG call (randint, choice, sample...) is built on those two
+# draws, so replaying them reproduces the session exactly.
+
+class ReplayFinished(Exception):
+    # Raised when a replay runs out of recorded input.
+    pass
+
+
+class ReplayDesync(Exception):
+    # Raised when the game asks for a different draw than the one recorded.
+    pass
+
+
+class SessionRecorder:
+    # Writes session events to an append-only log file.
+    def __init__(self, log_path):
+        self.file = open(log_path, "a", encoding="utf-8")
+
+    def write(self, line, flush=False):
+        self.file.write(line + "\n")
+        if flush:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class RecordingRandom(random.Random):
+    # A Random that logs every core draw to a SessionRecorder.
+    def __init__(self, recorder, seed=None):
+        self.recorder = recorder
+        super().__init__(seed)
+
+    def random(self):
+        value = super().random()
+        self.recorder.write(f"R {value!r}")
+        return value
+
+    def getrandbits(self, k):
+        value = super().getrandbits(k)
+        self.recorder.write(f"B {k} {value}")
+        return value
+
+
+class ReplayRandom(random.Random):
+    # A Random that hands back recorded draws in order.
+    def __init__(self, draws):
+        self.draws = collections.deque(draws)
+        super().__init__(0)
+
+    def _next_draw(self, kind):
+        if not self.draws:
+            raise ReplayFinished("Recorded RNG stream exhausted.")
+        draw = self.draws.popleft()
+        if draw[0] != kind:
+            raise ReplayDesync(f"Expected a '{draw[0]}' draw but the game asked for '{kind}'.")
+        return draw
+
+    def random(self):
+        return self._next_draw("R")[1]
+
+    def getrandbits(self, k):
+        draw = self._next_draw("B")
+        if draw[1] != k:
+            raise ReplayDesync(f"Recorded getrandbits({draw[1]}) but the game asked for getrandbits({k}).")
+        return draw[2]
+
+
+def _read_slot_files():
+    # Snapshot of the save directory: every slot, journal, legacy JSON save and
+    # the slot index (file name -> base64 of the file).
+    saves = {}
+    for name in SLOTS.files():
+        with open(os.path.join(SLOTS.directory, name), "rb") as f:
+            saves[name] = base64.b64encode(f.read()).decode("ascii")
+    return saves
+
+
+def record_session(log_path, seed=None):
+    # Plays the game normally while logging every input answer and RNG draw.
+    recorder = SessionRecorder(log_path)
+    recorder.write("S " + json.dumps(_read_slot_files()), flush=True)
+
+    def read_input(prompt):
+        try:
+            answer = input(prompt)
+        except EOFError:
+            recorder.write("X", flush=True)
+            raise
+        recorder.write("I " + json.dumps(answer), flush=True)
+        return answer
+
+    runtime = GameRuntime(rng=RecordingRandom(recorder, seed), read_input=read_input)
+    try:
+        with use_runtime(runtime):
+            main()
+    finally:
+        recorder.close()
+
+
+def load_session_log(log_path):
+    # Parses a session log into (saves, inputs, draws).
+    saves, inputs, draws = {}, [], []
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            tag, _, rest = line.rstrip("\n").partition(" ")
+            if tag == "S":
+                saves = json.loads(rest)
+            elif tag == "I":
+                inputs.append(json.loads(rest))
+            elif tag == "X":
+                inputs.append(None)
+            elif tag == "R":
+                draws.append(("R", float(rest)))
+            elif tag == "B":
+                k, value = rest.split()
+                draws.append(("B", int(k), int(value)))
+    return saves, inputs, draws
+
+
+def replay_session(log_path, out=None):
+    # Re-runs a recorded session with no terminal and no delays, in a scratch
+    # directory seeded with the recorded saves. Returns the captured output.
+    saves, inputs, draws = load_session_log(log_path)
+    pending_inputs = collections.deque(inputs)
+
+    def read_input(prompt):
+        print(prompt, end="")
+        if not pending_inputs:
+            raise ReplayFinished("Recorded input exhausted.")
+        answer = pending_inputs.popleft()
+        if answer is None:
+            raise EOFError
+        print(answer)
+        return answer
+
+    out = out or io.StringIO()
+    runtime = fast_runtime(rng=ReplayRandom(draws), read_input=read_input, out=out)
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        previous_dir = set_save_directory(scratch_dir)
+        try:
+            for name, encoded in saves.items():
+                with open(os.path.join(scratch_dir, os.path.basename(name)), "wb") as f:
+                    f.write(base64.b64decode(encoded))
+            with use_runtime(runtime):
+                try:
+                    main()
+                except ReplayFinished:
+                    pass
+        finally:
+            set_save_directory(previous_dir)
+    return out.getvalue() if isinstance(out, io.StringIO) else None
+
+    # ==============================================================================
+    # ## 6. MAIN GAME LOOP ##
+    # (Controls the flow of the game)
+    # ==============================================================================
+
+def main():
+    game_state = "main_menu"
+    player = None
+    autosave = Autosaver() if AUTOSAVE_ENABLED else None
+    try:
+        while game_state != "exit":
+            enemy_to_fight = None  # Reset enemy encounter flag each loop
+
+            # Handle states that DON'T require an active player
+            if game_state == "main_menu":
+                game_state = handle_main_menu()
+            elif game_state == "new_game_menu":
+                if autosave:
+                    autosave.close()  # Finish the last player's saves before listing slots
+                game_state, player = handle_new_game_menu()
+                if autosave and player:
+                    autosave.track(player, new_game=True)
+            elif game_state == "load_game_menu":
+                if autosave:
+                    autosave.close()
+                game_state, player = handle_load_game_menu()
+                if autosave and player:
+                    autosave.track(player)
+            elif game_state == "game_over":  # Final game over screen
+                game_state = handle_game_over()
+                player = None  # Ensure player is cleared
+
+            # Handle states that REQUIRE an active player
+            elif player:
+                previous_state = game_state
+                if game_state == "playing":
+                    game_state, player, enemy_to_fight = handle_playing(player)
+                elif game_state == "shop":
+                    game_state, player, enemy_to_fight = handle_shop(player)
+                elif game_state == "mayor":
+                    game_state, player, enemy_to_fight = handle_mayor(player)
+                elif game_state == "cave":
+                    game_state, player, enemy_to_fight = handle_cave(player)
+                elif game_state == "town":
+                    game_state, player, enemy_to_fight = handle_town(player)
+                elif game_state == "debug_console":
+                    game_state, player, enemy_to_fight = handle_debug_console(player)
+                elif game_state == "game_won":
+                    game_state = handle_game_won(player)
+                    player = None  # Clear player after winning
+
+                # If handle_playing returned an enemy, start battle
+                if enemy_to_fight:
+                    game_state, player = handle_battle(player, enemy_to_fight)
+                    # handle_battle returns "game_over" if player died permanently
+                    if game_state == "game_over":
+                        player = None  # Ensure player is cleared for game over screen
+
+                # v1.9: Autosave after battles, on leaving a location and on quest changes
+                if autosave and player and (
+                        enemy_to_fight
+                        or (previous_state in AUTOSAVE_LEAVE_STATES and game_state != previous_state)
+                        or autosave.quests_changed(player)):
+                    autosave.checkpoint(player)
+
+            # Failsafe: If player data is lost unexpectedly
+            elif game_state not in ["main_menu", "new_game_menu", "load_game_menu", "exit", "game_over"]:
+                print("Error: Player data lost. Returning to main menu.")
+                pause(2)
+                game_state = "main_menu"
+                player = None
+    finally:
+        if autosave:
+            autosave.close()  # Fold pending autosaves into a full save on quit
+        report_save_errors(SAVE_WRITER.flush())  # Don't exit before queued saves are on disk
+
+    print(f"\nThank you for playing {GAME_TITLE}!")
+
+# Entry point of the script
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=GAME_TITLE)
+    parser.add_argument("--record", metavar="LOG", help="record inputs and RNG draws to a session log")
+    parser.add_argument("--replay", metavar="LOG", help="replay a session log without a terminal")
+    parser.add_argument("--world", metavar="FILE", help="play on a chunked world file instead of the built-in map")
+    parser.add_argument("--save-dir", metavar="DIR", help=f"directory holding the save slots (default: {GAME_SAVE_DIRECTORY})")
+    parser.add_argument("--no-autosave", action="store_true", help="only save when choosing SAVE AND QUIT")
+    parser.add_argument("--upgrade-saves", nargs="?", const="", metavar="DIR",
+                        help="migrate every save in DIR (default: the save directory) to the current version")
+    parser.add_argument("--verify-saves", nargs="?", const="", metavar="DIR",
+                        help="check the checksum of every save in DIR (default: the save directory)")
+    parser.add_argument("--analyze-saves", metavar="DIR", help="aggregate stats over every save file below DIR")
+    parser.add_argument("--report", metavar="PATH",
+                        help="where --analyze-saves writes: a .json file, or a directory of CSV tables")
+    parser.add_argument("--workers", type=int, metavar="N", help="worker processes for --upgrade-saves and --analyze-saves")
+    parser.add_argument("--export-save", nargs=2, metavar=("SLOT", "JSON"), help="write a save slot out as JSON")
+    parser.add_argument("--import-save", nargs=2, metavar=("JSON", "SLOT"), help="write a JSON save into a save slot")
+    parser.add_argument("--import-legacy", action="store_true",
+                        help="move pre-v1.9 save_N.json files from the working directory into the default save directory")
+    args = parser.parse_args()
+
+    if args.world:
+        load_world(args.world)
+    if args.no_autosave:
+        AUTOSAVE_ENABLED = False
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+        set_save_directory(args.save_dir)
+
+    if args.upgrade_saves is not None:
+        for slot_file, before, applied in upgrade_save_directory(args.upgrade_saves or None, args.workers):
+            status = " -> ".join(applied) if applied else "up to date"
+            print(f"{os.path.basename(slot_file)} (save version {before}): {status}")
+    elif args.verify_saves is not None:
+        results = verify_save_directory(args.verify_saves or None)
+        for slot_file, state, backup in results:
+            if state in ("corrupted", "missing"):
+                state = f"{state.upper()} (newest good backup: {os.path.basename(backup) if backup else 'none'})"
+            print(f"{os.path.basename(slot_file)}: {state}")
+        if any(state in ("corrupted", "missing") for _, state, _ in results):
+            sys.exit(1)
+    elif args.analyze_saves:
+        report = analyze_save_corpus(args.analyze_saves, args.workers)
+        if args.report:
+            write_save_corpus_report(report, args.report)
+        else:
+            print(json.dumps(report, indent=2))
+    elif args.export_save:
+        export_save_json(*args.export_save)
+    elif args.import_save:
+        import_save_json(*args.import_save)
+    elif args.import_legacy:
+        if args.save_dir and os.path.abspath(args.save_dir) != os.path.abspath(GAME_SAVE_DIRECTORY):
+            parser.error("--import-legacy only imports into the default save directory")
+        if not import_legacy_saves():
+            print("No old saves found in the working directory.")
+    elif args.replay:
+        sys.stdout.write(replay_session(args.replay))
+    elif args.record:
+        record_session(args.record)
+    else:
+        main()
\ No newline at end of file